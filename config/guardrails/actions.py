@@ -7,6 +7,8 @@ Currently, all safety logic is handled through Colang rules.
 
 from typing import Dict, Any, Optional
 
+from src_new.shared.keywords import has_keyword
+
 
 def check_high_risk_keywords(message: str) -> bool:
     """
@@ -20,13 +22,8 @@ def check_high_risk_keywords(message: str) -> bool:
     Returns:
         True if high-risk keywords detected
     """
-    high_risk_keywords = [
-        "suicide", "kill myself", "end my life", "want to die",
-        "self harm", "hurt myself", "cut myself"
-    ]
-    
-    message_lower = message.lower()
-    return any(keyword in message_lower for keyword in high_risk_keywords)
+    # Keywords: KEYWORD_SETS["high_risk"] in src_new/shared/keywords.py
+    return has_keyword(message, "high_risk")
 
 
 def get_safety_resources() -> Dict[str, Any]:
@@ -0,0 +1,93 @@
+"""Contention benchmark for per-user state locking.
+
+Compares three strategies for guarding read-modify-write of per-user state
+under concurrent load:
+- none:    no lock (fast, but loses updates)
+- global:  one asyncio.Lock for all users (correct, but serializes everyone)
+- keyed:   KeyedAsyncLock per user (correct, users stay parallel)
+
+Usage:
+    python scripts/benchmark_user_state_contention.py --users 200 --turns 20
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from contextlib import nullcontext
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src_new.shared.concurrency import KeyedAsyncLock
+
+
+async def run(strategy: str, users: int, turns: int, hold: float) -> dict:
+    """Run one benchmark strategy and return timing/correctness results."""
+    counters = defaultdict(int)
+    global_lock = asyncio.Lock()
+    keyed = KeyedAsyncLock()
+
+    def lock_for(user_id):
+        if strategy == "global":
+            return global_lock
+        if strategy == "keyed":
+            return keyed.acquire(user_id)
+        return nullcontext()
+
+    async def turn(user_id):
+        async with lock_for(user_id):
+            value = counters[user_id]
+            await asyncio.sleep(hold)  # Simulated agent work between read and write
+            counters[user_id] = value + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        turn(f"user_{u}") for _ in range(turns) for u in range(users)
+    ))
+    elapsed = time.perf_counter() - started
+
+    lost = users * turns - sum(counters.values())
+    return {
+        "strategy": strategy,
+        "seconds": elapsed,
+        "turns_per_second": users * turns / elapsed,
+        "lost_updates": lost,
+        "lock_stats": keyed.get_stats() if strategy == "keyed" else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20, help="Concurrent turns per user")
+    parser.add_argument("--hold", type=float, default=0.001, help="Seconds inside the critical section")
+    parser.add_argument("--skip-global", action="store_true", help="Skip the (slow) global lock run")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Per-user state contention benchmark")
+    print(f"users={args.users}, turns/user={args.turns}, hold={args.hold * 1000:.1f}ms")
+    print("=" * 60)
+
+    strategies = ["none", "keyed"] if args.skip_global else ["none", "global", "keyed"]
+    for strategy in strategies:
+        result = await run(strategy, args.users, args.turns, args.hold)
+        print(
+            f"{result['strategy']:>7}: {result['seconds']:7.3f}s  "
+            f"{result['turns_per_second']:10,.0f} turns/s  "
+            f"lost_updates={result['lost_updates']}"
+        )
+        if result["lock_stats"]:
+            stats = result["lock_stats"]
+            print(
+                f"         contended={stats['contended']}/{stats['acquisitions']}, "
+                f"max_wait={stats['max_wait_seconds'] * 1000:.1f}ms, "
+                f"active_keys_after={stats['active_keys']}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
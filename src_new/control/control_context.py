@@ -6,6 +6,8 @@ from dataclasses import dataclass, field
 from typing import Optional, Dict, Any, Literal
 from datetime import datetime
 
+from src_new.control.route_event_log import record_route_transition
+
 Route = Literal["low", "medium", "high"]
 
 
@@ -44,13 +46,28 @@ class ControlContext:
         if self.last_updated_at is None:
             self.last_updated_at = datetime.now()
     
-    def update_route(self, new_route: Route, reason: Optional[str] = None):
-        """Update route and timestamp."""
+    def update_route(
+        self,
+        new_route: Route,
+        reason: Optional[str] = None,
+        source: Optional[str] = None
+    ):
+        """Update route and timestamp, recording the transition if it changed."""
         if new_route != self.route:
+            old_route = self.route
             self.route = new_route
             self.last_updated_at = datetime.now()
             if reason:
                 self.route_reason = reason
+            if source:
+                self.route_source = source
+            record_route_transition(
+                user_id=self.user_id,
+                from_route=old_route,
+                to_route=new_route,
+                reason=reason,
+                source=source or self.route_source
+            )
 
 
 __all__ = ["ControlContext", "Route"]
@@ -0,0 +1,50 @@
+"""Structured trace of a single route decision (debugging misroutes)."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+
+@dataclass(slots=True)
+class RouteDecisionTrace:
+    """Everything that contributed to a route decision.
+
+    Only created when tracing is enabled for a request (explicitly or by
+    sampling), so the untraced path allocates nothing from this module.
+    Fields are filled in by QuestionnaireMapper and RiskRouter as the
+    decision is made.
+    """
+    # Inputs
+    phq9_score: Optional[float] = None
+    gad7_score: Optional[float] = None
+    phq9_q9_score: Optional[int] = None
+    chat_risk_score: Optional[float] = None
+
+    # Questionnaire sub-routes
+    phq9_route: Optional[str] = None
+    gad7_route: Optional[str] = None
+    phq9_q9_override: bool = False  # Q9 >= 1 forced PHQ-9 to "high"
+    questionnaire_route: Optional[str] = None  # Combined PHQ-9 / GAD-7
+
+    # Chat priority
+    chat_override: Optional[str] = None  # Route forced by chat content, if any
+    threshold_fired: Optional[str] = None  # e.g. "HIGH_RISK_DIRECT_THRESHOLD>=0.95"
+
+    # Outputs
+    final_route: Optional[str] = None
+    rigid_score: Optional[float] = None
+    rigid_score_bucket: Optional[str] = None
+    reason: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for logging."""
+        return asdict(self)
+
+
+def new_trace(**inputs: Any) -> RouteDecisionTrace:
+    """Create a trace pre-filled with decision inputs."""
+    return RouteDecisionTrace(**inputs)
+
+
+__all__ = ["RouteDecisionTrace", "new_trace"]
@@ -2,15 +2,23 @@
 
 from __future__ import annotations
 
+import random
+import logging
 from dataclasses import dataclass
-from typing import Dict, Any, Optional, Literal
+from typing import TYPE_CHECKING, Dict, Any, Optional, Literal
 
+from src_new.control.decision_trace import RouteDecisionTrace, new_trace
 from src_new.perception.questionnaire_mapper import QuestionnaireMapper, Route
 from src_new.perception.psyguard_service import (
     MEDIUM_RISK_THRESHOLD,
     HIGH_RISK_DIRECT_THRESHOLD
 )
 
+if TYPE_CHECKING:
+    from src_new.control.shadow_routing import ShadowRoutingEvaluator
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class RiskRoutingResult:
@@ -19,6 +27,7 @@ class RiskRoutingResult:
     rigid_score: float
     reason: str
     metadata: Dict[str, Any]
+    trace: Optional[RouteDecisionTrace] = None  # Only set when tracing is enabled
 
 
 class RiskRouter:
@@ -33,16 +42,48 @@ class RiskRouter:
     - Chat content risk has priority over questionnaire scores
     - Questionnaire scores are mapped using QuestionnaireMapper
     - Final route is determined by combining both signals
+    
+    Tracing:
+    - Pass trace=True to a decide_* call to get a RouteDecisionTrace
+    - Or set trace_sample_rate to trace a random fraction of decisions
+    - With tracing off (the default) no trace object is created
+    
+    Shadow routing:
+    - An optional ShadowRoutingEvaluator receives the inputs of every
+      questionnaire decision and evaluates candidate rule sets off the
+      request path; the primary route is always the one returned
     """
     
-    def __init__(self):
-        """Initialize risk router."""
+    def __init__(
+        self,
+        trace_sample_rate: float = 0.0,
+        shadow: Optional["ShadowRoutingEvaluator"] = None
+    ):
+        """
+        Initialize risk router.
+        
+        Args:
+            trace_sample_rate: Fraction of decisions traced automatically (0.0 - 1.0)
+            shadow: Shadow rule evaluator (optional)
+        """
+        if not 0.0 <= trace_sample_rate <= 1.0:
+            raise ValueError(f"trace_sample_rate must be in [0, 1], got {trace_sample_rate}")
         self.mapper = QuestionnaireMapper()
+        self.trace_sample_rate = trace_sample_rate
+        self.shadow = shadow
+    
+    def _should_trace(self, trace: Optional[bool]) -> bool:
+        """Decide whether this decision is traced (explicit flag wins over sampling)."""
+        if trace is not None:
+            return trace
+        rate = self.trace_sample_rate
+        return rate > 0.0 and random.random() < rate
     
     def decide_from_assessment(
         self,
         assessment: Dict[str, Any],
-        chat_risk_score: Optional[float] = None
+        chat_risk_score: Optional[float] = None,
+        trace: Optional[bool] = None
     ) -> RiskRoutingResult:
         """
         Decide route from assessment result (legacy compatibility).
@@ -52,33 +93,49 @@ class RiskRouter:
         Args:
             assessment: Assessment result from proximo_api.assess()
             chat_risk_score: Optional PsyGUARD risk score from chat content
+            trace: Force tracing on/off for this call (None: use sampling rate)
             
         Returns:
             RiskRoutingResult with route decision
         """
         from src.conversation import router as legacy_router
         
+        decision_trace = new_trace(chat_risk_score=chat_risk_score) if self._should_trace(trace) else None
+        
         # Use legacy router for initial decision
         legacy_decision = legacy_router.decide_route(assessment)
         route = legacy_decision.get("route", "low")
         rigid_score = legacy_decision.get("rigid_score", 0.0)
         
+        if decision_trace is not None:
+            decision_trace.questionnaire_route = route
+        
         # If chat risk score is provided, apply priority rules
         if chat_risk_score is not None:
-            route = self._apply_chat_priority(route, chat_risk_score)
+            route = self._apply_chat_priority(route, chat_risk_score, decision_trace)
+        
+        reason = legacy_decision.get("reason", "unknown")
+        if decision_trace is not None:
+            decision_trace.final_route = route
+            decision_trace.rigid_score = rigid_score
+            decision_trace.rigid_score_bucket = "legacy"
+            decision_trace.reason = reason
+            logger.info(f"RiskRouter trace: {decision_trace.to_dict()}")
         
         return RiskRoutingResult(
             route=route,
             rigid_score=rigid_score,
-            reason=legacy_decision.get("reason", "unknown"),
-            metadata=legacy_decision
+            reason=reason,
+            metadata=legacy_decision,
+            trace=decision_trace
         )
     
     def decide_from_questionnaires(
         self,
         phq9_result: Dict[str, Any],
         gad7_result: Dict[str, Any],
-        chat_risk_score: Optional[float] = None
+        chat_risk_score: Optional[float] = None,
+        trace: Optional[bool] = None
     ) -> RiskRoutingResult:
         """
         Decide route from questionnaire results.
@@ -89,6 +146,7 @@ class RiskRouter:
             phq9_result: PHQ-9 assessment result
             gad7_result: GAD-7 assessment result
             chat_risk_score: Optional PsyGUARD risk score from chat content
+            trace: Force tracing on/off for this call (None: use sampling rate)
             
         Returns:
             RiskRoutingResult with route decision
@@ -103,20 +161,39 @@ class RiskRouter:
         if len(parsed_scores) >= 9:
             phq9_q9_score = parsed_scores[8]  # Q9 is index 8 (0-based)
         
+        decision_trace = None
+        if self._should_trace(trace):
+            decision_trace = new_trace(
+                phq9_score=phq9_score,
+                gad7_score=gad7_score,
+                phq9_q9_score=phq9_q9_score,
+                chat_risk_score=chat_risk_score
+            )
+        
         # Make final route decision (chat content has priority)
         route = self.mapper.final_route_decision(
             phq9_score=phq9_score,
             gad7_score=gad7_score,
             phq9_q9_score=phq9_q9_score,
-            chat_risk_score=chat_risk_score
+            chat_risk_score=chat_risk_score,
+            trace=decision_trace
         )
         
         # Calculate rigid_score based on route
-        rigid_score = self._route_to_rigid_score(route, phq9_score, gad7_score)
+        rigid_score = self._route_to_rigid_score(route, phq9_score, gad7_score, decision_trace)
         
         # Determine reason
         reason = self._determine_reason(route, phq9_q9_score, chat_risk_score)
         
+        if decision_trace is not None:
+            decision_trace.final_route = route
+            decision_trace.rigid_score = rigid_score
+            decision_trace.reason = reason
+            logger.info(f"RiskRouter trace: {decision_trace.to_dict()}")
+        
+        if self.shadow is not None:
+            self.shadow.submit(phq9_score, gad7_score, phq9_q9_score, chat_risk_score, route)
+        
         return RiskRoutingResult(
             route=route,
             rigid_score=rigid_score,
@@ -127,17 +204,29 @@ class RiskRouter:
                 "phq9_q9_score": phq9_q9_score,
                 "chat_risk_score": chat_risk_score,
                 "route_source": "questionnaire_mapper"
-            }
+            },
+            trace=decision_trace
         )
     
-    def _apply_chat_priority(self, questionnaire_route: Route, chat_risk_score: float) -> Route:
+    def _apply_chat_priority(
+        self,
+        questionnaire_route: Route,
+        chat_risk_score: float,
+        trace: Optional[RouteDecisionTrace] = None
+    ) -> Route:
         """Apply chat content priority over questionnaire route."""
         if chat_risk_score >= HIGH_RISK_DIRECT_THRESHOLD:
+            if trace is not None:
+                trace.chat_override = "high"
+                trace.threshold_fired = f"HIGH_RISK_DIRECT_THRESHOLD>={HIGH_RISK_DIRECT_THRESHOLD}"
             return "high"
         elif chat_risk_score >= MEDIUM_RISK_THRESHOLD:
             # Only upgrade if questionnaire route is lower
             route_priority = {"low": 1, "medium": 2, "high": 3}
             if route_priority.get(questionnaire_route, 0) < 2:
+                if trace is not None:
+                    trace.chat_override = "medium"
+                    trace.threshold_fired = f"MEDIUM_RISK_THRESHOLD>={MEDIUM_RISK_THRESHOLD}"
                 return "medium"
         return questionnaire_route
     
@@ -145,27 +234,32 @@ class RiskRouter:
         self,
         route: Route,
         phq9_score: float,
-        gad7_score: float
+        gad7_score: float,
+        trace: Optional[RouteDecisionTrace] = None
     ) -> float:
         """Convert route to rigid_score (0.0 - 1.0)."""
         if route == "high":
-            return 1.0
+            bucket, rigid_score = "high", 1.0
         elif route == "medium":
             # Medium risk: 0.5 - 0.75
             max_score = max(phq9_score, gad7_score)
             if max_score >= 15:
-                return 0.75
+                bucket, rigid_score = "medium:max_score>=15", 0.75
             elif max_score >= 10:
-                return 0.6
+                bucket, rigid_score = "medium:max_score>=10", 0.6
             else:
-                return 0.5
+                bucket, rigid_score = "medium:base", 0.5
         else:  # low
             # Low risk: 0.0 - 0.4
             max_score = max(phq9_score, gad7_score)
             if max_score >= 5:
-                return 0.3
+                bucket, rigid_score = "low:max_score>=5", 0.3
             else:
-                return 0.15
+                bucket, rigid_score = "low:base", 0.15
+        
+        if trace is not None:
+            trace.rigid_score_bucket = bucket
+        return rigid_score
     
     def _determine_reason(
         self,
@@ -188,4 +282,4 @@ class RiskRouter:
             return "questionnaire_low"
 
 
-__all__ = ["RiskRouter", "RiskRoutingResult", "Route"]
+__all__ = ["RiskRouter", "RiskRoutingResult", "RouteDecisionTrace", "Route"]
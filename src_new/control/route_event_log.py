@@ -0,0 +1,487 @@
+"""Append-only event log for route transitions.
+
+Every route change (ControlContext.update_route, RouteUpdater) can be recorded
+here so escalation latency and transition rates can be analysed offline or by
+streaming consumers.
+
+Layout:
+- The log is a directory of segment files named ``<base_offset>.log``
+- Each segment holds JSON lines, one event per line, in offset order
+- Offsets are global, dense and start at 0
+
+Appends only touch an in-memory buffer, so they are safe to call from
+``process_message``. A background writer flushes the buffer in batches and
+fsyncs once per batch; consumers (``replay`` / ``tail``) only see events that
+have been made durable. ConversationPipeline.startup() installs and starts
+the global log (PipelineConfig.route_event_log_dir).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".log"
+
+
+@dataclass
+class RouteTransitionEvent:
+    """A single route transition."""
+    user_id: str
+    from_route: str
+    to_route: str
+    reason: Optional[str] = None
+    source: Optional[str] = None  # "route_updater", "questionnaire", "chat_content", ...
+    monotonic_ns: int = field(default_factory=time.monotonic_ns)
+    timestamp: float = field(default_factory=time.time)  # Wall clock (for cross-process joins)
+    offset: int = -1  # Assigned by RouteEventLog.append
+
+    def to_json(self) -> str:
+        """Serialize to a single JSON line (without newline)."""
+        return json.dumps(asdict(self), separators=(",", ":"), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, line: str) -> "RouteTransitionEvent":
+        """Deserialize from a JSON line."""
+        return cls(**json.loads(line))
+
+
+class _SegmentCursor:
+    """Sequential reader over segment files, starting at a given offset."""
+
+    def __init__(self, log: "RouteEventLog", offset: int):
+        self._log = log
+        self.offset = offset
+        self._segment_index = -1
+        self._file: Optional[TextIO] = None
+
+    def _open_segment_for(self, offset: int) -> bool:
+        segments = self._log._segments
+        index = bisect_right(segments, offset) - 1
+        if index < 0:
+            return False
+        self.close()
+        self._segment_index = index
+        self._file = open(self._log._segment_path(segments[index]), "r", encoding="utf-8")
+        # Skip to the requested offset within the segment
+        for _ in range(offset - segments[index]):
+            if not self._file.readline():
+                return False
+        return True
+
+    def read(self, stop: int, limit: Optional[int] = None) -> List[RouteTransitionEvent]:
+        """Read events in [self.offset, stop), at most ``limit`` of them."""
+        events: List[RouteTransitionEvent] = []
+        while self.offset < stop and (limit is None or len(events) < limit):
+            segments = self._log._segments
+            next_index = self._segment_index + 1
+            needs_next = (
+                self._file is None
+                or (next_index < len(segments) and self.offset >= segments[next_index])
+            )
+            if needs_next and not self._open_segment_for(self.offset):
+                break
+            line = self._file.readline()
+            if not line:
+                break
+            event = RouteTransitionEvent.from_json(line)
+            events.append(event)
+            self.offset = event.offset + 1
+        return events
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RouteEventLog:
+    """Segmented, append-only route transition log with batched fsync.
+
+    Usage:
+        log = RouteEventLog("data/route_events")
+        await log.start()            # background writer
+        log.append(event)            # non-blocking
+        async for event in log.tail(from_offset=0):
+            ...
+        await log.close()            # flush + fsync + stop writer
+
+    append() never writes to disk itself. Without start(), events stay
+    buffered until flush()/close(); once ``max_pending`` events are buffered
+    (no writer, or one falling behind), further events are dropped and
+    counted.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_max_events: int = 100_000,
+        fsync_batch_size: int = 1024,
+        flush_interval: float = 0.05,
+        fsync: bool = True,
+        max_pending: int = 65_536
+    ):
+        """
+        Initialize route event log.
+
+        Args:
+            directory: Directory for segment files (created if missing)
+            segment_max_events: Events per segment before rolling over
+            fsync_batch_size: Buffered events that trigger an early flush
+            flush_interval: Max seconds between background flushes
+            fsync: Whether to fsync after every batch (disable only for tests)
+            max_pending: Buffered events beyond which appends are dropped
+        """
+        if segment_max_events < 1 or fsync_batch_size < 1:
+            raise ValueError("segment_max_events and fsync_batch_size must be >= 1")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_events = segment_max_events
+        self.fsync_batch_size = fsync_batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_pending = max_pending
+
+        self._buffer_lock = threading.Lock()  # Guards _pending and _next_offset
+        self._write_lock = threading.Lock()  # Guards segment file state
+        self._pending: List[RouteTransitionEvent] = []
+
+        self._segments: List[int] = []
+        self._segment_file: Optional[TextIO] = None
+        self._segment_events = 0
+        self._next_offset = 0
+        self._durable_offset = 0
+        self._recover()
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._durable_event: Optional[asyncio.Event] = None
+        self._closed = False
+
+        # Metrics
+        self._batches_written = 0
+        self._fsync_seconds = 0.0
+        self._dropped = 0
+
+    def _segment_path(self, base_offset: int) -> Path:
+        return self.directory / f"{base_offset:020d}{SEGMENT_SUFFIX}"
+
+    def _recover(self) -> None:
+        """Discover existing segments and drop a torn trailing line."""
+        self._segments = sorted(
+            int(path.stem) for path in self.directory.glob(f"*{SEGMENT_SUFFIX}")
+            if path.stem.isdigit()
+        )
+        if not self._segments:
+            return
+
+        last_base = self._segments[-1]
+        last_path = self._segment_path(last_base)
+        valid_bytes = 0
+        count = 0
+        with open(last_path, "rb") as f:
+            for raw_line in f:
+                if not raw_line.endswith(b"\n"):
+                    break
+                try:
+                    json.loads(raw_line)
+                except ValueError:
+                    break
+                valid_bytes += len(raw_line)
+                count += 1
+        if valid_bytes != last_path.stat().st_size:
+            logger.warning(f"RouteEventLog: truncating torn write in {last_path.name}")
+            with open(last_path, "r+b") as f:
+                f.truncate(valid_bytes)
+
+        self._segment_events = count
+        self._next_offset = last_base + count
+        self._durable_offset = self._next_offset
+
+    def _open_segment(self) -> TextIO:
+        if self._segment_file is None or self._segment_events >= self.segment_max_events:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            if not self._segments or self._segment_events >= self.segment_max_events:
+                self._segments.append(self._durable_offset)
+                self._segment_events = 0
+            self._segment_file = open(
+                self._segment_path(self._segments[-1]), "a", encoding="utf-8"
+            )
+        return self._segment_file
+
+    def append(self, event: RouteTransitionEvent) -> Optional[int]:
+        """
+        Append an event to the log (in-memory, non-blocking, never does disk I/O).
+
+        Args:
+            event: Event to append (its offset is assigned here)
+
+        Returns:
+            Offset assigned to the event, or None if the buffer was full and
+            the event was dropped
+        """
+        if self._closed:
+            raise RuntimeError("RouteEventLog is closed")
+
+        with self._buffer_lock:
+            if len(self._pending) >= self.max_pending:
+                self._dropped += 1
+                return None
+            event.offset = self._next_offset
+            self._next_offset += 1
+            self._pending.append(event)
+            batch_full = len(self._pending) >= self.fsync_batch_size
+
+        if batch_full and self._flush_requested is not None:
+            self._flush_requested.set()
+        return event.offset
+
+    def _write_pending(self) -> int:
+        """Write and fsync all buffered events. Returns the new durable offset."""
+        with self._write_lock:
+            with self._buffer_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return self._durable_offset
+
+            index = 0
+            while index < len(batch):
+                segment = self._open_segment()
+                room = self.segment_max_events - self._segment_events
+                chunk = batch[index:index + room]
+                segment.write("".join(event.to_json() + "\n" for event in chunk))
+                segment.flush()
+                if self.fsync:
+                    started = time.perf_counter()
+                    os.fsync(segment.fileno())
+                    self._fsync_seconds += time.perf_counter() - started
+                self._segment_events += len(chunk)
+                self._durable_offset = chunk[-1].offset + 1
+                index += len(chunk)
+
+            self._batches_written += 1
+            return self._durable_offset
+
+    def flush(self) -> int:
+        """
+        Synchronously write and fsync buffered events.
+
+        Returns:
+            Durable offset (one past the last durable event)
+        """
+        durable = self._write_pending()
+        self._signal_durable()
+        return durable
+
+    async def flush_async(self) -> int:
+        """Write and fsync buffered events without blocking the event loop."""
+        durable = await asyncio.to_thread(self._write_pending)
+        self._signal_durable()
+        return durable
+
+    def _signal_durable(self) -> None:
+        """Wake up tail() consumers waiting for new durable events."""
+        event = self._durable_event
+        if event is None:
+            return
+        self._durable_event = None
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                event.set()
+            else:
+                loop.call_soon_threadsafe(event.set)
+
+    async def start(self) -> None:
+        """Start the background writer task (idempotent)."""
+        if self._writer_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._flush_requested = asyncio.Event()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+
+    async def _writer_loop(self) -> None:
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush_async()
+            except Exception as e:
+                logger.error(f"RouteEventLog flush failed: {e}", exc_info=True)
+
+    async def close(self) -> None:
+        """Flush remaining events, stop the writer and close segment files."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer_task is not None:
+            self._flush_requested.set()
+            await self._writer_task
+            self._writer_task = None
+            self._flush_requested = None
+        await self.flush_async()
+        with self._write_lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+
+    @property
+    def next_offset(self) -> int:
+        """Offset that the next appended event will receive."""
+        return self._next_offset
+
+    @property
+    def durable_offset(self) -> int:
+        """One past the last fsynced event (consumers read up to here)."""
+        return self._durable_offset
+
+    def replay(self, from_offset: int = 0, to_offset: Optional[int] = None) -> Iterator[RouteTransitionEvent]:
+        """
+        Replay durable events in offset order.
+
+        Args:
+            from_offset: First offset to return
+            to_offset: Stop before this offset (default: current durable offset)
+
+        Yields:
+            RouteTransitionEvent objects
+        """
+        stop = self._durable_offset if to_offset is None else min(to_offset, self._durable_offset)
+        cursor = _SegmentCursor(self, max(from_offset, 0))
+        try:
+            while cursor.offset < stop:
+                events = cursor.read(stop, limit=1024)
+                if not events:
+                    break
+                yield from events
+        finally:
+            cursor.close()
+
+    async def tail(
+        self,
+        from_offset: Optional[int] = None,
+        batch_size: int = 1024
+    ) -> AsyncIterator[RouteTransitionEvent]:
+        """
+        Follow the log, yielding durable events as they are written.
+
+        Args:
+            from_offset: First offset to return (default: current durable offset)
+            batch_size: Max events read from disk per step
+
+        Yields:
+            RouteTransitionEvent objects (never returns until cancelled or closed)
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        start = self._durable_offset if from_offset is None else max(from_offset, 0)
+        cursor = _SegmentCursor(self, start)
+        try:
+            while True:
+                if cursor.offset < self._durable_offset:
+                    events = cursor.read(self._durable_offset, limit=batch_size)
+                    for event in events:
+                        yield event
+                    if events:
+                        continue
+                if self._closed and cursor.offset >= self._durable_offset:
+                    return
+                if self._durable_event is None:
+                    self._durable_event = asyncio.Event()
+                waiter = self._durable_event
+                if cursor.offset >= self._durable_offset:
+                    # Timeout guards against a wakeup missed by a cross-thread flush()
+                    try:
+                        await asyncio.wait_for(waiter.wait(), timeout=max(self.flush_interval, 0.01))
+                    except TimeoutError:
+                        pass
+        finally:
+            cursor.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get log statistics."""
+        return {
+            "next_offset": self._next_offset,
+            "durable_offset": self._durable_offset,
+            "pending_events": len(self._pending),
+            "dropped_events": self._dropped,
+            "segments": len(self._segments),
+            "batches_written": self._batches_written,
+            "fsync_seconds": self._fsync_seconds,
+        }
+
+
+# Global event log (None until configured)
+_route_event_log: Optional[RouteEventLog] = None
+
+
+def get_route_event_log() -> Optional[RouteEventLog]:
+    """Get the global route event log, or None if not configured."""
+    return _route_event_log
+
+
+def set_route_event_log(log: Optional[RouteEventLog]) -> None:
+    """Install (or remove, with None) the global route event log."""
+    global _route_event_log
+    _route_event_log = log
+
+
+def record_route_transition(
+    user_id: str,
+    from_route: str,
+    to_route: str,
+    reason: Optional[str] = None,
+    source: Optional[str] = None
+) -> Optional[int]:
+    """
+    Record a route transition in the global event log.
+
+    Never raises: recording must not break the conversation path.
+
+    Returns:
+        Assigned offset, or None if no log is configured or the event was
+        not recorded
+    """
+    log = _route_event_log
+    if log is None:
+        return None
+    try:
+        return log.append(RouteTransitionEvent(
+            user_id=user_id,
+            from_route=from_route,
+            to_route=to_route,
+            reason=reason,
+            source=source
+        ))
+    except Exception as e:
+        logger.warning(f"Failed to record route transition for user={user_id}: {e}")
+        return None
+
+
+__all__ = [
+    "RouteTransitionEvent",
+    "RouteEventLog",
+    "get_route_event_log",
+    "set_route_event_log",
+    "record_route_transition",
+]
@@ -2,15 +2,24 @@
 
 from __future__ import annotations
 
-from typing import Literal, Optional
+from typing import TYPE_CHECKING, Literal, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 from src_new.perception.psyguard_service import (
     MEDIUM_RISK_THRESHOLD,
     HIGH_RISK_DIRECT_THRESHOLD
 )
 
+if TYPE_CHECKING:
+    from src_new.control.control_context import ControlContext
+
 Route = Literal["low", "medium", "high"]
 
+# Integer route codes used by the batch API (ordered by severity)
+ROUTE_CODES = {"low": 0, "medium": 1, "high": 2}
+ROUTE_NAMES = ("low", "medium", "high")
+
 
 class RouteUpdater:
     """Manages route updates based on real-time PsyGUARD scores.
@@ -94,7 +103,99 @@ class RouteUpdater:
         if new_route != current_route:
             return new_route
         return None
+    
+    @staticmethod
+    def apply_to_context(
+        context: "ControlContext",
+        new_psyguard_score: float
+    ) -> bool:
+        """
+        Apply a new PsyGUARD score to a ControlContext.
+        
+        Stores the score and upgrades the route if needed. Upgrades go
+        through ControlContext.update_route, so they are recorded in the
+        route event log.
+        
+        Args:
+            context: Control context to update in place
+            new_psyguard_score: New PsyGUARD score
+            
+        Returns:
+            True if the route was upgraded
+        """
+        context.psyguard_score = new_psyguard_score
+        new_route = RouteUpdater.update_route(context.route, new_psyguard_score)
+        if new_route == context.route:
+            return False
+        reason = (
+            "psyguard_high_risk_direct"
+            if new_psyguard_score >= HIGH_RISK_DIRECT_THRESHOLD
+            else "psyguard_medium_risk"
+        )
+        context.update_route(new_route, reason=reason, source="route_updater")
+        return True
+    
+    @staticmethod
+    def update_routes_batch(
+        current_routes: Union[np.ndarray, Sequence[int]],
+        new_psyguard_scores: Union[np.ndarray, Sequence[float]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized version of update_route for many sessions at once.
+        
+        Used for bulk re-evaluation (e.g. rescoring a backlog after a model
+        upgrade). Applies exactly the same one-way rules as update_route:
+        because route codes are ordered by severity, the updated route is the
+        element-wise maximum of the current route and the level implied by
+        the new score.
+        
+        Args:
+            current_routes: Route codes (see ROUTE_CODES: 0=low, 1=medium, 2=high)
+            new_psyguard_scores: New PsyGUARD risk scores (0.0 - 1.0)
+            
+        Returns:
+            Tuple of (updated route codes, boolean upgrade mask)
+        """
+        routes = np.asarray(current_routes)
+        scores = np.asarray(new_psyguard_scores, dtype=np.float64)
+        
+        if routes.shape != scores.shape:
+            raise ValueError(
+                f"Shape mismatch: routes {routes.shape} vs scores {scores.shape}"
+            )
+        if routes.size and not np.issubdtype(routes.dtype, np.integer):
+            raise ValueError(f"Route codes must be integers, got dtype {routes.dtype}")
+        if routes.size and (routes.min() < 0 or routes.max() > ROUTE_CODES["high"]):
+            raise ValueError("Route codes must be 0 (low), 1 (medium) or 2 (high)")
+        
+        # Level implied by the score alone (NaN compares False → low)
+        score_level = np.where(
+            scores >= HIGH_RISK_DIRECT_THRESHOLD,
+            ROUTE_CODES["high"],
+            np.where(scores >= MEDIUM_RISK_THRESHOLD, ROUTE_CODES["medium"], ROUTE_CODES["low"])
+        )
+        
+        updated = np.maximum(routes, score_level).astype(routes.dtype, copy=False)
+        upgraded = updated != routes
+        return updated, upgraded
+    
+    @staticmethod
+    def encode_routes(routes: Sequence[Route]) -> np.ndarray:
+        """Convert route names to an int8 array of route codes."""
+        try:
+            return np.fromiter(
+                (ROUTE_CODES[route] for route in routes),
+                dtype=np.int8,
+                count=len(routes)
+            )
+        except KeyError as e:
+            raise ValueError(f"Unknown route: {e.args[0]}") from None
+    
+    @staticmethod
+    def decode_routes(codes: Union[np.ndarray, Sequence[int]]) -> list[Route]:
+        """Convert route codes back to route names."""
+        return [ROUTE_NAMES[code] for code in np.asarray(codes).tolist()]
 
 
-__all__ = ["RouteUpdater", "Route"]
+__all__ = ["RouteUpdater", "Route", "ROUTE_CODES", "ROUTE_NAMES"]
 
@@ -0,0 +1,219 @@
+"""Shadow routing: evaluate candidate routing rules next to the primary router.
+
+A shadow rule set is a full set of thresholds (PsyGUARD thresholds and
+PHQ-9 / GAD-7 cut-points). For every primary decision, RiskRouter hands the
+decision inputs to a ShadowRoutingEvaluator, which re-decides the route with
+each shadow rule set on a background task and aggregates how often (and how)
+the shadow disagrees with the primary route. Users always get the primary
+route; the hot path only appends the inputs to a bounded queue.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Any, List, Optional, Sequence, Tuple
+
+from src_new.perception.questionnaire_mapper import QuestionnaireMapper, Route
+from src_new.perception.psyguard_service import (
+    MEDIUM_RISK_THRESHOLD,
+    HIGH_RISK_DIRECT_THRESHOLD
+)
+
+logger = logging.getLogger(__name__)
+
+# (phq9_score, gad7_score, phq9_q9_score, chat_risk_score, primary_route)
+ShadowSample = Tuple[float, float, Optional[int], Optional[float], str]
+
+
+@dataclass(frozen=True)
+class RoutingRuleSet:
+    """A complete set of routing thresholds.
+
+    The defaults reproduce the primary rules exactly
+    (QuestionnaireMapper.final_route_decision).
+    """
+    name: str
+    medium_risk_threshold: float = MEDIUM_RISK_THRESHOLD
+    high_risk_direct_threshold: float = HIGH_RISK_DIRECT_THRESHOLD
+    phq9_low_max: float = 9  # PHQ-9 <= this → low
+    phq9_medium_max: float = 14  # PHQ-9 <= this → medium, above → high
+    gad7_low_max: float = 9
+    gad7_medium_max: float = 14
+    phq9_q9_high_min: int = 1  # Q9 >= this → high
+
+    def decide(
+        self,
+        phq9_score: float,
+        gad7_score: float,
+        phq9_q9_score: Optional[int],
+        chat_risk_score: Optional[float] = None
+    ) -> Route:
+        """Decide a route with these thresholds (same rules as the primary)."""
+        if chat_risk_score is not None:
+            if chat_risk_score >= self.high_risk_direct_threshold:
+                return "high"
+            elif chat_risk_score >= self.medium_risk_threshold:
+                return "medium"
+
+        if phq9_q9_score is not None and phq9_q9_score >= self.phq9_q9_high_min:
+            phq9_route = "high"
+        else:
+            phq9_route = self._bucket(phq9_score, self.phq9_low_max, self.phq9_medium_max)
+        gad7_route = self._bucket(gad7_score, self.gad7_low_max, self.gad7_medium_max)
+        return QuestionnaireMapper.combine_routes(phq9_route, gad7_route)
+
+    @staticmethod
+    def _bucket(score: float, low_max: float, medium_max: float) -> Route:
+        if score <= low_max:
+            return "low"
+        elif score <= medium_max:
+            return "medium"
+        return "high"
+
+
+@dataclass
+class _ShadowCounters:
+    """Aggregated agreement counters for one shadow rule set."""
+    decisions: int = 0
+    disagreements: int = 0
+    transitions: Counter = field(default_factory=Counter)  # (primary, shadow) → count
+
+
+class ShadowRoutingEvaluator:
+    """Runs shadow rule sets off the request path and aggregates disagreements.
+
+    Usage:
+        shadow = ShadowRoutingEvaluator([RoutingRuleSet("medium_0.65", medium_risk_threshold=0.65)])
+        await shadow.start()
+        router = RiskRouter(shadow=shadow)
+        ...
+        shadow.get_stats()
+    """
+
+    def __init__(
+        self,
+        rule_sets: Sequence[RoutingRuleSet],
+        max_pending: int = 10_000,
+        batch_size: int = 256,
+        interval: float = 0.1
+    ):
+        """
+        Initialize shadow evaluator.
+
+        Args:
+            rule_sets: Candidate rule sets (names must be unique)
+            max_pending: Max queued samples; further samples are dropped and counted
+            batch_size: Samples evaluated per background step
+            interval: Seconds between background steps when idle
+        """
+        names = [rule_set.name for rule_set in rule_sets]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Shadow rule set names must be unique: {names}")
+
+        self.rule_sets: List[RoutingRuleSet] = list(rule_sets)
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self._pending: Deque[ShadowSample] = deque()
+        self._counters: Dict[str, _ShadowCounters] = {
+            rule_set.name: _ShadowCounters() for rule_set in self.rule_sets
+        }
+        self._dropped = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def submit(
+        self,
+        phq9_score: float,
+        gad7_score: float,
+        phq9_q9_score: Optional[int],
+        chat_risk_score: Optional[float],
+        primary_route: str
+    ) -> bool:
+        """
+        Queue a primary decision for shadow evaluation (O(1), never blocks).
+
+        Returns:
+            False if the sample was dropped because the queue is full
+        """
+        if len(self._pending) >= self.max_pending:
+            self._dropped += 1
+            return False
+        self._pending.append((phq9_score, gad7_score, phq9_q9_score, chat_risk_score, primary_route))
+        return True
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """
+        Evaluate queued samples synchronously.
+
+        Args:
+            limit: Max samples to evaluate (default: all)
+
+        Returns:
+            Number of samples evaluated
+        """
+        evaluated = 0
+        pending = self._pending
+        while pending and (limit is None or evaluated < limit):
+            phq9_score, gad7_score, phq9_q9_score, chat_risk_score, primary = pending.popleft()
+            for rule_set in self.rule_sets:
+                shadow = rule_set.decide(phq9_score, gad7_score, phq9_q9_score, chat_risk_score)
+                counters = self._counters[rule_set.name]
+                counters.decisions += 1
+                if shadow != primary:
+                    counters.disagreements += 1
+                    counters.transitions[(primary, shadow)] += 1
+            evaluated += 1
+        return evaluated
+
+    async def start(self) -> None:
+        """Start the background evaluation task (idempotent)."""
+        if self._task is None:
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while not self._closed:
+            try:
+                evaluated = self.drain(limit=self.batch_size)
+            except Exception as e:
+                logger.error(f"Shadow routing evaluation failed: {e}", exc_info=True)
+                evaluated = 0
+            # Yield between batches; sleep when idle
+            await asyncio.sleep(0 if evaluated == self.batch_size else self.interval)
+
+    async def close(self) -> None:
+        """Stop the background task and evaluate anything still queued."""
+        self._closed = True
+        if self._task is not None:
+            await self._task
+            self._task = None
+        self.drain()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get aggregated disagreement counters per shadow rule set."""
+        rule_sets = {}
+        for name, counters in self._counters.items():
+            rule_sets[name] = {
+                "decisions": counters.decisions,
+                "disagreements": counters.disagreements,
+                "disagreement_rate": (
+                    counters.disagreements / counters.decisions if counters.decisions else 0.0
+                ),
+                "transitions": {
+                    f"{primary}->{shadow}": count
+                    for (primary, shadow), count in sorted(counters.transitions.items())
+                },
+            }
+        return {
+            "pending": len(self._pending),
+            "dropped": self._dropped,
+            "rule_sets": rule_sets,
+        }
+
+
+__all__ = ["RoutingRuleSet", "ShadowRoutingEvaluator"]
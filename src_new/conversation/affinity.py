@@ -0,0 +1,232 @@
+"""User affinity routing across conversation workers.
+
+A shared store (Redis) lets any worker continue any conversation, but
+then every turn pays a remote read for state the previous turn just
+wrote. AffinityRouter is the front door instead: it maps each user_id onto
+a consistent-hash ring of workers, so all of a user's turns reach the same
+worker and its session ring buffer, MediumRiskAgentState, summary and
+ControlContext are always in local memory. The shared store stays the
+durable copy and the fallback after a crash.
+
+When a worker joins or leaves, only the users whose ring position changed
+move (about 1/N of them). Their turns are held at the router while the old
+worker finishes queued turns, writes pending session turns and hands the
+user's hot state to the new worker (UserHandoff); then they resume on the
+new worker. Other users are not paused.
+
+Workers are ConversationPipeline instances in this process, or proxies for
+worker processes exposing the same four methods (UserHandoff must then be
+serialized by the proxy). Ring positions use a stable hash, so a front door
+outside Python can compute the same owner (src_new/shared/hash_ring.py).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Collection, Dict, List, Mapping, Optional, Protocol, Sequence, Tuple
+
+from src_new.shared.deadline import Deadline
+from src_new.shared.hash_ring import ConsistentHashRing
+from src_new.shared.models import ConversationTurn
+
+if TYPE_CHECKING:
+    from src_new.control.control_context import ControlContext
+    from src_new.conversation.summarizer import SessionSummary
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class UserHandoff:
+    """Hot state of one user moving from one worker to another."""
+    user_id: str
+    turns: List[ConversationTurn] = field(default_factory=list)  # Session ring, oldest first
+    medium_state: Optional[Dict[str, Any]] = None  # MediumRiskAgentState.to_dict()
+    summary: Optional["SessionSummary"] = None
+    control_context: Optional["ControlContext"] = None
+
+
+class AffinityWorker(Protocol):
+    """What the router needs from a worker (ConversationPipeline implements it)."""
+
+    async def process_message(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: Optional["ControlContext"] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """Process one turn (control_context None: the one the worker holds)."""
+        ...
+
+    def held_users(self) -> Collection[str]:
+        """Users with state or queued turns on this worker."""
+        ...
+
+    async def release_users(self, user_ids: Sequence[str]) -> List[UserHandoff]:
+        """Finish the users' queued turns, drop their state and return it."""
+        ...
+
+    async def adopt_users(self, handoffs: Sequence[UserHandoff]) -> None:
+        """Hold state released by another worker."""
+        ...
+
+
+class AffinityRouter:
+    """Front door sending every turn of a user to the same worker.
+
+    Usage:
+        router = AffinityRouter({"worker-0": pipeline_0, "worker-1": pipeline_1})
+        result = await router.process_message(user_id, message, control_context)
+        result = await router.process_message(user_id, next_message)   # worker holds the context
+        await router.add_worker("worker-2", pipeline_2)   # moved users handed off
+    """
+
+    def __init__(self, workers: Optional[Mapping[str, AffinityWorker]] = None, replicas: int = 128):
+        """
+        Initialize affinity router.
+
+        Args:
+            workers: Worker name → worker (names are the ring keys; keep them
+                stable across restarts so users keep their worker)
+            replicas: Virtual nodes per worker on the hash ring
+        """
+        self._workers: Dict[str, AffinityWorker] = dict(workers or {})
+        self.ring = ConsistentHashRing(self._workers, replicas=replicas)
+        self._moving: Dict[str, asyncio.Event] = {}
+        self._rebalance_lock = asyncio.Lock()
+        # Metrics
+        self._dispatched: Dict[str, int] = defaultdict(int)
+        self.rebalances = 0
+        self.moved_users = 0
+        self.held_turns = 0
+        self.last_rebalance_ms = 0.0
+
+    def worker_for(self, user_id: str) -> str:
+        """Name of the worker owning a user."""
+        name = self.ring.owner(user_id)
+        if name is None:
+            raise RuntimeError("AffinityRouter has no workers")
+        return name
+
+    async def process_message(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: Optional["ControlContext"] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Process a turn on the user's worker.
+
+        The worker holds the user's ControlContext after their first turn,
+        so later turns may pass None. A turn arriving while its user is
+        being handed over waits until the new worker holds the user's state.
+
+        Returns:
+            The worker's result, plus the worker name under "worker"
+        """
+        gate = self._moving.get(user_id)
+        if gate is not None:
+            self.held_turns += 1
+            await gate.wait()
+        name = self.worker_for(user_id)
+        self._dispatched[name] += 1
+        result = await self._workers[name].process_message(user_id, user_message, control_context, deadline)
+        result["worker"] = name
+        return result
+
+    async def add_worker(self, name: str, worker: AffinityWorker) -> int:
+        """
+        Add a worker and move the users it now owns to it.
+
+        Returns:
+            Number of users handed off
+        """
+        if name in self._workers:
+            raise ValueError(f"Worker {name!r} already exists")
+        ring = self.ring.copy()
+        ring.add(name)
+        self._workers[name] = worker
+        return await self._rebalance(ring)
+
+    async def remove_worker(self, name: str) -> int:
+        """
+        Move a worker's users to the remaining workers and remove it.
+
+        The worker is not shut down; call its shutdown() afterwards.
+
+        Returns:
+            Number of users handed off
+        """
+        if name not in self._workers:
+            raise KeyError(name)
+        if len(self._workers) == 1:
+            raise ValueError("Cannot remove the last worker")
+        ring = self.ring.copy()
+        ring.remove(name)
+        moved = await self._rebalance(ring)
+        del self._workers[name]
+        self._dispatched.pop(name, None)
+        return moved
+
+    async def _rebalance(self, ring: ConsistentHashRing) -> int:
+        async with self._rebalance_lock:
+            started = time.perf_counter()
+            moves: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+            for name, worker in self._workers.items():
+                for user_id in worker.held_users():
+                    owner = ring.owner(user_id)
+                    if owner != name:
+                        moves[(name, owner)].append(user_id)
+
+            # Hold new turns of moving users, then route by the new ring
+            gates = {user_id: asyncio.Event() for users in moves.values() for user_id in users}
+            self._moving.update(gates)
+            self.ring = ring
+            try:
+                await asyncio.gather(*(
+                    self._hand_off(source, target, users) for (source, target), users in moves.items()
+                ))
+            finally:
+                for user_id, gate in gates.items():
+                    if self._moving.get(user_id) is gate:
+                        del self._moving[user_id]
+                    gate.set()
+
+            self.rebalances += 1
+            self.moved_users += len(gates)
+            self.last_rebalance_ms = (time.perf_counter() - started) * 1000
+            logger.info(
+                f"AffinityRouter: rebalanced onto {self.ring.nodes}, "
+                f"{len(gates)} users moved in {self.last_rebalance_ms:.1f} ms"
+            )
+            return len(gates)
+
+    async def _hand_off(self, source: str, target: str, user_ids: List[str]) -> None:
+        handoffs = await self._workers[source].release_users(user_ids)
+        await self._workers[target].adopt_users(handoffs)
+
+    @property
+    def workers(self) -> Dict[str, AffinityWorker]:
+        """Worker name → worker."""
+        return dict(self._workers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get dispatch counts per worker and rebalance statistics."""
+        return {
+            "workers": self.ring.nodes,
+            "dispatched": {name: self._dispatched.get(name, 0) for name in self._workers},
+            "rebalances": self.rebalances,
+            "moved_users": self.moved_users,
+            "moving_users": len(self._moving),
+            "held_turns": self.held_turns,
+            "last_rebalance_ms": self.last_rebalance_ms,
+        }
+
+
+__all__ = ["AffinityRouter", "AffinityWorker", "UserHandoff"]
@@ -0,0 +1,447 @@
+"""Bounded per-user store for agent state.
+
+Agent state (e.g. MediumRiskAgentState) used to live in a plain dict that
+only shrank when a conversation was explicitly cleared, so a long-running
+worker held state for every user it had ever seen. This store keeps at most
+`max_users` entries, evicting the least recently used one when full and any
+entry unused for longer than `ttl`.
+
+An optional spill backend keeps evicted state: it is written on eviction and
+read back on the user's next access, so a returning user resumes where they
+left off instead of starting over. Without one, evicted state is dropped.
+With a shared backend (Redis), persist() after each turn makes the backend
+the source of truth and the in-memory entries a cache.
+
+Backend I/O stays off the event loop: on a running loop, evicted state is
+serialized at once and written behind in a worker thread (reads of a state
+still being written are served from memory), and prefetch() / get_async()
+read in a worker thread. Synchronous get() / flush() are for callers
+without a running loop.
+
+Size max_users above the number of users active at the same time; state
+evicted while a turn is still updating it keeps only the changes made
+before the eviction.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Iterable, Optional, Protocol, Sequence, TypeVar
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+S = TypeVar("S")
+
+
+class StateSpillBackend(Protocol):
+    """Persistent home for evicted agent state (plain JSON-compatible dicts)."""
+
+    def save(self, key: str, data: Dict[str, Any]) -> None:
+        """Store state for a key, replacing any previous value."""
+        ...
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get stored state for a key, or None."""
+        ...
+
+    def delete(self, key: str) -> None:
+        """Forget stored state for a key."""
+        ...
+
+
+class JsonFileSpillBackend:
+    """Spill backend writing one JSON file per user into a directory."""
+
+    def __init__(self, directory: str | Path):
+        """
+        Initialize file spill backend.
+
+        Args:
+            directory: Directory for state files (created if missing)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{quote(key, safe='')}.json"
+
+    def save(self, key: str, data: Dict[str, Any]) -> None:
+        """Store state for a key, replacing any previous value."""
+        self._path(key).write_text(json.dumps(data), encoding="utf-8")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get stored state for a key, or None."""
+        path = self._path(key)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def delete(self, key: str) -> None:
+        """Forget stored state for a key."""
+        self._path(key).unlink(missing_ok=True)
+
+
+@dataclass(slots=True)
+class _StoredState(Generic[S]):
+    state: S
+    last_used: float
+
+
+class AgentStateStore(Generic[S]):
+    """Bounded LRU + TTL map of user_id → agent state, with optional spill."""
+
+    def __init__(
+        self,
+        factory: Callable[[], S],
+        max_users: int = 10_000,
+        ttl: float = 3600.0,
+        spill: Optional[StateSpillBackend] = None,
+        dump: Optional[Callable[[S], Dict[str, Any]]] = None,
+        load: Optional[Callable[[Dict[str, Any]], S]] = None,
+        size_of: Optional[Callable[[S], int]] = None
+    ):
+        """
+        Initialize agent state store.
+
+        Args:
+            factory: Creates fresh state for a new user
+            max_users: Max states kept in memory (least recently used evicted)
+            ttl: Seconds an unused state stays in memory
+            spill: Backend receiving evicted state (optional; requires dump/load)
+            dump: Converts state to a JSON-compatible dict for the spill backend
+            load: Rebuilds state from a dict returned by the spill backend
+            size_of: Approximate bytes held by one state (for memory metrics)
+        """
+        if spill is not None and (dump is None or load is None):
+            raise ValueError("A spill backend requires dump and load functions")
+        self.factory = factory
+        self.max_users = max_users
+        self.ttl = ttl
+        self.spill = spill
+        self._dump = dump
+        self._load = load
+        self._size_of = size_of or sys.getsizeof
+        self._entries: "OrderedDict[str, _StoredState[S]]" = OrderedDict()
+        # Write-behind spills: queued, and being written by _write_spills
+        self._spill_queue: Dict[str, Dict[str, Any]] = {}
+        self._spilling: Dict[str, Dict[str, Any]] = {}
+        self._spill_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.spilled = 0
+        self.restored = 0
+        self.spill_errors = 0
+
+    def get(self, key: str) -> S:
+        """Get state for a user, restoring it from the spill backend or creating it.
+
+        A miss reads the backend on the calling thread; on the event loop use
+        get_async() (or prefetch() first).
+        """
+        state = self._lookup(key)
+        if state is not None:
+            return state
+        return self._insert(key, self._restore(key))
+
+    async def get_async(self, key: str) -> S:
+        """Get state for a user like get(), reading the spill backend in a worker thread."""
+        state = self._lookup(key)
+        if state is not None:
+            return state
+        data = self._unwritten(key)
+        if data is None and self.spill is not None:
+            try:
+                data = await asyncio.to_thread(self.spill.load, key)
+            except Exception as e:
+                self.spill_errors += 1
+                logger.warning(f"AgentStateStore: failed to restore state for {key}: {e}")
+            # Another caller may have restored or created it meanwhile
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry.state
+        return self._insert(key, self._rebuild(key, data))
+
+    def _lookup(self, key: str) -> Optional[S]:
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry.last_used = now
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.state
+
+    def _insert(self, key: str, state: Optional[S]) -> S:
+        if state is None:
+            state = self.factory()
+        self._entries[key] = _StoredState(state=state, last_used=time.monotonic())
+        self._evict_overflow()
+        return state
+
+    def peek(self, key: str) -> Optional[S]:
+        """Get in-memory state without creating it or changing its recency."""
+        entry = self._entries.get(key)
+        return entry.state if entry is not None else None
+
+    def put(self, key: str, state: S) -> None:
+        """Store state for a user in memory (e.g. handed over by another worker)."""
+        self._entries[key] = _StoredState(state=state, last_used=time.monotonic())
+        self._entries.move_to_end(key)
+        self._evict_overflow()
+
+    def pop(self, key: str) -> Optional[S]:
+        """Remove a user's state from memory only; the spill backend keeps its copy."""
+        entry = self._entries.pop(key, None)
+        return entry.state if entry is not None else None
+
+    def discard(self, key: str) -> None:
+        """Drop a user's state from memory and from the spill backend."""
+        self._entries.pop(key, None)
+        self._spill_queue.pop(key, None)
+        if self.spill is not None:
+            try:
+                self.spill.delete(key)
+            except Exception as e:
+                self.spill_errors += 1
+                logger.warning(f"AgentStateStore: failed to delete spilled state for {key}: {e}")
+
+    def flush(self) -> int:
+        """
+        Write every in-memory state to the spill backend (e.g. on shutdown).
+
+        Returns:
+            Number of states written
+        """
+        if self.spill is None:
+            return 0
+        pending, self._spill_queue = self._spill_queue, {}
+        written = 0
+        for key, data in pending.items():
+            written += self._save(key, data)
+        for key, entry in self._entries.items():
+            written += self._save(key, self._dump(entry.state))
+        return written
+
+    async def drain(self) -> None:
+        """Wait until queued eviction spills have been written."""
+        while self._spill_task is not None:
+            await asyncio.shield(self._spill_task)
+
+    async def persist(self, key: str) -> bool:
+        """
+        Write a user's in-memory state to the spill backend now (e.g. after a turn).
+
+        The state is serialized on the event loop and written in a worker thread.
+
+        Returns:
+            Whether the state was written
+        """
+        entry = self._entries.get(key)
+        if entry is None or self.spill is None:
+            return False
+        data = self._dump(entry.state)
+        try:
+            # Ordered after any in-flight spill of an older copy of this state
+            async with self._write_lock:
+                await asyncio.to_thread(self.spill.save, key, data)
+        except Exception as e:
+            self.spill_errors += 1
+            logger.warning(f"AgentStateStore: failed to persist state for {key}: {e}")
+            return False
+        self.spilled += 1
+        return True
+
+    async def prefetch(self, keys: Sequence[str]) -> int:
+        """
+        Load spilled state for users not in memory, in one backend read if
+        the backend supports `load_many` (e.g. before a batch of turns).
+
+        Returns:
+            Number of states restored
+        """
+        if self.spill is None:
+            return 0
+        missing = [key for key in dict.fromkeys(keys) if key not in self._entries]
+        if not missing:
+            return 0
+        loaded = {key: self._unwritten(key) for key in missing}
+        unread = [key for key in missing if loaded[key] is None]
+        load_many = getattr(self.spill, "load_many", None)
+        try:
+            if unread and load_many is not None:
+                loaded.update(await asyncio.to_thread(load_many, unread))
+            else:
+                for key in unread:
+                    loaded[key] = await asyncio.to_thread(self.spill.load, key)
+        except Exception as e:
+            # States taken from the spill queue above are still restored
+            self.spill_errors += 1
+            logger.warning(f"AgentStateStore: prefetch of {len(unread)} states failed: {e}")
+
+        now = time.monotonic()
+        restored = 0
+        for key in missing:
+            data = loaded.get(key)
+            if data is None or key in self._entries:
+                continue
+            try:
+                state = self._load(data)
+            except Exception as e:
+                self.spill_errors += 1
+                logger.warning(f"AgentStateStore: failed to restore state for {key}: {e}")
+                continue
+            self._entries[key] = _StoredState(state=state, last_used=now)
+            restored += 1
+        self.restored += restored
+        self._evict_overflow()
+        return restored
+
+    def sweep(self) -> int:
+        """
+        Evict every state unused for longer than the TTL.
+
+        Returns:
+            Number of states evicted
+        """
+        before = self.expirations
+        self._expire(time.monotonic())
+        return self.expirations - before
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in recency order, so expired ones are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry.last_used <= self.ttl:
+                break
+            del self._entries[key]
+            self.expirations += 1
+            self._spill(key, entry.state)
+
+    def _evict_overflow(self) -> None:
+        while len(self._entries) > self.max_users:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self.evictions += 1
+            self._spill(evicted_key, evicted.state)
+
+    def _spill(self, key: str, state: S) -> None:
+        if self.spill is None:
+            return
+        data = self._dump(state)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._save(key, data)
+            return
+        self._spill_queue[key] = data
+        if self._spill_task is None:
+            self._spill_task = asyncio.create_task(self._write_spills())
+
+    async def _write_spills(self) -> None:
+        try:
+            while self._spill_queue:
+                async with self._write_lock:
+                    self._spilling, self._spill_queue = self._spill_queue, {}
+                    try:
+                        for key, data in self._spilling.items():
+                            try:
+                                await asyncio.to_thread(self.spill.save, key, data)
+                            except Exception as e:
+                                self.spill_errors += 1
+                                logger.warning(f"AgentStateStore: failed to spill state for {key}: {e}")
+                                continue
+                            self.spilled += 1
+                    finally:
+                        self._spilling = {}
+        finally:
+            self._spill_task = None
+
+    def _save(self, key: str, data: Dict[str, Any]) -> int:
+        try:
+            self.spill.save(key, data)
+        except Exception as e:
+            self.spill_errors += 1
+            logger.warning(f"AgentStateStore: failed to spill state for {key}: {e}")
+            return 0
+        self.spilled += 1
+        return 1
+
+    def _unwritten(self, key: str) -> Optional[Dict[str, Any]]:
+        # Evicted state whose spill hasn't reached the backend yet. Taking it
+        # out of the queue drops the stale write; one already being written
+        # finishes before any later persist() of the restored state.
+        data = self._spill_queue.pop(key, None)
+        return data if data is not None else self._spilling.get(key)
+
+    def _restore(self, key: str) -> Optional[S]:
+        if self.spill is None:
+            return None
+        data = self._unwritten(key)
+        if data is None:
+            try:
+                data = self.spill.load(key)
+            except Exception as e:
+                self.spill_errors += 1
+                logger.warning(f"AgentStateStore: failed to restore state for {key}: {e}")
+                return None
+        return self._rebuild(key, data)
+
+    def _rebuild(self, key: str, data: Optional[Dict[str, Any]]) -> Optional[S]:
+        if data is None:
+            return None
+        try:
+            state = self._load(data)
+        except Exception as e:
+            self.spill_errors += 1
+            logger.warning(f"AgentStateStore: failed to restore state for {key}: {e}")
+            return None
+        self.restored += 1
+        return state
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> Iterable[str]:
+        """User ids currently held in memory."""
+        return self._entries.keys()
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by in-memory states (walks every state)."""
+        return sum(self._size_of(entry.state) for entry in self._entries.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store and memory statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "approx_bytes": self.memory_bytes(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "spilled": self.spilled,
+            "restored": self.restored,
+            "spill_errors": self.spill_errors,
+            "pending_spills": len(self._spill_queue) + len(self._spilling),
+        }
+
+
+__all__ = ["AgentStateStore", "StateSpillBackend", "JsonFileSpillBackend"]
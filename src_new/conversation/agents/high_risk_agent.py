@@ -24,6 +24,19 @@ Would you like help finding resources in your area, or would you prefer to speak
 
 SAFETY_BANNER = "If you are in immediate danger, call or text 988 (US). If outside the US, contact local emergency services."
 
+# The reply is the same for every user, so it is built once (callers get a shallow copy)
+FIXED_SAFETY_RESULT: Dict[str, Any] = {
+    "agent": "high_risk",
+    "response": FIXED_SAFETY_SCRIPT,
+    "temperature": 0.0,  # Not used (fixed script)
+    "structured": True,
+    "safety_banner": SAFETY_BANNER,
+    "safety_priority": True,
+    "fixed_script": True,
+    "crisis_hotline": "988",
+    "urgent_meeting_suggested": True
+}
+
 
 class HighRiskAgent:
     """High Risk Agent with fixed script for crisis intervention.
@@ -60,23 +73,16 @@ class HighRiskAgent:
         logger.warning(
             f"HighRiskAgent: Using fixed safety script (rigid_score={rigid_score})"
         )
-        
+        return self.fixed_response()
+    
+    def fixed_response(self) -> Dict[str, Any]:
+        """Fixed safety response, synchronously (no I/O, no LLM)."""
         # HIGH RISK: Always use fixed script, NO free-form LLM response
-        return {
-            "agent": "high_risk",
-            "response": FIXED_SAFETY_SCRIPT,
-            "temperature": 0.0,  # Not used (fixed script)
-            "structured": True,
-            "safety_banner": SAFETY_BANNER,
-            "safety_priority": True,
-            "fixed_script": True,
-            "crisis_hotline": "988",
-            "urgent_meeting_suggested": True
-        }
+        return dict(FIXED_SAFETY_RESULT)
     
     def get_script(self) -> str:
         """Get the fixed safety script."""
         return FIXED_SAFETY_SCRIPT
 
 
-__all__ = ["HighRiskAgent", "FIXED_SAFETY_SCRIPT", "SAFETY_BANNER"]
+__all__ = ["HighRiskAgent", "FIXED_SAFETY_SCRIPT", "FIXED_SAFETY_RESULT", "SAFETY_BANNER"]
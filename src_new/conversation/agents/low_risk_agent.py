@@ -6,6 +6,12 @@ import logging
 from typing import Dict, Any, Optional, List
 
 from src.services.ollama_service import OllamaService
+from src_new.conversation.llm.gateway import LLMGateway, get_llm_gateway
+from src_new.conversation.llm.admission import LLMPriority
+from src_new.conversation.llm.models import LLMRequest
+from src_new.conversation.llm.prompt import build_prompt_window, build_turn_prompt, session_context_key
+from src_new.shared.deadline import Deadline, remaining_or
+from src_new.shared.keywords import KEYWORDS, has_keyword
 from src_new.shared.models import ConversationTurn
 
 logger = logging.getLogger(__name__)
@@ -28,6 +34,8 @@ Guidelines:
 
 Remember: This is a low-risk conversation, so you have high flexibility to engage naturally."""
 
+FALLBACK_RESPONSE = "I'm here to listen. How can I help you today?"
+
 
 class LowRiskAgent:
     """Low Risk Agent for free empathetic chat with coping skills.
@@ -38,17 +46,33 @@ class LowRiskAgent:
     - Continue until user says goodbye
     """
     
-    def __init__(self, llm_service: Optional[OllamaService] = None):
-        """Initialize Low Risk Agent."""
-        self.llm_service = llm_service or OllamaService()
+    def __init__(
+        self,
+        llm_service: Optional[OllamaService] = None,
+        gateway: Optional[LLMGateway] = None
+    ):
+        """
+        Initialize Low Risk Agent.
+        
+        Args:
+            llm_service: Ollama service (defaults to the gateway's service)
+            gateway: Shared LLM gateway (defaults to the global gateway)
+        """
+        self.gateway = gateway or get_llm_gateway()
+        self.llm_service = llm_service or self.gateway.llm_service
         self.temperature = 0.9  # High flexibility
         self.max_tokens = 512
+        self.history_token_budget = 1024  # Free chat: as much recent history as fits
     
     async def generate_response(
         self,
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]] = None,
-        rigid_score: float = 0.0
+        rigid_score: float = 0.0,
+        user_id: Optional[str] = None,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Generate empathetic response for low-risk conversation.
@@ -57,6 +81,12 @@ class LowRiskAgent:
             user_message: User's message
             conversation_history: Previous conversation turns
             rigid_score: Rigidity score (0.0-1.0), affects temperature
+            user_id: Session owner; enables Ollama context reuse across turns
+            summary: Rolling summary of turns older than conversation_history
+            deadline: Request deadline bounding the LLM call; once it has
+                passed the fallback reply is returned without calling the LLM
+            turn_seq: Session turn sequence number (SessionService.turn_seq)
+                keying Ollama context reuse
             
         Returns:
             Dict with response and metadata
@@ -65,76 +95,43 @@ class LowRiskAgent:
             # Adjust temperature based on rigidity
             adjusted_temp = max(0.1, self.temperature - 0.8 * rigid_score)
             
-            # Build conversation context
-            messages = []
-            
-            # Add system prompt
-            messages.append({
-                "role": "system",
-                "content": LOW_RISK_SYSTEM_PROMPT
-            })
-            
-            # Add conversation history
-            if conversation_history:
-                for turn in conversation_history[-6:]:  # Last 6 turns
-                    messages.append({
-                        "role": turn.role,
-                        "content": turn.text
-                    })
-            
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": user_message
-            })
-            
-            # Generate response using Ollama API directly
-            # Build prompt from messages
-            prompt_parts = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    prompt_parts.append(f"System: {msg['content']}")
-                elif msg["role"] == "user":
-                    prompt_parts.append(f"User: {msg['content']}")
-                elif msg["role"] == "assistant":
-                    prompt_parts.append(f"Assistant: {msg['content']}")
-            prompt_parts.append("Assistant:")
-            prompt = "\n".join(prompt_parts)
+            if deadline is not None and deadline.expired:
+                return {
+                    "agent": "low_risk",
+                    "response": FALLBACK_RESPONSE,
+                    "temperature": adjusted_temp,
+                    "structured": False,
+                    "safety_banner": None,
+                    "coping_skills_suggested": False,
+                    "deadline_exceeded": True
+                }
             
-            # Call Ollama API directly
-            if not self.llm_service.is_loaded:
-                await self.llm_service.load_model()
+            window = build_prompt_window(
+                [LOW_RISK_SYSTEM_PROMPT],
+                user_message,
+                conversation_history,
+                history_budget=self.history_token_budget,
+                max_tokens=self.max_tokens,
+                summary=summary
+            )
             
-            import httpx
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                try:
-                    response = await client.post(
-                        f"{self.llm_service.base_url}/api/generate",
-                        json={
-                            "model": self.llm_service.model_name,
-                            "prompt": prompt,
-                            "stream": False,
-                            "options": {
-                                "num_predict": self.max_tokens,
-                                "temperature": adjusted_temp,
-                                "top_p": 0.9,
-                                "top_k": 40,
-                                "num_ctx": 2048,
-                                "repeat_penalty": 1.1,
-                            }
-                        },
-                        timeout=30.0
+            # Generate through the shared LLM gateway
+            result = await self.gateway.generate(LLMRequest(
+                prompt=window.prompt,
+                temperature=adjusted_temp,
+                max_tokens=self.max_tokens,
+                fallback=FALLBACK_RESPONSE,
+                deadline=remaining_or(deadline, None),
+                priority=LLMPriority.LOW_RISK,
+                session=(
+                    session_context_key(
+                        user_id, [LOW_RISK_SYSTEM_PROMPT, summary or ""], conversation_history, turn_seq
                     )
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        response_text = result.get("response", "").strip()
-                    else:
-                        logger.warning(f"Ollama API error: {response.status_code}")
-                        response_text = "I'm here to listen. How can I help you today?"
-                except Exception as e:
-                    logger.warning(f"Ollama API error: {e}")
-                    response_text = "I'm here to listen. How can I help you today?"
+                    if user_id else None
+                ),
+                turn_prompt=build_turn_prompt(user_message)
+            ))
+            response_text = result.text
             
             logger.info(f"LowRiskAgent generated response (temp={adjusted_temp:.2f})")
             
@@ -144,35 +141,28 @@ class LowRiskAgent:
                 "temperature": adjusted_temp,
                 "structured": False,
                 "safety_banner": None,
-                "coping_skills_suggested": self._detect_coping_skills(response_text)
+                "coping_skills_suggested": self._detect_coping_skills(response_text),
+                "llm": result.to_metadata(),
+                "history": window.to_metadata()
             }
             
         except Exception as e:
             logger.error(f"Error in LowRiskAgent: {e}", exc_info=True)
             return {
                 "agent": "low_risk",
-                "response": "I'm here to listen. How can I help you today?",
+                "response": FALLBACK_RESPONSE,
                 "error": str(e),
                 "temperature": adjusted_temp if 'adjusted_temp' in locals() else self.temperature
             }
     
     def _detect_coping_skills(self, response: str) -> bool:
         """Detect if response suggests coping skills."""
-        coping_keywords = [
-            "breathing", "journal", "mindfulness", "exercise", "meditation",
-            "relaxation", "coping", "strategy", "technique", "practice"
-        ]
-        response_lower = response.lower()
-        return any(keyword in response_lower for keyword in coping_keywords)
+        # Uncached: every reply is new text
+        return "coping" in KEYWORDS.scan(response)
     
     def is_goodbye(self, user_message: str) -> bool:
         """Check if user is saying goodbye."""
-        goodbye_keywords = [
-            "goodbye", "bye", "see you", "thanks", "thank you",
-            "that's all", "done", "finished", "gotta go"
-        ]
-        message_lower = user_message.lower()
-        return any(keyword in message_lower for keyword in goodbye_keywords)
+        return has_keyword(user_message, "goodbye")
 
 
 __all__ = ["LowRiskAgent"]
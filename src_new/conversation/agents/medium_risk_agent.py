@@ -3,22 +3,30 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, Any, Optional, List, Literal
+import sys
+from collections import deque
+from typing import Deque, Dict, Any, Optional, List, Literal
 from enum import Enum
 from dataclasses import dataclass, field
 
 from src.services.ollama_service import OllamaService
+from src_new.conversation.agent_state_store import AgentStateStore, StateSpillBackend
+from src_new.conversation.llm.gateway import LLMGateway, get_llm_gateway
+from src_new.conversation.llm.admission import LLMPriority
+from src_new.conversation.llm.models import LLMRequest
+from src_new.conversation.llm.prompt import build_prompt_window, build_turn_prompt, session_context_key
+from src_new.shared.deadline import Deadline, remaining_or
+from src_new.shared.keywords import KEYWORD_SETS, RESISTANCE_TYPES, first_resistance, has_keyword
 from src_new.shared.models import ConversationTurn
 
 logger = logging.getLogger(__name__)
 
-# Resistance keywords
+# Resistance / acceptance keywords (managed in src_new.shared.keywords)
 RESISTANCE_KEYWORDS = {
-    "privacy": ["privacy", "private", "anonymous", "personal", "confidential"],
-    "time": ["time", "busy", "schedule", "don't have time", "no time"],
-    "stigma": ["stigma", "embarrassed", "ashamed", "judge", "judgment"],
-    "doubt": ["doubt", "not sure", "don't think", "won't help", "doesn't work"]
+    resistance_type: KEYWORD_SETS[f"resistance.{resistance_type}"]
+    for resistance_type in RESISTANCE_TYPES
 }
+ACCEPTANCE_KEYWORDS = KEYWORD_SETS["acceptance"]
 
 # System prompts for different states
 MEDIUM_RISK_SYSTEM_PROMPT = """You are a supportive and empathetic mental health assistant for teens.
@@ -48,6 +56,15 @@ Your task:
 
 Be understanding but persistent (within the 5-turn limit)."""
 
+ACCEPTANCE_PROMPT = "The user has accepted joining the peer support group. Confirm this and provide next steps."
+
+RESOURCES_PROMPT = "The user has declined joining the peer support group after multiple attempts. Provide self-help resources and support options."
+
+FALLBACK_RESPONSE = "I understand this is important. Let's work through this together."
+
+# Turns kept per user state; older ones live in SessionService
+MAX_STORED_TURNS = 10
+
 
 class MediumRiskState(Enum):
     """State machine states for Medium Risk Agent."""
@@ -59,14 +76,129 @@ class MediumRiskState(Enum):
     PROVIDING_RESOURCES = "providing_resources"
 
 
-@dataclass
+@dataclass(slots=True)
 class MediumRiskAgentState:
     """State for Medium Risk Agent."""
     current_state: MediumRiskState = MediumRiskState.INITIAL_SUGGESTION
     resistance_count: int = 0
     detected_resistance_type: Optional[str] = None
     max_persuasion_turns: int = 5
-    conversation_turns: List[Dict[str, Any]] = field(default_factory=list)
+    # Ring buffer: only the most recent turns are kept
+    conversation_turns: Deque[Dict[str, Any]] = field(
+        default_factory=lambda: deque(maxlen=MAX_STORED_TURNS)
+    )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a JSON-compatible dict (for state spill)."""
+        return {
+            "current_state": self.current_state.value,
+            "resistance_count": self.resistance_count,
+            "detected_resistance_type": self.detected_resistance_type,
+            "max_persuasion_turns": self.max_persuasion_turns,
+            "conversation_turns": list(self.conversation_turns),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MediumRiskAgentState":
+        """Rebuild state serialized by to_dict()."""
+        return cls(
+            current_state=MediumRiskState(data["current_state"]),
+            resistance_count=data.get("resistance_count", 0),
+            detected_resistance_type=data.get("detected_resistance_type"),
+            max_persuasion_turns=data.get("max_persuasion_turns", 5),
+            conversation_turns=deque(data.get("conversation_turns", []), maxlen=MAX_STORED_TURNS),
+        )
+
+    def approx_bytes(self) -> int:
+        """Approximate memory held by this state, including stored turn text."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.conversation_turns)
+        for turn in self.conversation_turns:
+            size += sys.getsizeof(turn) + sum(sys.getsizeof(value) for value in turn.values())
+        return size
+
+
+class MediumRiskAction(Enum):
+    """The single generation issued for a turn."""
+    SUGGEST_PEER_GROUP = "suggest_peer_group"
+    ADDRESS_RESISTANCE = "address_resistance"
+    CONFIRM_ACCEPTANCE = "confirm_acceptance"
+    PROVIDE_RESOURCES = "provide_resources"
+
+
+@dataclass(frozen=True, slots=True)
+class MediumRiskTransition:
+    """Planned outcome of a turn: what to generate and the state afterwards."""
+    action: MediumRiskAction
+    next_state: MediumRiskState
+    resistance_count: int
+    resistance_type: Optional[str]
+    peer_group_accepted: bool = False
+
+
+def detect_resistance(user_message: str) -> Optional[str]:
+    """Detect resistance type from user message (first in RESISTANCE_TYPES order)."""
+    return first_resistance(user_message)
+
+
+def is_acceptance(user_message: str) -> bool:
+    """Check if user message indicates acceptance."""
+    return has_keyword(user_message, "acceptance")
+
+
+def plan_transition(state: MediumRiskAgentState, user_message: str) -> MediumRiskTransition:
+    """
+    Decide the next state and the one generation to run for a turn.
+
+    Pure and synchronous: reads the current state and the message only,
+    so it can be tested without an LLM. The agent applies the returned
+    transition after generating.
+
+    Args:
+        state: User's current state (not modified)
+        user_message: User's message
+
+    Returns:
+        MediumRiskTransition
+    """
+    current = state.current_state
+    count = state.resistance_count
+    resistance_type = state.detected_resistance_type
+
+    if current == MediumRiskState.INITIAL_SUGGESTION:
+        new_resistance = detect_resistance(user_message)
+        if new_resistance:
+            next_state, count, resistance_type = MediumRiskState.HANDLING_RESISTANCE, 1, new_resistance
+        elif is_acceptance(user_message):
+            next_state = MediumRiskState.ACCEPTED
+        else:
+            next_state = MediumRiskState.DETECTING_RESISTANCE
+        return MediumRiskTransition(MediumRiskAction.SUGGEST_PEER_GROUP, next_state, count, resistance_type)
+
+    if current == MediumRiskState.HANDLING_RESISTANCE:
+        count += 1
+        if count > state.max_persuasion_turns:
+            return MediumRiskTransition(
+                MediumRiskAction.PROVIDE_RESOURCES, MediumRiskState.REJECTED, count, resistance_type
+            )
+        if is_acceptance(user_message):
+            return MediumRiskTransition(
+                MediumRiskAction.ADDRESS_RESISTANCE, MediumRiskState.ACCEPTED, count, resistance_type,
+                peer_group_accepted=True
+            )
+        # A newly voiced concern is addressed in this turn's reply
+        resistance_type = detect_resistance(user_message) or resistance_type
+        return MediumRiskTransition(
+            MediumRiskAction.ADDRESS_RESISTANCE, MediumRiskState.HANDLING_RESISTANCE, count, resistance_type
+        )
+
+    if current == MediumRiskState.ACCEPTED:
+        return MediumRiskTransition(MediumRiskAction.CONFIRM_ACCEPTANCE, current, count, resistance_type)
+
+    if current == MediumRiskState.REJECTED:
+        return MediumRiskTransition(MediumRiskAction.PROVIDE_RESOURCES, current, count, resistance_type)
+
+    # Default: handle as initial suggestion
+    return MediumRiskTransition(MediumRiskAction.SUGGEST_PEER_GROUP, current, count, resistance_type)
 
 
 class MediumRiskAgent:
@@ -79,34 +211,68 @@ class MediumRiskAgent:
     - State machine: Initial → Detecting → Handling → Accepted/Rejected
     """
     
-    def __init__(self, llm_service: Optional[OllamaService] = None):
-        """Initialize Medium Risk Agent."""
-        self.llm_service = llm_service or OllamaService()
+    def __init__(
+        self,
+        llm_service: Optional[OllamaService] = None,
+        gateway: Optional[LLMGateway] = None,
+        max_users: int = 10_000,
+        state_ttl: float = 3600.0,
+        state_spill: Optional[StateSpillBackend] = None
+    ):
+        """
+        Initialize Medium Risk Agent.
+        
+        Args:
+            llm_service: Ollama service (defaults to the gateway's service)
+            gateway: Shared LLM gateway (defaults to the global gateway)
+            max_users: Max user states kept in memory (least recently used evicted)
+            state_ttl: Seconds an idle user's state stays in memory
+            state_spill: Backend keeping evicted states (optional; without it
+                an evicted user starts over at the initial suggestion); with a
+                shared backend (RedisStateBackend) any worker can resume a user
+        """
+        self.gateway = gateway or get_llm_gateway()
+        self.llm_service = llm_service or self.gateway.llm_service
         self.temperature = 0.6  # Semi-structured
         self.max_tokens = 512
-        # Per-user state storage
-        self._user_states: Dict[str, MediumRiskAgentState] = {}
+        self.history_token_budget = 768  # Structured turns need less history than free chat
+        # Per-user state storage (bounded: LRU + idle TTL)
+        self._user_states: AgentStateStore[MediumRiskAgentState] = AgentStateStore(
+            MediumRiskAgentState,
+            max_users=max_users,
+            ttl=state_ttl,
+            spill=state_spill,
+            dump=MediumRiskAgentState.to_dict,
+            load=MediumRiskAgentState.from_dict,
+            size_of=MediumRiskAgentState.approx_bytes
+        )
+    
+    @property
+    def state_store(self) -> AgentStateStore[MediumRiskAgentState]:
+        """Per-user state store (e.g. to prefetch a user's state before a turn)."""
+        return self._user_states
     
     def _get_state(self, user_id: str) -> MediumRiskAgentState:
         """Get or create state for user."""
-        if user_id not in self._user_states:
-            self._user_states[user_id] = MediumRiskAgentState()
-        return self._user_states[user_id]
+        return self._user_states.get(user_id)
+    
+    def get_state(self, user_id: str) -> MediumRiskAgentState:
+        """Get or create state for user (public accessor for state managers)."""
+        return self._get_state(user_id)
     
     def _detect_resistance(self, user_message: str) -> Optional[str]:
         """Detect resistance type from user message."""
-        message_lower = user_message.lower()
-        for resistance_type, keywords in RESISTANCE_KEYWORDS.items():
-            if any(keyword in message_lower for keyword in keywords):
-                return resistance_type
-        return None
+        return detect_resistance(user_message)
     
     async def generate_response(
         self,
         user_id: str,
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]] = None,
-        rigid_score: float = 0.0
+        rigid_score: float = 0.0,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Generate response for medium-risk conversation with state machine.
@@ -116,71 +282,33 @@ class MediumRiskAgent:
             user_message: User's message
             conversation_history: Previous conversation turns
             rigid_score: Rigidity score (0.0-1.0)
+            summary: Rolling summary of turns older than conversation_history
+            deadline: Request deadline bounding the LLM call; once it has
+                passed the fallback reply is returned without calling the LLM
+            turn_seq: Session turn sequence number (SessionService.turn_seq)
+                keying Ollama context reuse
             
         Returns:
             Dict with response and metadata
         """
         try:
-            state = self._get_state(user_id)
+            # Spilled state is read in a worker thread, never on the event loop
+            state = await self._user_states.get_async(user_id)
             
             # Adjust temperature based on rigidity
             adjusted_temp = max(0.1, self.temperature - 0.8 * rigid_score)
             
-            # State machine logic
-            if state.current_state == MediumRiskState.INITIAL_SUGGESTION:
-                response = await self._handle_initial_suggestion(
-                    user_message, conversation_history, adjusted_temp
-                )
-                # Check for resistance
-                resistance_type = self._detect_resistance(user_message)
-                if resistance_type:
-                    state.current_state = MediumRiskState.HANDLING_RESISTANCE
-                    state.detected_resistance_type = resistance_type
-                    state.resistance_count = 1
-                else:
-                    # Check if user accepts
-                    if self._is_acceptance(user_message):
-                        state.current_state = MediumRiskState.ACCEPTED
-                    else:
-                        state.current_state = MediumRiskState.DETECTING_RESISTANCE
-                        
-            elif state.current_state == MediumRiskState.HANDLING_RESISTANCE:
-                response = await self._handle_resistance(
-                    user_id, user_message, conversation_history, adjusted_temp
-                )
-                # Update resistance count
-                state.resistance_count += 1
-                
-                # Check if exceeded max turns
-                if state.resistance_count > state.max_persuasion_turns:
-                    state.current_state = MediumRiskState.REJECTED
-                    response = await self._provide_resources(
-                        user_message, conversation_history, adjusted_temp
-                    )
-                elif self._is_acceptance(user_message):
-                    state.current_state = MediumRiskState.ACCEPTED
-                    response["peer_group_accepted"] = True
-                else:
-                    # Check for new resistance type
-                    new_resistance = self._detect_resistance(user_message)
-                    if new_resistance and new_resistance != state.detected_resistance_type:
-                        state.detected_resistance_type = new_resistance
-                    
-            elif state.current_state == MediumRiskState.ACCEPTED:
-                response = await self._confirm_acceptance(
-                    user_message, conversation_history, adjusted_temp
-                )
-                
-            elif state.current_state == MediumRiskState.REJECTED:
-                response = await self._provide_resources(
-                    user_message, conversation_history, adjusted_temp
-                )
-                
-            else:
-                # Default: handle as initial suggestion
-                response = await self._handle_initial_suggestion(
-                    user_message, conversation_history, adjusted_temp
-                )
+            # Plan the transition first, then run exactly one generation for it
+            plan = plan_transition(state, user_message)
+            response = await self._run_action(
+                plan, user_id, user_message, conversation_history, adjusted_temp, summary, deadline, turn_seq
+            )
+            if plan.peer_group_accepted:
+                response["peer_group_accepted"] = True
+            
+            state.current_state = plan.next_state
+            state.resistance_count = plan.resistance_count
+            state.detected_resistance_type = plan.resistance_type
             
             # Store turn
             state.conversation_turns.append({
@@ -210,312 +338,183 @@ class MediumRiskAgent:
             logger.error(f"Error in MediumRiskAgent: {e}", exc_info=True)
             return {
                 "agent": "medium_risk",
-                "response": "I understand this is important. Let's work through this together.",
+                "response": FALLBACK_RESPONSE,
                 "error": str(e),
                 "temperature": adjusted_temp if 'adjusted_temp' in locals() else self.temperature
             }
     
+    async def _run_action(
+        self,
+        plan: MediumRiskTransition,
+        user_id: str,
+        user_message: str,
+        conversation_history: Optional[List[ConversationTurn]],
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Run the single generation chosen by the planner."""
+        if plan.action == MediumRiskAction.ADDRESS_RESISTANCE:
+            return await self._handle_resistance(
+                user_id, plan.resistance_type, user_message, conversation_history, temperature,
+                summary, deadline, turn_seq
+            )
+        if plan.action == MediumRiskAction.CONFIRM_ACCEPTANCE:
+            return await self._confirm_acceptance(
+                user_id, user_message, conversation_history, temperature, summary, deadline, turn_seq
+            )
+        if plan.action == MediumRiskAction.PROVIDE_RESOURCES:
+            return await self._provide_resources(
+                user_id, user_message, conversation_history, temperature, summary, deadline, turn_seq
+            )
+        return await self._handle_initial_suggestion(
+            user_id, user_message, conversation_history, temperature, summary, deadline, turn_seq
+        )
+    
     async def _handle_initial_suggestion(
         self,
+        user_id: str,
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]],
-        temperature: float
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """Handle initial peer group suggestion."""
-        messages = [
-            {"role": "system", "content": MEDIUM_RISK_SYSTEM_PROMPT},
-        ]
-        
-        if conversation_history:
-            for turn in conversation_history[-4:]:
-                messages.append({"role": turn.role, "content": turn.text})
-        
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Generate response using Ollama API directly
-        # Build prompt from messages
-        prompt_parts = []
-        for msg in messages:
-            if msg["role"] == "system":
-                prompt_parts.append(f"System: {msg['content']}")
-            elif msg["role"] == "user":
-                prompt_parts.append(f"User: {msg['content']}")
-            elif msg["role"] == "assistant":
-                prompt_parts.append(f"Assistant: {msg['content']}")
-        prompt_parts.append("Assistant:")
-        prompt = "\n".join(prompt_parts)
-        
-        # Call Ollama API directly
-        if not self.llm_service.is_loaded:
-            await self.llm_service.load_model()
-        
-        import httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.llm_service.base_url}/api/generate",
-                    json={
-                        "model": self.llm_service.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "num_predict": self.max_tokens,
-                            "temperature": temperature,
-                            "top_p": 0.9,
-                            "top_k": 40,
-                            "num_ctx": 2048,
-                            "repeat_penalty": 1.1,
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    response_text = result.get("response", "").strip()
-                else:
-                    logger.warning(f"Ollama API error: {response.status_code}")
-                    response_text = "I understand this is important. Let's work through this together."
-            except Exception as e:
-                logger.warning(f"Ollama API error: {e}")
-                response_text = "I understand this is important. Let's work through this together."
-        
-        return {"response": response_text}
+        return await self._generate(
+            user_id, [MEDIUM_RISK_SYSTEM_PROMPT], user_message, conversation_history, temperature,
+            summary, deadline, turn_seq
+        )
     
     async def _handle_resistance(
         self,
         user_id: str,
+        resistance_type: Optional[str],
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]],
-        temperature: float
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """Handle user resistance with targeted response."""
-        state = self._get_state(user_id)
-        resistance_type = state.detected_resistance_type or "general"
-        
-        messages = [
-            {"role": "system", "content": PERSUASION_PROMPT},
-        ]
+        resistance_type = resistance_type or "general"
         
         # Add context about resistance type
         context = f"The user's concern is about: {resistance_type}. Address this specifically."
-        messages.append({"role": "system", "content": context})
-        
-        if conversation_history:
-            for turn in conversation_history[-4:]:
-                messages.append({"role": turn.role, "content": turn.text})
-        
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Generate response using Ollama API directly
-        # Build prompt from messages
-        prompt_parts = []
-        for msg in messages:
-            if msg["role"] == "system":
-                prompt_parts.append(f"System: {msg['content']}")
-            elif msg["role"] == "user":
-                prompt_parts.append(f"User: {msg['content']}")
-            elif msg["role"] == "assistant":
-                prompt_parts.append(f"Assistant: {msg['content']}")
-        prompt_parts.append("Assistant:")
-        prompt = "\n".join(prompt_parts)
-        
-        # Call Ollama API directly
-        if not self.llm_service.is_loaded:
-            await self.llm_service.load_model()
-        
-        import httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.llm_service.base_url}/api/generate",
-                    json={
-                        "model": self.llm_service.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "num_predict": self.max_tokens,
-                            "temperature": temperature,
-                            "top_p": 0.9,
-                            "top_k": 40,
-                            "num_ctx": 2048,
-                            "repeat_penalty": 1.1,
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    response_text = result.get("response", "").strip()
-                else:
-                    logger.warning(f"Ollama API error: {response.status_code}")
-                    response_text = "I understand this is important. Let's work through this together."
-            except Exception as e:
-                logger.warning(f"Ollama API error: {e}")
-                response_text = "I understand this is important. Let's work through this together."
-        
-        return {"response": response_text, "addressing_resistance": resistance_type}
+        reply = await self._generate(
+            user_id, [PERSUASION_PROMPT, context], user_message, conversation_history, temperature,
+            summary, deadline, turn_seq
+        )
+        return {**reply, "addressing_resistance": resistance_type}
     
     async def _confirm_acceptance(
         self,
+        user_id: str,
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]],
-        temperature: float
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """Confirm peer group acceptance and provide next steps."""
-        messages = [
-            {"role": "system", "content": "The user has accepted joining the peer support group. Confirm this and provide next steps."},
-        ]
-        
-        if conversation_history:
-            for turn in conversation_history[-4:]:
-                messages.append({"role": turn.role, "content": turn.text})
-        
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Generate response using Ollama API directly
-        # Build prompt from messages
-        prompt_parts = []
-        for msg in messages:
-            if msg["role"] == "system":
-                prompt_parts.append(f"System: {msg['content']}")
-            elif msg["role"] == "user":
-                prompt_parts.append(f"User: {msg['content']}")
-            elif msg["role"] == "assistant":
-                prompt_parts.append(f"Assistant: {msg['content']}")
-        prompt_parts.append("Assistant:")
-        prompt = "\n".join(prompt_parts)
-        
-        # Call Ollama API directly
-        if not self.llm_service.is_loaded:
-            await self.llm_service.load_model()
-        
-        import httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.llm_service.base_url}/api/generate",
-                    json={
-                        "model": self.llm_service.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "num_predict": self.max_tokens,
-                            "temperature": temperature,
-                            "top_p": 0.9,
-                            "top_k": 40,
-                            "num_ctx": 2048,
-                            "repeat_penalty": 1.1,
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    response_text = result.get("response", "").strip()
-                else:
-                    logger.warning(f"Ollama API error: {response.status_code}")
-                    response_text = "I understand this is important. Let's work through this together."
-            except Exception as e:
-                logger.warning(f"Ollama API error: {e}")
-                response_text = "I understand this is important. Let's work through this together."
-        
-        return {"response": response_text, "peer_group_accepted": True}
+        reply = await self._generate(
+            user_id, [ACCEPTANCE_PROMPT], user_message, conversation_history, temperature, summary, deadline,
+            turn_seq
+        )
+        return {**reply, "peer_group_accepted": True}
     
     async def _provide_resources(
         self,
+        user_id: str,
         user_message: str,
         conversation_history: Optional[List[ConversationTurn]],
-        temperature: float
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
     ) -> Dict[str, Any]:
         """Provide self-help resources when user rejects peer group."""
-        messages = [
-            {"role": "system", "content": "The user has declined joining the peer support group after multiple attempts. Provide self-help resources and support options."},
-        ]
-        
-        if conversation_history:
-            for turn in conversation_history[-4:]:
-                messages.append({"role": turn.role, "content": turn.text})
-        
-        messages.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Generate response using Ollama API directly
-        # Build prompt from messages
-        prompt_parts = []
-        for msg in messages:
-            if msg["role"] == "system":
-                prompt_parts.append(f"System: {msg['content']}")
-            elif msg["role"] == "user":
-                prompt_parts.append(f"User: {msg['content']}")
-            elif msg["role"] == "assistant":
-                prompt_parts.append(f"Assistant: {msg['content']}")
-        prompt_parts.append("Assistant:")
-        prompt = "\n".join(prompt_parts)
-        
-        # Call Ollama API directly
-        if not self.llm_service.is_loaded:
-            await self.llm_service.load_model()
-        
-        import httpx
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(
-                    f"{self.llm_service.base_url}/api/generate",
-                    json={
-                        "model": self.llm_service.model_name,
-                        "prompt": prompt,
-                        "stream": False,
-                        "options": {
-                            "num_predict": self.max_tokens,
-                            "temperature": temperature,
-                            "top_p": 0.9,
-                            "top_k": 40,
-                            "num_ctx": 2048,
-                            "repeat_penalty": 1.1,
-                        }
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    response_text = result.get("response", "").strip()
-                else:
-                    logger.warning(f"Ollama API error: {response.status_code}")
-                    response_text = "I understand this is important. Let's work through this together."
-            except Exception as e:
-                logger.warning(f"Ollama API error: {e}")
-                response_text = "I understand this is important. Let's work through this together."
-        
-        return {"response": response_text, "resources_provided": True}
+        reply = await self._generate(
+            user_id, [RESOURCES_PROMPT], user_message, conversation_history, temperature, summary, deadline,
+            turn_seq
+        )
+        return {**reply, "resources_provided": True}
+    
+    async def _generate(
+        self,
+        user_id: str,
+        system_prompts: List[str],
+        user_message: str,
+        conversation_history: Optional[List[ConversationTurn]],
+        temperature: float,
+        summary: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+        turn_seq: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Generate a reply through the shared LLM gateway (history packed to the token budget)."""
+        if deadline is not None and deadline.expired:
+            return {"response": FALLBACK_RESPONSE, "deadline_exceeded": True}
+        window = build_prompt_window(
+            system_prompts,
+            user_message,
+            conversation_history,
+            history_budget=self.history_token_budget,
+            max_tokens=self.max_tokens,
+            summary=summary
+        )
+        result = await self.gateway.generate(LLMRequest(
+            prompt=window.prompt,
+            temperature=temperature,
+            max_tokens=self.max_tokens,
+            fallback=FALLBACK_RESPONSE,
+            deadline=remaining_or(deadline, None),
+            priority=LLMPriority.MEDIUM_RISK,
+            session=session_context_key(
+                user_id, [*system_prompts, summary or ""], conversation_history, turn_seq
+            ),
+            turn_prompt=build_turn_prompt(user_message)
+        ))
+        return {"response": result.text, "llm": result.to_metadata(), "history": window.to_metadata()}
     
     def _is_acceptance(self, user_message: str) -> bool:
         """Check if user message indicates acceptance."""
-        acceptance_keywords = [
-            "yes", "okay", "ok", "sure", "I'll join", "sounds good",
-            "I'd like to", "I want to", "let's do it"
-        ]
-        message_lower = user_message.lower()
-        return any(keyword in message_lower for keyword in acceptance_keywords)
+        return is_acceptance(user_message)
     
     def reset_state(self, user_id: str):
         """Reset state for a user (e.g., after conversation ends)."""
-        if user_id in self._user_states:
-            del self._user_states[user_id]
+        self._user_states.discard(user_id)
+    
+    async def persist_state(self, user_id: str) -> bool:
+        """Write a user's state to the state backend (no-op without one)."""
+        return await self._user_states.persist(user_id)
+    
+    def export_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a user's state from memory and return it as a dict (None if not held)."""
+        state = self._user_states.pop(user_id)
+        return state.to_dict() if state is not None else None
+    
+    def import_state(self, user_id: str, data: Dict[str, Any]) -> None:
+        """Hold a user's state exported by another agent instance."""
+        self._user_states.put(user_id, MediumRiskAgentState.from_dict(data))
+    
+    def held_users(self) -> List[str]:
+        """Users whose state is in memory."""
+        return list(self._user_states.keys())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-user state store statistics (entries, evictions, approximate memory)."""
+        return self._user_states.get_stats()
 
 
-__all__ = ["MediumRiskAgent", "MediumRiskState", "MediumRiskAgentState"]
+__all__ = [
+    "MediumRiskAgent",
+    "MediumRiskState",
+    "MediumRiskAgentState",
+    "MediumRiskAction",
+    "MediumRiskTransition",
+    "plan_transition",
+]
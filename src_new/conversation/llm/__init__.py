@@ -0,0 +1 @@
+"""LLM access for conversation agents (shared gateway to the Ollama backend)."""
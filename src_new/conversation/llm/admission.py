@@ -0,0 +1,236 @@
+"""Priority-aware admission control for LLM generation.
+
+At most `max_concurrency` generations run against the backend at once;
+the rest wait in a priority queue (medium-risk turns before low-risk
+chit-chat, FIFO within a priority). Sheddable (low-priority) requests
+are refused early, and answered with the agent's fallback text, as soon
+as their deadline can no longer be met: on arrival if the predicted
+wait plus one generation exceeds the deadline, or while queued once
+less than one expected generation time remains.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Deque, Dict, Any, Iterable, List, Optional, Tuple
+
+
+class LLMPriority(IntEnum):
+    """Generation priority (lower value is served first)."""
+    MEDIUM_RISK = 0
+    DEFAULT = 1
+    LOW_RISK = 2
+    BACKGROUND = 3  # Off the critical path (e.g. session summaries)
+
+
+class AdmissionShed(Exception):
+    """A request was refused instead of queued (or dropped from the queue)."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"request shed ({reason})")
+        self.reason = reason
+
+
+class LLMAdmissionController:
+    """Bounded concurrency + priority queue in front of one LLM backend.
+
+    Usage:
+        async with controller.admit(LLMPriority.LOW_RISK, deadline=loop.time() + 30):
+            ...  # call the backend
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_queue: int = 256,
+        service_time_estimate: float = 2.0,
+        sheddable: Iterable[LLMPriority] = (LLMPriority.LOW_RISK, LLMPriority.BACKGROUND),
+        ewma_alpha: float = 0.2
+    ):
+        """
+        Initialize admission controller.
+
+        Args:
+            max_concurrency: Generations allowed in flight
+            max_queue: Max waiting requests; when full, a non-sheddable request
+                evicts the lowest-priority sheddable waiter, others are shed
+            service_time_estimate: Initial seconds per generation (then EWMA
+                of observed generation times)
+            sheddable: Priorities that are shed early when their deadline
+                can't be met
+            ewma_alpha: Weight of the newest observation in the estimate
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.sheddable = frozenset(sheddable)
+        self.ewma_alpha = ewma_alpha
+        self.service_time_estimate = service_time_estimate
+
+        self._in_flight = 0
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._queued: Counter = Counter()  # priority → waiting requests
+        self._max_queue_depth = 0
+        self._admitted: Counter = Counter()
+        self._shed: Counter = Counter()  # reason → count
+        self._waits: Dict[LLMPriority, Deque[float]] = {
+            priority: deque(maxlen=1024) for priority in LLMPriority
+        }
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        priority: LLMPriority,
+        deadline: Optional[float] = None
+    ) -> AsyncIterator[float]:
+        """
+        Hold a generation slot for the duration of the block.
+
+        Args:
+            priority: Request priority
+            deadline: Absolute event-loop time (loop.time()) the reply is due
+
+        Yields:
+            Seconds spent waiting for the slot
+
+        Raises:
+            AdmissionShed: The request was shed instead of admitted
+        """
+        waited = await self.acquire(priority, deadline)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            yield waited
+        finally:
+            self.release(loop.time() - started)
+
+    async def acquire(self, priority: LLMPriority, deadline: Optional[float] = None) -> float:
+        """Wait for a generation slot; returns the seconds waited (see admit)."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        queued_total = sum(self._queued.values())
+
+        # A free slot implies no live waiters: release() hands slots to waiters first
+        if self._in_flight < self.max_concurrency:
+            self._in_flight += 1
+            self._record_admission(priority, 0.0)
+            return 0.0
+
+        sheddable = priority in self.sheddable
+        if queued_total >= self.max_queue:
+            if sheddable or not self._evict_one():
+                self._shed["queue_full"] += 1
+                raise AdmissionShed("queue_full")
+
+        remaining = None if deadline is None else deadline - now
+        if sheddable and remaining is not None:
+            ahead = sum(count for queued, count in self._queued.items() if queued <= priority)
+            expected_wait = self.service_time_estimate * (ahead // self.max_concurrency + 1)
+            if expected_wait + self.service_time_estimate > remaining:
+                self._shed["predicted_deadline_miss"] += 1
+                raise AdmissionShed("predicted_deadline_miss")
+
+        future = loop.create_future()
+        heapq.heappush(self._heap, (int(priority), next(self._seq), future))
+        self._queued[priority] += 1
+        self._max_queue_depth = max(self._max_queue_depth, queued_total + 1)
+
+        # Sheddable requests give up once less than one generation time is left
+        budget = None
+        if remaining is not None:
+            budget = max(0.0, remaining - (self.service_time_estimate if sheddable else 0.0))
+        try:
+            if budget is None:
+                await future
+            else:
+                await asyncio.wait_for(asyncio.shield(future), budget)
+        except TimeoutError:
+            if not self._granted(future):
+                future.cancel()
+                self._shed["deadline"] += 1
+                raise AdmissionShed("deadline") from None
+        except asyncio.CancelledError:
+            if self._granted(future):
+                self.release()  # Slot was handed over as we were cancelled
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._queued[priority] -= 1
+
+        waited = loop.time() - now
+        self._record_admission(priority, waited)
+        return waited
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        """Free a slot (handing it to the best waiter, if any)."""
+        if service_time is not None:
+            self.service_time_estimate += self.ewma_alpha * (service_time - self.service_time_estimate)
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                future.set_result(None)  # Slot passes to the waiter; in-flight count unchanged
+                return
+        self._in_flight -= 1
+
+    def _evict_one(self) -> bool:
+        """Shed the lowest-priority, most recently queued sheddable waiter."""
+        candidates = [
+            entry for entry in self._heap
+            if not entry[2].done() and LLMPriority(entry[0]) in self.sheddable
+        ]
+        if not candidates:
+            return False
+        _, _, future = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        future.set_exception(AdmissionShed("evicted"))
+        self._shed["evicted"] += 1
+        return True
+
+    @staticmethod
+    def _granted(future: asyncio.Future) -> bool:
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _record_admission(self, priority: LLMPriority, waited: float) -> None:
+        self._admitted[priority] += 1
+        self._waits[priority].append(waited)
+
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot."""
+        return sum(self._queued.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission metrics (queue depth, shed counts, wait times)."""
+        waits = {}
+        for priority, samples in self._waits.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            waits[priority.name.lower()] = {
+                "count": len(ordered),
+                "avg_ms": sum(ordered) / len(ordered) * 1000,
+                "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return {
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": {
+                priority.name.lower(): count for priority, count in self._queued.items() if count
+            },
+            "max_queue_depth": self._max_queue_depth,
+            "admitted": {priority.name.lower(): count for priority, count in self._admitted.items()},
+            "shed": dict(self._shed),
+            "wait": waits,
+            "service_time_estimate_ms": self.service_time_estimate * 1000,
+        }
+
+
+__all__ = ["LLMPriority", "AdmissionShed", "LLMAdmissionController"]
@@ -0,0 +1,203 @@
+"""Pool of Ollama backends: least-outstanding selection, health probes, hedging.
+
+Every backend serves the same model. Requests go to the healthy backend
+with the fewest outstanding requests. A periodic /api/tags probe ejects
+backends that stop answering and re-admits them when they recover;
+repeated request failures eject a backend until its next successful
+probe. Once enough latencies have been observed, a slow non-streamed
+request can be hedged: after the recent p95 latency, the same request is
+sent to a second backend and the first reply wins.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from typing import Deque, Dict, Any, Iterable, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBackend:
+    """One Ollama server and its live counters."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.last_probe_error: Optional[str] = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get backend counters."""
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_probe_error": self.last_probe_error,
+        }
+
+
+class BackendPool:
+    """Selects, probes and tracks latency for a set of Ollama backends."""
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        probe_interval: float = 10.0,
+        probe_timeout: float = 2.0,
+        max_consecutive_failures: int = 3,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        min_hedge_delay: float = 0.05,
+        latency_window: int = 512
+    ):
+        """
+        Initialize backend pool.
+
+        Args:
+            urls: Backend base URLs (at least one)
+            probe_interval: Seconds between /api/tags health probes
+            probe_timeout: Timeout of a single probe
+            max_consecutive_failures: Request failures that eject a backend
+                until its next successful probe
+            hedge_quantile: Latency quantile used as the hedge delay
+            hedge_min_samples: Latencies needed before hedging starts
+            min_hedge_delay: Lower bound of the hedge delay (seconds)
+            latency_window: Recent successful latencies kept
+        """
+        self.backends: List[LLMBackend] = [LLMBackend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one backend URL")
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_consecutive_failures = max_consecutive_failures
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.min_hedge_delay = min_hedge_delay
+
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._rotation = itertools.count()
+        self._probe_task: Optional[asyncio.Task] = None
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    def pick(self, exclude: Iterable[LLMBackend] = ()) -> Optional[LLMBackend]:
+        """
+        Pick the healthy backend with the fewest outstanding requests.
+
+        Ties rotate so equally loaded backends share traffic. If every
+        backend is unhealthy, all of them are candidates (fail open).
+
+        Returns:
+            Backend, or None if every backend is excluded
+        """
+        excluded = set(map(id, exclude))
+        candidates = [backend for backend in self.backends if id(backend) not in excluded]
+        if not candidates:
+            return None
+        healthy = [backend for backend in candidates if backend.healthy]
+        candidates = healthy or candidates
+        offset = next(self._rotation)
+        count = len(candidates)
+        return min(
+            (candidates[(offset + i) % count] for i in range(count)),
+            key=lambda backend: backend.outstanding
+        )
+
+    def healthy_count(self) -> int:
+        """Number of backends currently considered healthy."""
+        return sum(backend.healthy for backend in self.backends)
+
+    def record_success(self, backend: LLMBackend, latency: float) -> None:
+        """Record a successful request."""
+        backend.requests += 1
+        backend.consecutive_failures = 0
+        self._latencies.append(latency)
+
+    def record_failure(self, backend: LLMBackend) -> None:
+        """Record a failed request; eject the backend after repeated failures."""
+        backend.requests += 1
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        if backend.healthy and backend.consecutive_failures >= self.max_consecutive_failures:
+            backend.healthy = False
+            logger.warning(
+                f"LLM backend {backend.url} ejected after {backend.consecutive_failures} failures"
+            )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before hedging a request (None: don't hedge)."""
+        if len(self._latencies) < self.hedge_min_samples or self.healthy_count() < 2:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))
+        return max(self.min_hedge_delay, ordered[index])
+
+    async def probe(self, client: httpx.AsyncClient) -> None:
+        """Probe every backend once (GET /api/tags) and update health."""
+        await asyncio.gather(*(self._probe_backend(client, backend) for backend in self.backends))
+
+    async def _probe_backend(self, client: httpx.AsyncClient, backend: LLMBackend) -> None:
+        try:
+            response = await client.get(f"{backend.url}/api/tags", timeout=self.probe_timeout)
+            healthy = response.status_code == 200
+            backend.last_probe_error = None if healthy else f"HTTP {response.status_code}"
+        except Exception as e:
+            healthy = False
+            backend.last_probe_error = f"{type(e).__name__}: {e}"
+
+        if healthy and not backend.healthy:
+            logger.info(f"LLM backend {backend.url} is healthy again")
+            backend.consecutive_failures = 0
+        elif not healthy and backend.healthy:
+            logger.warning(f"LLM backend {backend.url} failed health probe: {backend.last_probe_error}")
+        backend.healthy = healthy
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        """Start periodic health probes (idempotent)."""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_loop(client))
+
+    async def _probe_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            try:
+                await self.probe(client)
+            except Exception as e:
+                logger.error(f"LLM backend probe failed: {e}", exc_info=True)
+            await asyncio.sleep(self.probe_interval)
+
+    async def close(self) -> None:
+        """Stop health probes."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool metrics."""
+        return {
+            "backends": [backend.get_stats() for backend in self.backends],
+            "healthy": self.healthy_count(),
+            "hedge_delay_ms": None if self.hedge_delay() is None else self.hedge_delay() * 1000,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+__all__ = ["LLMBackend", "BackendPool"]
@@ -0,0 +1,176 @@
+"""Circuit breaker for the LLM path.
+
+CLOSED: calls go through; outcomes are recorded in a sliding window.
+OPEN: calls are refused immediately (the agent's fallback text is
+returned in milliseconds instead of waiting for timeouts).
+HALF_OPEN: after `open_duration`, a limited number of probe calls go
+through; a success closes the circuit, a failure re-opens it.
+
+The circuit opens when the failure rate over the window reaches
+`failure_rate_threshold` (with at least `min_calls` outcomes), or
+immediately after `consecutive_failures` failures in a row. Calls slower
+than `slow_call_threshold` count as failures.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """Circuit breaker states."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Failure-rate / latency circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        min_calls: int = 10,
+        window_size: int = 20,
+        consecutive_failures: int = 5,
+        slow_call_threshold: Optional[float] = 20.0,
+        open_duration: float = 15.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize circuit breaker.
+
+        Args:
+            failure_rate_threshold: Failure rate (0-1) over the window that opens the circuit
+            min_calls: Outcomes required before the failure rate is evaluated
+            window_size: Most recent outcomes kept
+            consecutive_failures: Failures in a row that open the circuit
+            slow_call_threshold: Seconds above which a successful call counts
+                as a failure (None: latency is ignored)
+            open_duration: Seconds the circuit stays open before probing
+            half_open_max_calls: Concurrent probe calls allowed while half-open
+            clock: Time source (monotonic seconds)
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.consecutive_failures_threshold = consecutive_failures
+        self.slow_call_threshold = slow_call_threshold
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)  # True = failure
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self.opened_count = 0
+        self.rejected = 0
+        self.slow_calls = 0
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a call may proceed.
+
+        Every allowed call must be followed by exactly one of
+        record_success / record_failure / record_ignored.
+        """
+        if self.state == CircuitState.OPEN:
+            if self._clock() - self._opened_at < self.open_duration:
+                self.rejected += 1
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+
+        if self.state == CircuitState.HALF_OPEN:
+            if self._half_open_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self._half_open_in_flight += 1
+        return True
+
+    def record_success(self, latency: float = 0.0) -> None:
+        """Record a successful call."""
+        if self.slow_call_threshold is not None and latency > self.slow_call_threshold:
+            self.slow_calls += 1
+            self.record_failure()
+            return
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight -= 1
+            self._transition(CircuitState.CLOSED)
+            return
+        self._consecutive_failures = 0
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        """Record a failed (or too slow) call."""
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight -= 1
+            self._transition(CircuitState.OPEN)
+            return
+        if self.state == CircuitState.OPEN:
+            return  # Call admitted before the circuit opened
+        self._consecutive_failures += 1
+        self._outcomes.append(True)
+        if (
+            self._consecutive_failures >= self.consecutive_failures_threshold
+            or (
+                len(self._outcomes) >= self.min_calls
+                and self.failure_rate() >= self.failure_rate_threshold
+            )
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def record_ignored(self) -> None:
+        """Release an allowed call whose outcome says nothing about the backend."""
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight -= 1
+
+    def failure_rate(self) -> float:
+        """Failure rate over the current window."""
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _transition(self, state: CircuitState) -> None:
+        previous = self.state
+        self.state = state
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+            self.opened_count += 1
+            logger.warning(
+                f"LLM circuit breaker opened (from {previous.value}, "
+                f"failure_rate={self.failure_rate():.2f}, consecutive={self._consecutive_failures})"
+            )
+        elif state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = 0
+            logger.info("LLM circuit breaker half-open: probing backend")
+        else:
+            self._outcomes.clear()
+            self._consecutive_failures = 0
+            logger.info("LLM circuit breaker closed: backend recovered")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters."""
+        retry_in = None
+        if self.state == CircuitState.OPEN:
+            retry_in = max(0.0, self.open_duration - (self._clock() - self._opened_at))
+        return {
+            "state": self.state.value,
+            "failure_rate": self.failure_rate(),
+            "window_calls": len(self._outcomes),
+            "consecutive_failures": self._consecutive_failures,
+            "opened_count": self.opened_count,
+            "rejected": self.rejected,
+            "slow_calls": self.slow_calls,
+            "retry_in_seconds": retry_in,
+        }
+
+
+__all__ = ["CircuitState", "CircuitBreaker"]
@@ -0,0 +1,146 @@
+"""Per-session cache of Ollama `context` tokens (prompt-prefix KV reuse).
+
+Ollama returns `context`, the token ids of the evaluated prompt plus the
+generated reply. Sending it back with the next request lets Ollama skip
+re-evaluating everything that came before, so only the new turn is sent.
+
+A cached context is only valid while it encodes exactly what the session
+contains, so every entry is keyed by:
+    - prefix: identifies the system prompt set (agent / state); a
+      different system prompt starts over with the full prompt
+    - turn_seq / history_tail: the session's turn sequence number (turns
+      ever recorded, see SessionService.turn_seq) the context covers and
+      the text of the last turn (the reply it generated); any turn recorded
+      by another path (another agent, a concurrent request, a cleared
+      session, a reply replaced before it was recorded) makes them disagree
+      and the entry is dropped. The sequence keeps growing when the session
+      store drops old turns or a summary shortens the history sent.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+
+@dataclass(frozen=True)
+class SessionContextKey:
+    """Identifies the conversation state a request continues from."""
+    session_id: str
+    prefix: str  # Hash of the system prompt set
+    turn_seq: int  # Session turn sequence number before this exchange
+    history_tail: Optional[str] = None  # Text of the last session turn
+
+
+@dataclass(slots=True)
+class _CachedContext:
+    prefix: str
+    turn_seq: int  # Session turn sequence number covered by tokens (incl. this exchange)
+    tail: str  # Reply generated in this exchange
+    tokens: List[int]
+    last_used: float
+
+
+class ConversationContextCache:
+    """Bounded LRU + TTL map of session → Ollama context tokens."""
+
+    def __init__(self, max_sessions: int = 10_000, max_tokens: int = 1536, ttl: float = 1800.0):
+        """
+        Initialize context cache.
+
+        Args:
+            max_sessions: Max cached sessions (least recently used evicted)
+            max_tokens: Contexts longer than this are not kept; the next turn
+                sends the full (windowed) prompt and starts a fresh context.
+                Keep it below num_ctx - num_predict.
+            ttl: Seconds an unused context stays valid (align with keep_alive:
+                an unloaded model must re-evaluate the context anyway)
+        """
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, _CachedContext]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.overflows = 0
+        self.evictions = 0
+
+    def get(self, key: SessionContextKey) -> Optional[List[int]]:
+        """Get the context to continue from, or None to send the full prompt."""
+        entry = self._entries.get(key.session_id)
+        now = time.monotonic()
+        if (
+            entry is None
+            or entry.prefix != key.prefix
+            or entry.turn_seq != key.turn_seq
+            or entry.tail != key.history_tail
+            or now - entry.last_used > self.ttl
+        ):
+            if entry is not None:
+                del self._entries[key.session_id]
+            self.misses += 1
+            return None
+        entry.last_used = now
+        self._entries.move_to_end(key.session_id)
+        self.hits += 1
+        return entry.tokens
+
+    def store(
+        self,
+        key: SessionContextKey,
+        tokens: Optional[List[int]],
+        reply: str,
+        turns_added: int = 2
+    ) -> None:
+        """
+        Store the context returned for a successful exchange.
+
+        Args:
+            key: Key the request was made with
+            tokens: `context` returned by Ollama
+            reply: Generated reply (expected to become the last session turn)
+            turns_added: Session turns the caller records for this exchange
+                (user message + reply)
+        """
+        if not tokens:
+            self.invalidate(key.session_id)
+            return
+        if len(tokens) > self.max_tokens:
+            self.overflows += 1
+            self.invalidate(key.session_id)
+            return
+        self._entries[key.session_id] = _CachedContext(
+            prefix=key.prefix,
+            turn_seq=key.turn_seq + turns_added,
+            tail=reply,
+            tokens=list(tokens),
+            last_used=time.monotonic()
+        )
+        self._entries.move_to_end(key.session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, session_id: str) -> None:
+        """Forget a session's context."""
+        self._entries.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "sessions": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "overflows": self.overflows,
+            "evictions": self.evictions,
+        }
+
+
+__all__ = ["SessionContextKey", "ConversationContextCache"]
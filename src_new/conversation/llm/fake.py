@@ -0,0 +1,149 @@
+"""In-process fake Ollama backend for tests and benchmarks.
+
+Speaks the subset of the Ollama HTTP API the gateway uses (/api/generate,
+streamed and non-streamed, with `context`, and /api/tags) through an
+httpx.MockTransport, so the real LLMGateway request path runs end to end
+without a server.
+
+Usage:
+    backend = FakeOllamaBackend(responder=lambda payload: "Hello there.")
+    gateway = backend.gateway()
+    result = await gateway.generate(LLMRequest(prompt="...", temperature=0.7))
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
+
+import httpx
+
+from src_new.conversation.llm.gateway import LLMGateway, LLMGatewayConfig
+
+# A scripted failure: an HTTP status code, or an exception raised by the transport
+Failure = Union[int, Exception]
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+class FakeLLMService:
+    """Stand-in for OllamaService (base_url / model_name / model loading)."""
+
+    def __init__(self, base_url: str = "http://ollama.fake", model_name: str = "fake-model"):
+        self.base_url = base_url
+        self.model_name = model_name
+        self.is_loaded = False
+        self.load_calls = 0
+
+    async def load_model(self) -> None:
+        self.load_calls += 1
+        self.is_loaded = True
+
+
+class FakeOllamaBackend:
+    """Scriptable fake Ollama server.
+
+    Attributes:
+        requests: JSON payloads of every /api/generate request, in order
+    """
+
+    def __init__(
+        self,
+        responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+        latency: float = 0.0,
+        token_delay: float = 0.0,
+        failures: Sequence[Failure] = ()
+    ):
+        """
+        Initialize fake backend.
+
+        Args:
+            responder: Builds the reply text from the request payload
+                (default: "reply #<n>")
+            latency: Seconds before the response starts
+            token_delay: Seconds between streamed tokens
+            failures: Consumed one per request before succeeding
+        """
+        self.responder = responder or (lambda payload: f"reply #{len(self.requests)}")
+        self.latency = latency
+        self.token_delay = token_delay
+        self.failures: List[Failure] = list(failures)
+        self.requests: List[Dict[str, Any]] = []
+        self.down = False  # Refuse every connection (incl. health probes)
+
+    def transport(self) -> httpx.MockTransport:
+        """httpx transport serving this backend."""
+        return httpx.MockTransport(self._handle)
+
+    def gateway(self, config: Optional[LLMGatewayConfig] = None) -> LLMGateway:
+        """LLMGateway wired to this backend."""
+        return LLMGateway(
+            llm_service=FakeLLMService(),
+            config=config,
+            transport=self.transport()
+        )
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        if self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": [{"name": "fake-model"}]})
+
+        payload = json.loads(request.content)
+        self.requests.append(payload)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return httpx.Response(failure, json={"error": f"fake failure {failure}"})
+
+        text = self.responder(payload)
+        tokens = _TOKEN_PATTERN.findall(text) or [text]
+        timings = self._timings(payload["prompt"], tokens)
+        # Context: previous context + one id per prompt word and reply token
+        context = list(payload.get("context") or [])
+        context.extend(range(len(context), len(context) + timings["prompt_eval_count"] + len(tokens)))
+        timings["context"] = context
+
+        if not payload.get("stream", True):
+            return httpx.Response(200, json={"response": text, "done": True, **timings})
+        return httpx.Response(200, content=self._stream(tokens, timings))
+
+    async def _stream(self, tokens: List[str], timings: Dict[str, Any]) -> AsyncIterator[bytes]:
+        for token in tokens:
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield (json.dumps({"response": token, "done": False}) + "\n").encode()
+        yield (json.dumps({"response": "", "done": True, **timings}) + "\n").encode()
+
+    @staticmethod
+    def _timings(prompt: str, tokens: List[str]) -> Dict[str, Any]:
+        # Deterministic, plausible numbers: 1 ms per prompt word, 20 ms per token
+        prompt_eval_count = len(prompt.split())
+        eval_count = len(tokens)
+        prompt_eval_duration = prompt_eval_count * 1_000_000
+        eval_duration = eval_count * 20_000_000
+        return {
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_duration": prompt_eval_duration,
+            "eval_count": eval_count,
+            "eval_duration": eval_duration,
+            "load_duration": 0,
+            "total_duration": prompt_eval_duration + eval_duration,
+        }
+
+
+def fake_cluster_transport(backends: Dict[str, FakeOllamaBackend]) -> httpx.MockTransport:
+    """Transport routing each request to a fake backend by host name."""
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        return await backends[request.url.host]._handle(request)
+
+    return httpx.MockTransport(handle)
+
+
+__all__ = ["FakeLLMService", "FakeOllamaBackend", "fake_cluster_transport"]
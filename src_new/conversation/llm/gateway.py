@@ -0,0 +1,530 @@
+"""LLM gateway shared by all conversation agents."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from src.services.ollama_service import OllamaService
+from src_new.conversation.llm.admission import AdmissionShed, LLMAdmissionController
+from src_new.conversation.llm.backends import BackendPool, LLMBackend
+from src_new.conversation.llm.circuit_breaker import CircuitBreaker
+from src_new.conversation.llm.context_cache import ConversationContextCache
+from src_new.conversation.llm.models import LLMRequest, LLMResult
+from src_new.conversation.streaming import get_token_sink
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMGatewayConfig:
+    """Connection pool and timeout settings for the shared HTTP client."""
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0  # Seconds an idle connection is kept open
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    write_timeout: float = 10.0
+    pool_timeout: float = 5.0  # Max wait for a free connection from the pool
+    http2: bool = False  # Requires the optional `h2` package
+    max_retries: int = 2  # Retries after the first attempt (transport errors, 429, 5xx)
+    backoff_base: float = 0.25  # Seconds; doubled per retry, full jitter
+    backoff_max: float = 2.0
+    default_deadline: Optional[float] = 60.0  # Seconds per call incl. retries (None: no deadline)
+    keep_alive: Optional[str] = "30m"  # How long Ollama keeps the model resident (None: server default)
+    reuse_context: bool = True  # Continue sessions from Ollama's returned context tokens
+    context_max_tokens: int = 1536  # num_ctx (2048) - num_predict (512)
+    context_max_sessions: int = 10_000
+    max_concurrent_generations: int = 2  # In flight per backend (match OLLAMA_NUM_PARALLEL)
+    max_queued_generations: int = 256
+    service_time_estimate: float = 2.0  # Initial seconds per generation, refined from observations
+    backend_urls: Optional[List[str]] = None  # Ollama pool (None: the service's base_url only)
+    probe_interval: float = 10.0  # Seconds between /api/tags health probes (pools of 2+)
+    hedge_requests: bool = True  # Re-send slow non-streamed calls to a second backend
+    hedge_min_samples: int = 20  # Latencies observed before hedging starts
+    circuit_breaker: bool = True  # Answer with the fallback immediately while the backend is failing
+    circuit_failure_rate: float = 0.5  # Failure rate over the last circuit_window calls that opens it
+    circuit_window: int = 20
+    circuit_min_calls: int = 10
+    circuit_consecutive_failures: int = 5  # Failed calls in a row that open it
+    circuit_slow_call_threshold: Optional[float] = 20.0  # Seconds; slower calls count as failures
+    circuit_open_duration: float = 15.0  # Seconds before a half-open probe call is let through
+
+    def limits(self) -> httpx.Limits:
+        """Build httpx pool limits."""
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        """Build httpx timeouts."""
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class LLMGatewayError(Exception):
+    """A failed LLM call (HTTP status or backend error)."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class LLMGateway:
+    """Owns the long-lived, pooled HTTP client used for all Ollama calls.
+
+    One gateway is shared by every agent, so connections are reused
+    (keep-alive) across turns and agents instead of opening a new TCP
+    connection per generated reply. Requests are spread over a pool of
+    Ollama backends (LLMGatewayConfig.backend_urls), see BackendPool.
+
+    All generation goes through generate(), which owns retries, deadlines,
+    streaming and typed results.
+
+    Lifecycle:
+        await gateway.startup()   # optional: the client is created lazily
+        ...
+        await gateway.shutdown()  # closes pooled connections
+    """
+
+    def __init__(
+        self,
+        llm_service: Optional[OllamaService] = None,
+        config: Optional[LLMGatewayConfig] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Initialize LLM gateway.
+
+        Args:
+            llm_service: Ollama service providing base_url / model_name
+            config: Pool and timeout settings
+            transport: Custom httpx transport (e.g. httpx.MockTransport in tests)
+        """
+        self.llm_service = llm_service or OllamaService()
+        self.config = config or LLMGatewayConfig()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.context_cache = ConversationContextCache(
+            max_sessions=self.config.context_max_sessions,
+            max_tokens=self.config.context_max_tokens,
+            ttl=_keep_alive_seconds(self.config.keep_alive)
+        )
+        self.backends = BackendPool(
+            self.config.backend_urls or [self.llm_service.base_url],
+            probe_interval=self.config.probe_interval,
+            hedge_min_samples=self.config.hedge_min_samples
+        )
+        self.admission = LLMAdmissionController(
+            max_concurrency=self.config.max_concurrent_generations * len(self.backends),
+            max_queue=self.config.max_queued_generations,
+            service_time_estimate=self.config.service_time_estimate
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_rate_threshold=self.config.circuit_failure_rate,
+            min_calls=self.config.circuit_min_calls,
+            window_size=self.config.circuit_window,
+            consecutive_failures=self.config.circuit_consecutive_failures,
+            slow_call_threshold=self.config.circuit_slow_call_threshold,
+            open_duration=self.config.circuit_open_duration
+        )
+
+    @property
+    def base_url(self) -> str:
+        """Ollama base URL."""
+        return self.llm_service.base_url
+
+    @property
+    def model_name(self) -> str:
+        """Ollama model name."""
+        return self.llm_service.model_name
+
+    def _create_client(self) -> httpx.AsyncClient:
+        kwargs = {
+            "limits": self.config.limits(),
+            "timeout": self.config.timeout(),
+        }
+        if self._transport is not None:
+            kwargs["transport"] = self._transport
+        elif self.config.http2:
+            kwargs["http2"] = True
+        return httpx.AsyncClient(**kwargs)
+
+    async def startup(self) -> None:
+        """Create the pooled client and make sure the model is loaded."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+            logger.info(
+                f"LLMGateway started (max_connections={self.config.max_connections}, "
+                f"keepalive={self.config.max_keepalive_connections})"
+            )
+        if len(self.backends) > 1:
+            self.backends.start(self._client)
+        await self.ensure_model_loaded()
+
+    async def shutdown(self) -> None:
+        """Stop health probes and close the pooled client and its connections."""
+        await self.backends.close()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("LLMGateway stopped")
+
+    async def get_client(self) -> httpx.AsyncClient:
+        """Get the shared client (created on first use, or after shutdown)."""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def ensure_model_loaded(self) -> None:
+        """Load the Ollama model if the service reports it is not loaded."""
+        if not self.llm_service.is_loaded:
+            await self.llm_service.load_model()
+
+    async def generate(self, request: LLMRequest) -> LLMResult:
+        """
+        Run one generation request. This is the single request path for all agents.
+
+        - Retries transport errors, 429 and 5xx with jittered exponential backoff
+        - Bounds the whole call (incl. retries and backoff) by the request deadline
+        - Streams tokens to the current task's token sink, if one is active
+          (see src_new.conversation.streaming); a stream that already emitted
+          tokens is not retried
+        - For requests with a session key, continues from the session's
+          cached Ollama context and sends only request.turn_prompt
+        - Waits for an admission slot by request.priority; low-priority
+          requests that can no longer meet the deadline are shed
+        - While the circuit breaker is open, returns the fallback at once
+          without touching the backend (see CircuitBreaker). Only backend
+          failures count against it: HTTP and transport errors and timeouts
+          of the call itself, not deadlines that ran out in the admission
+          queue or were shorter than the call's own timeout
+        - Never raises: on failure the result carries the request's fallback text
+
+        Args:
+            request: Prompt, sampling settings, fallback and deadline
+
+        Returns:
+            LLMResult with the text and Ollama's timing fields
+        """
+        if not self.config.circuit_breaker:
+            return await self._generate(request)
+
+        if not self.circuit_breaker.allow_request():
+            if request.session is not None:
+                self.context_cache.invalidate(request.session.session_id)
+            return LLMResult(
+                text=request.fallback,
+                ok=False,
+                error="circuit open",
+                attempts=0,
+                circuit_open=True
+            )
+        try:
+            result = await self._generate(request)
+        except BaseException:
+            self.circuit_breaker.record_ignored()
+            raise
+        if result.ok:
+            # Queue wait is local load, not backend latency
+            self.circuit_breaker.record_success(result.latency - result.queue_wait)
+        elif result.backend_error:
+            self.circuit_breaker.record_failure()
+        else:
+            # Shed, or out of time because of local load
+            self.circuit_breaker.record_ignored()
+        return result
+
+    async def _generate(self, request: LLMRequest) -> LLMResult:
+        """Retry loop behind generate() (deadline, admission, streaming, context reuse)."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = request.deadline if request.deadline is not None else self.config.default_deadline
+        max_retries = request.max_retries if request.max_retries is not None else self.config.max_retries
+        sink = get_token_sink()
+        attempts = 0
+        queue_wait = 0.0
+        shed = False
+        backend_error = False
+        error: Optional[str] = None
+
+        context = None
+        if self.config.reuse_context and request.session is not None and request.turn_prompt:
+            context = self.context_cache.get(request.session)
+        payload = self._payload(request, stream=sink is not None, context=context)
+
+        try:
+            await self.ensure_model_loaded()
+        except Exception as e:
+            error = f"model load failed: {e}"
+            backend_error = True
+
+        while error is None:
+            attempts += 1
+            remaining = None if deadline is None else deadline - (loop.time() - started)
+            if remaining is not None and remaining <= 0:
+                error = f"deadline of {deadline}s exceeded"
+                break
+
+            emitted: List[str] = []
+            attempt_wait: Optional[float] = None  # None: still waiting for admission
+            try:
+                async with asyncio.timeout(remaining) as scope:
+                    async with self.admission.admit(
+                        request.priority,
+                        None if deadline is None else started + deadline
+                    ) as waited:
+                        queue_wait += waited
+                        attempt_wait = waited
+                        if sink is not None:
+                            result = await self._stream_once(payload, sink, emitted)
+                        else:
+                            result = await self._generate_once(payload)
+                result.attempts = attempts
+                result.queue_wait = queue_wait
+                result.latency = loop.time() - started
+                result.context_reused = context is not None
+                if request.session is not None:
+                    self.context_cache.store(request.session, result.context, result.text)
+                return result
+            except AdmissionShed as e:
+                error = str(e)
+                shed = True
+                break
+            except TimeoutError:
+                if scope.expired():
+                    error = f"deadline of {deadline}s exceeded"
+                    # The backend is only to blame if the call got no less
+                    # time than its own timeout and none of it went to queueing
+                    if attempt_wait == 0.0 and remaining >= self.config.read_timeout:
+                        backend_error = True
+                    break
+                error = "timeout"
+                retryable = not emitted
+                backend_error = True
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+                retryable = not emitted
+                backend_error = True
+            except LLMGatewayError as e:
+                error = str(e)
+                retryable = e.retryable and not emitted
+                backend_error = True
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                retryable = False
+                backend_error = True
+
+            if not retryable or attempts > max_retries:
+                break
+            delay = self._backoff_delay(attempts)
+            if deadline is not None and loop.time() - started + delay >= deadline:
+                break
+            logger.info(f"LLM attempt {attempts} failed ({error}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            error = None
+
+        if shed:
+            logger.info(f"LLM request shed (priority={request.priority.name}): {error}")
+        else:
+            logger.warning(f"Ollama API error after {attempts} attempt(s): {error}")
+        if request.session is not None:
+            # The fallback text will be recorded instead of a generated reply
+            self.context_cache.invalidate(request.session.session_id)
+        return LLMResult(
+            text=request.fallback,
+            ok=False,
+            error=error,
+            attempts=attempts,
+            latency=loop.time() - started,
+            queue_wait=queue_wait,
+            shed=shed,
+            backend_error=backend_error
+        )
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (1-based) failed attempt."""
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _payload(
+        self,
+        request: LLMRequest,
+        stream: bool,
+        context: Optional[List[int]] = None
+    ) -> Dict[str, Any]:
+        payload = {
+            "model": self.model_name,
+            "prompt": request.prompt if context is None else request.turn_prompt,
+            "stream": stream,
+            "options": request.ollama_options()
+        }
+        if context is not None:
+            payload["context"] = context
+        if self.config.keep_alive is not None:
+            payload["keep_alive"] = self.config.keep_alive
+        return payload
+
+    @staticmethod
+    def _check_status(status_code: int) -> None:
+        if status_code != 200:
+            raise LLMGatewayError(
+                f"Ollama returned HTTP {status_code}",
+                retryable=status_code == 429 or status_code >= 500
+            )
+
+    async def _generate_once(self, payload: Dict[str, Any]) -> LLMResult:
+        """Non-streamed call on the least-loaded backend, hedged if it is slow."""
+        primary = self.backends.pick()
+        hedge_delay = self.backends.hedge_delay() if self.config.hedge_requests else None
+        if hedge_delay is None:
+            return await self._post(primary, payload)
+
+        first = asyncio.create_task(self._post(primary, payload))
+        tasks = {first}
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+            secondary = None if done else self.backends.pick(exclude=[primary])
+            if secondary is None:
+                return await first
+
+            self.backends.hedges += 1
+            second = asyncio.create_task(self._post(secondary, payload))
+            tasks.add(second)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        result = task.result()
+                        result.hedged = True
+                        if task is second:
+                            self.backends.hedge_wins += 1
+                        return result
+                    error = task.exception()
+            raise error
+        finally:
+            # Loser of the race, or everything if the deadline cancelled us
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _post(self, backend: LLMBackend, payload: Dict[str, Any]) -> LLMResult:
+        client = await self.get_client()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        backend.outstanding += 1
+        try:
+            response = await client.post(f"{backend.url}/api/generate", json=payload)
+            self._check_status(response.status_code)
+            body = response.json()
+        except asyncio.CancelledError:
+            raise  # Lost a hedge race or hit the deadline: not the backend's fault
+        except Exception:
+            self.backends.record_failure(backend)
+            raise
+        finally:
+            backend.outstanding -= 1
+        self.backends.record_success(backend, loop.time() - started)
+        result = LLMResult(text=body.get("response", "").strip(), backend=backend.url)
+        result.apply_timings(body)
+        return result
+
+    async def _stream_once(
+        self,
+        payload: Dict[str, Any],
+        sink: Callable[[str], None],
+        emitted: List[str]
+    ) -> LLMResult:
+        """Stream Ollama's NDJSON reply, forwarding tokens to the sink (not hedged)."""
+        client = await self.get_client()
+        backend = self.backends.pick()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        final: Dict[str, Any] = {}
+        backend.outstanding += 1
+        try:
+            async with client.stream("POST", f"{backend.url}/api/generate", json=payload) as response:
+                self._check_status(response.status_code)
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMGatewayError(f"Ollama error: {chunk['error']}", retryable=False)
+                    token = chunk.get("response", "")
+                    if token:
+                        emitted.append(token)
+                        sink(token)
+                    if chunk.get("done"):
+                        final = chunk
+                        break
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.backends.record_failure(backend)
+            raise
+        finally:
+            backend.outstanding -= 1
+        self.backends.record_success(backend, loop.time() - started)
+        result = LLMResult(text="".join(emitted).strip(), streamed=True, backend=backend.url)
+        result.apply_timings(final)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get admission control, backend pool, circuit breaker and context cache metrics."""
+        return {
+            "admission": self.admission.get_stats(),
+            "backends": self.backends.get_stats(),
+            "circuit_breaker": self.circuit_breaker.get_stats(),
+            "context_cache": self.context_cache.get_stats(),
+        }
+
+    def is_started(self) -> bool:
+        """Check if the pooled client is open."""
+        return self._client is not None and not self._client.is_closed
+
+
+def _keep_alive_seconds(keep_alive: Optional[str]) -> float:
+    """Convert an Ollama keep_alive duration ("30m", "1h", "300s", 300) to seconds."""
+    default = 300.0  # Ollama's default keep_alive (5m)
+    if keep_alive is None:
+        return default
+    if isinstance(keep_alive, (int, float)):
+        return float(keep_alive)
+    units = {"s": 1, "m": 60, "h": 3600}
+    text = keep_alive.strip()
+    try:
+        if text[-1] in units:
+            return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except (ValueError, IndexError):
+        return default
+
+
+# Global gateway instance
+_llm_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Get global LLM gateway instance."""
+    global _llm_gateway
+    if _llm_gateway is None:
+        _llm_gateway = LLMGateway()
+    return _llm_gateway
+
+
+__all__ = ["LLMGateway", "LLMGatewayConfig", "LLMGatewayError", "get_llm_gateway"]
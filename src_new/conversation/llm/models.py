@@ -0,0 +1,112 @@
+"""Typed requests and results for the LLM gateway."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+from src_new.conversation.llm.admission import LLMPriority
+from src_new.conversation.llm.context_cache import SessionContextKey
+
+# Generation options shared by all agents (Ollama /api/generate "options")
+DEFAULT_OPTIONS: Dict[str, Any] = {
+    "top_p": 0.9,
+    "top_k": 40,
+    "num_ctx": 2048,
+    "repeat_penalty": 1.1,
+}
+
+
+@dataclass
+class LLMRequest:
+    """A single generation request."""
+    prompt: str
+    temperature: float
+    max_tokens: int = 512
+    fallback: str = ""  # Returned as text if every attempt fails
+    deadline: Optional[float] = None  # Seconds for the whole call incl. retries (None: config default)
+    max_retries: Optional[int] = None  # None: config default
+    priority: LLMPriority = LLMPriority.DEFAULT  # Admission priority (medium-risk before low-risk)
+    options: Dict[str, Any] = field(default_factory=dict)  # Overrides for DEFAULT_OPTIONS
+    # Context reuse: with a cached context for `session`, only `turn_prompt` is sent
+    session: Optional[SessionContextKey] = None
+    turn_prompt: Optional[str] = None
+
+    def ollama_options(self) -> Dict[str, Any]:
+        """Build the Ollama "options" payload."""
+        return {
+            "num_predict": self.max_tokens,
+            "temperature": self.temperature,
+            **DEFAULT_OPTIONS,
+            **self.options,
+        }
+
+
+@dataclass(slots=True)
+class LLMResult:
+    """Outcome of an LLMRequest.
+
+    Durations reported by Ollama are in nanoseconds; they are None when the
+    reply came from the fallback text or the backend did not report them.
+    """
+    text: str
+    ok: bool = True  # False: text is the request's fallback
+    error: Optional[str] = None
+    attempts: int = 1
+    latency: float = 0.0  # Wall-clock seconds for the whole call
+    queue_wait: float = 0.0  # Seconds spent waiting for an admission slot
+    shed: bool = False  # Refused by admission control (text is the fallback)
+    circuit_open: bool = False  # Refused by the open circuit breaker (text is the fallback)
+    backend_error: bool = False  # Failed because of the backend (counts against the circuit breaker)
+    streamed: bool = False
+    backend: Optional[str] = None  # URL of the backend that produced the reply
+    hedged: bool = False  # A second backend was raced against the first
+    context_reused: bool = False  # Continued from the session's cached context
+    context: Optional[List[int]] = None  # Ollama context tokens returned with the reply
+    eval_count: Optional[int] = None  # Generated tokens
+    eval_duration: Optional[int] = None
+    prompt_eval_count: Optional[int] = None  # Prompt tokens evaluated (not served from cache)
+    prompt_eval_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    total_duration: Optional[int] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation speed reported by the backend."""
+        if not self.eval_count or not self.eval_duration:
+            return None
+        return self.eval_count / (self.eval_duration / 1e9)
+
+    def apply_timings(self, payload: Dict[str, Any]) -> None:
+        """Copy Ollama's timing fields and context from a (final) response payload."""
+        self.eval_count = payload.get("eval_count")
+        self.eval_duration = payload.get("eval_duration")
+        self.prompt_eval_count = payload.get("prompt_eval_count")
+        self.prompt_eval_duration = payload.get("prompt_eval_duration")
+        self.load_duration = payload.get("load_duration")
+        self.total_duration = payload.get("total_duration")
+        self.context = payload.get("context")
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Call metadata for agent results (without the text)."""
+        return {
+            "ok": self.ok,
+            "error": self.error,
+            "attempts": self.attempts,
+            "latency_ms": round(self.latency * 1000, 2),
+            "queue_wait_ms": round(self.queue_wait * 1000, 2),
+            "shed": self.shed,
+            "circuit_open": self.circuit_open,
+            "streamed": self.streamed,
+            "backend": self.backend,
+            "hedged": self.hedged,
+            "context_reused": self.context_reused,
+            "eval_count": self.eval_count,
+            "eval_duration": self.eval_duration,
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_eval_duration": self.prompt_eval_duration,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+__all__ = ["DEFAULT_OPTIONS", "LLMRequest", "LLMResult"]
@@ -0,0 +1,203 @@
+"""Prompt assembly shared by all agents."""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, List, Optional, Sequence
+
+from src_new.conversation.llm.context_cache import SessionContextKey
+from src_new.conversation.llm.models import DEFAULT_OPTIONS
+from src_new.conversation.llm.tokens import count_tokens
+from src_new.shared.models import ConversationTurn
+
+# Session turns use "bot" for replies; agents historically used "assistant"
+ROLE_PREFIXES = {
+    "system": "System: ",
+    "user": "User: ",
+    "assistant": "Assistant: ",
+    "bot": "Assistant: ",
+}
+
+GENERATION_CUE = "Assistant:"
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PromptWindow:
+    """A prompt packed to a token budget, and what was left out."""
+    prompt: str
+    prompt_tokens: int  # Estimated, see count_tokens
+    history_budget: int  # Tokens available for history after reservations
+    history_tokens: int
+    history_turns: int  # Turns included (most recent)
+    dropped_turns: int  # Older turns that did not fit
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Window metadata for agent results."""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "history_budget": self.history_budget,
+            "history_tokens": self.history_tokens,
+            "history_turns": self.history_turns,
+            "dropped_turns": self.dropped_turns,
+        }
+
+
+def build_prompt(
+    system_prompts: Sequence[str],
+    user_message: str,
+    conversation_history: Optional[Sequence[ConversationTurn]] = None,
+    history_turns: int = 4
+) -> str:
+    """
+    Flatten system prompts, recent history and the new message into one prompt.
+
+    All parts are collected into a single list and joined once.
+
+    Args:
+        system_prompts: System blocks, in order
+        user_message: Current user message
+        conversation_history: Previous turns
+        history_turns: Number of most recent turns to include
+
+    Returns:
+        Prompt ending with the assistant generation cue
+    """
+    parts: List[str] = [f"System: {content}" for content in system_prompts]
+    if conversation_history and history_turns > 0:
+        parts.extend(_format_turns(conversation_history[-history_turns:]))
+    parts.append(f"User: {user_message}")
+    parts.append(GENERATION_CUE)
+    return "\n".join(parts)
+
+
+def build_prompt_window(
+    system_prompts: Sequence[str],
+    user_message: str,
+    conversation_history: Optional[Sequence[ConversationTurn]] = None,
+    history_budget: int = 1024,
+    max_tokens: int = 512,
+    num_ctx: int = DEFAULT_OPTIONS["num_ctx"],
+    summary: Optional[str] = None
+) -> PromptWindow:
+    """
+    Build a prompt with as much recent history as fits a token budget.
+
+    Room for the system prompts, the new message and the reply
+    (num_predict = max_tokens) is reserved from num_ctx first; history is
+    then packed newest-first into what is left, capped at history_budget.
+    A rolling summary of older turns (see src_new.conversation.summarizer)
+    is added as a system block and reserved like the system prompts.
+    Packing stops at the first turn that doesn't fit, so the included
+    history is always a contiguous, most recent run of turns.
+
+    Args:
+        system_prompts: System blocks, in order
+        user_message: Current user message
+        conversation_history: Previous turns
+        history_budget: Route's cap on history tokens
+        max_tokens: Tokens reserved for the reply
+        num_ctx: Model context size
+        summary: Summary of the turns before conversation_history
+
+    Returns:
+        PromptWindow with the prompt and packing statistics
+    """
+    head = [f"System: {content}" for content in system_prompts]
+    if summary:
+        head.append(f"System: {SUMMARY_PREFIX}{summary}")
+    tail = [f"User: {user_message}", GENERATION_CUE]
+    reserved = sum(_line_tokens(line) for line in head + tail)
+    budget = max(0, min(history_budget, num_ctx - max_tokens - reserved))
+
+    history = conversation_history or []
+    lines: List[str] = []
+    used = 0
+    for turn in reversed(history):
+        prefix = ROLE_PREFIXES.get(turn.role)
+        if prefix is None:
+            continue
+        line = prefix + turn.text
+        cost = _line_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    lines.reverse()
+
+    dropped = sum(1 for turn in history if turn.role in ROLE_PREFIXES) - len(lines)
+    if dropped:
+        logger.debug(f"Prompt history truncated: kept {len(lines)} turns ({used}/{budget} tokens), dropped {dropped}")
+    return PromptWindow(
+        prompt="\n".join(head + lines + tail),
+        prompt_tokens=reserved + used,
+        history_budget=budget,
+        history_tokens=used,
+        history_turns=len(lines),
+        dropped_turns=dropped
+    )
+
+
+def build_turn_prompt(user_message: str) -> str:
+    """Prompt for just the new turn (continuing from a cached Ollama context)."""
+    return f"User: {user_message}\n{GENERATION_CUE}"
+
+
+def session_context_key(
+    session_id: str,
+    system_prompts: Sequence[str],
+    conversation_history: Optional[Sequence[ConversationTurn]] = None,
+    turn_seq: Optional[int] = None
+) -> SessionContextKey:
+    """
+    Build the context-cache key for a session turn.
+
+    Args:
+        session_id: Session (user) identifier
+        system_prompts: System blocks of the prompt (incl. the summary)
+        conversation_history: History sent with the turn
+        turn_seq: Session turn sequence number (SessionService.turn_seq);
+            defaults to the history length, which only works while the
+            history is the whole, uncapped session
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for content in system_prompts:
+        digest.update(content.encode("utf-8"))
+        digest.update(b"\0")
+    history = conversation_history or []
+    return SessionContextKey(
+        session_id=session_id,
+        prefix=digest.hexdigest(),
+        turn_seq=turn_seq if turn_seq is not None else len(history),
+        history_tail=history[-1].text if history else None
+    )
+
+
+def _line_tokens(line: str) -> int:
+    return count_tokens(line) + 1  # + newline
+
+
+def _format_turns(turns: Iterable[ConversationTurn]) -> List[str]:
+    formatted = []
+    for turn in turns:
+        prefix = ROLE_PREFIXES.get(turn.role)
+        if prefix is not None:
+            formatted.append(prefix + turn.text)
+    return formatted
+
+
+__all__ = [
+    "ROLE_PREFIXES",
+    "GENERATION_CUE",
+    "SUMMARY_PREFIX",
+    "PromptWindow",
+    "build_prompt",
+    "build_prompt_window",
+    "build_turn_prompt",
+    "session_context_key",
+]
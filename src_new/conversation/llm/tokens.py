@@ -0,0 +1,37 @@
+"""Approximate token counting for prompt budgeting.
+
+The served model's tokenizer isn't available in-process, so counts are
+estimated from the text: ASCII words cost one token per 6 letters,
+numbers one per 3 digits, and every other non-space character (CJK,
+emoji, punctuation) one token. The estimate errs high for English, so a
+prompt packed to a budget stays inside num_ctx.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+_PIECE_PATTERN = re.compile(r"[A-Za-z]+|\d+|\S")
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """
+    Estimate the token count of a text.
+
+    Cached per distinct text, so each history turn is counted once across
+    all the prompts it appears in.
+    """
+    total = 0
+    for piece in _PIECE_PATTERN.findall(text):
+        if piece[0].isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece[0].isascii() and piece[0].isalpha():
+            total += (len(piece) + 5) // 6
+        else:
+            total += 1
+    return total
+
+
+__all__ = ["count_tokens"]
@@ -2,19 +2,64 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional, List, Dict, Any
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, AsyncIterator, Sequence, Set
 
 from src_new.control.risk_router import RiskRouter
 from src_new.control.control_context import ControlContext
+from src_new.control.route_updater import RouteUpdater
+from src_new.control.route_event_log import RouteEventLog, get_route_event_log, set_route_event_log
 from src_new.conversation.agents.low_risk_agent import LowRiskAgent
 from src_new.conversation.agents.medium_risk_agent import MediumRiskAgent
 from src_new.conversation.agents.high_risk_agent import HighRiskAgent
+from src_new.conversation.affinity import UserHandoff
 from src_new.conversation.session_service import SessionService
+from src_new.conversation.stages import Stage, StageResults, run_stage_graph
+from src_new.conversation.summarizer import ConversationSummarizer, split_history
+from src_new.conversation.user_state_manager import UserStateManager
+from src_new.conversation.llm.gateway import LLMGateway, get_llm_gateway
+from src_new.conversation.streaming import set_token_sink, reset_token_sink, token_event, replace_event
+from src_new.perception.psyguard_service import HIGH_RISK_DIRECT_THRESHOLD
+from src_new.shared.concurrency import KeyedMailboxes, MailboxFull
+from src_new.shared.deadline import Deadline
+from src_new.shared.keywords import has_keyword
 from src_new.shared.models import ConversationTurn
 
+if TYPE_CHECKING:
+    from src_new.conversation.agent_state_store import StateSpillBackend
+    from src_new.perception.psyguard_service import PsyGuardService
+    from src_new.safety.guardrails_service import SafetyGuardrailsService
+
 logger = logging.getLogger(__name__)
 
+FALLBACK_RESPONSE = "I'm here to help. Could you tell me more about how you're feeling?"
+BUSY_RESPONSE = "I'm still thinking about your last messages. Give me a moment before sending more."
+
+# Seconds the agent stage may overrun the deadline while its LLM call winds down
+AGENT_DEADLINE_GRACE = 0.25
+
+
+@dataclass
+class PipelineConfig:
+    """Latency budget and per-stage timeouts (seconds) for process_message.
+
+    Every turn gets a deadline `turn_budget` seconds out. A stage's timeout
+    is its own limit below or the budget left when it starts, whichever is
+    smaller; a stage that runs out uses its fallback.
+    """
+    turn_budget: float = 30.0  # End-to-end reply SLA
+    history_timeout: float = 1.0
+    perception_timeout: float = 2.0  # PsyGUARD scoring; on timeout the caller's route stands
+    input_safety_timeout: float = 3.0  # Guardrails input check; fails open
+    agent_timeout: float = 90.0  # Agent reply incl. LLM admission wait
+    max_queued_turns_per_user: int = 4  # Turns waiting behind the running one; more are rejected
+    actor_idle_timeout: float = 60.0  # Seconds before an idle user's mailbox is dropped
+    crisis_fast_lane: bool = True  # Answer high risk turns with the fixed script before any queue
+    route_event_log_dir: Optional[str] = "data/route_events"  # Route transition log opened by startup(); None: not recorded
+
 
 class ConversationPipeline:
     """Orchestrate conversation using new agents based on risk level.
@@ -23,75 +68,248 @@ class ConversationPipeline:
     - LowRiskAgent: Free chat + coping skills
     - MediumRiskAgent: Semi-structured + peer support group (with state machine)
     - HighRiskAgent: Fixed script + crisis hotline
+    
+    Turns are processed through one mailbox per active user: a user's turns
+    run one at a time in arrival order, different users run in parallel.
+    The pipeline holds each user's ControlContext (UserStateManager), so
+    callers only need to pass it with a user's first turn.
+    Several pipelines (workers) can share users through an AffinityRouter,
+    which hands users over with release_users() / adopt_users().
+    
+    Crisis fast lane: a turn whose route is already high, whose stored
+    PsyGUARD score is a direct high risk, or whose message hits a crisis
+    keyword is answered with the prebuilt fixed safety response before the
+    mailbox, so it never waits behind queued turns, LLM admission or the
+    guardrails round trip and is never rejected as overloaded. Recording
+    the turn runs after the reply, in the user's mailbox.
     """
     
-    def __init__(self):
-        """Initialize conversation pipeline."""
+    def __init__(
+        self,
+        llm_gateway: Optional[LLMGateway] = None,
+        psyguard: Optional["PsyGuardService"] = None,
+        guardrails: Optional["SafetyGuardrailsService"] = None,
+        config: Optional[PipelineConfig] = None,
+        session_service: Optional[SessionService] = None,
+        state_backend: Optional["StateSpillBackend"] = None
+    ):
+        """
+        Initialize conversation pipeline.
+        
+        Args:
+            llm_gateway: LLM gateway shared by all agents (defaults to the global gateway)
+            psyguard: Scores each message and upgrades the route (optional;
+                runs concurrently with the history fetch and input check)
+            guardrails: Checks each message before the agent runs; an unsafe
+                message is routed to the high risk agent (optional)
+            config: Per-stage timeouts
+            session_service: Session store (default: in-memory, no transcript archive)
+            state_backend: Store for medium risk agent state, written after
+                each medium risk turn (e.g. RedisStateBackend; default: in-memory only)
+        """
         self.router = RiskRouter()
-        self.session_service = SessionService()
-        self.low_agent = LowRiskAgent()
-        self.medium_agent = MediumRiskAgent()
+        self.session_service = session_service or SessionService()
+        self.llm_gateway = llm_gateway or get_llm_gateway()
+        self.low_agent = LowRiskAgent(gateway=self.llm_gateway)
+        self.medium_agent = MediumRiskAgent(gateway=self.llm_gateway, state_spill=state_backend)
         self.high_agent = HighRiskAgent()
+        self.user_states = UserStateManager(medium_agent=self.medium_agent)
+        self.summarizer = ConversationSummarizer(self.llm_gateway)
+        self.psyguard = psyguard
+        self.guardrails = guardrails
+        self.config = config or PipelineConfig()
+        self.mailboxes = KeyedMailboxes(
+            max_queue_depth=self.config.max_queued_turns_per_user,
+            idle_timeout=self.config.actor_idle_timeout
+        )
+        self._deferred: Dict[asyncio.Task, str] = {}  # Crisis bookkeeping task → user_id
+        self.fast_lane_turns = 0
+        self._route_event_log: Optional[RouteEventLog] = None
+    
+    async def startup(self):
+        """Startup hook: open the shared LLM connection pool and start the route event log.
+        
+        The route event log is process wide: if another pipeline already
+        installed one, this pipeline records into it and leaves it running.
+        """
+        await self.llm_gateway.startup()
+        if self.config.route_event_log_dir and get_route_event_log() is None:
+            log = await asyncio.to_thread(RouteEventLog, self.config.route_event_log_dir)
+            await log.start()
+            set_route_event_log(log)
+            self._route_event_log = log
+    
+    async def shutdown(self):
+        """Shutdown hook: finish crisis bookkeeping, stop mailboxes and summaries, flush session, agent state and route event writes, close the LLM pool."""
+        await asyncio.gather(*list(self._deferred), return_exceptions=True)
+        await self.mailboxes.close()
+        await self.summarizer.close()
+        await self.session_service.close()
+        await self.medium_agent.state_store.drain()
+        if self._route_event_log is not None:
+            if get_route_event_log() is self._route_event_log:
+                set_route_event_log(None)
+            await self._route_event_log.close()
+            self._route_event_log = None
+        await self.llm_gateway.shutdown()
     
     async def process_message(
         self,
         user_id: str,
         user_message: str,
-        control_context: ControlContext
+        control_context: Optional[ControlContext] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Process a user message and generate response using appropriate agent.
         
+        The turn is queued in the user's mailbox and runs once the user's
+        earlier turns are done. Time spent queued counts against the deadline.
+        When the user already has config.max_queued_turns_per_user turns
+        waiting, the message is rejected (not recorded) and the result has
+        "overloaded": True. High risk turns skip the mailbox (crisis fast
+        lane; the result has "fast_lane": True).
+        
         Args:
             user_id: User identifier
             user_message: User's message
-            control_context: Control context with route and risk information
+            control_context: Control context with route and risk information;
+                held for the user's later turns (None: use the held one)
+            deadline: Request deadline (default: config.turn_budget from now);
+                passed to perception, safety and agent calls
             
         Returns:
-            Dict with agent response and metadata
+            Dict with agent response and metadata (incl. per-stage timings
+            and the mailbox wait under "stage_timings")
+        
+        Raises:
+            ValueError: No control_context given and none held for the user
         """
+        control_context = self.user_states.hold(user_id, control_context)
+        if control_context is None:
+            raise ValueError(f"No ControlContext held for user {user_id}; pass one with the first turn")
+        
+        if self.config.crisis_fast_lane:
+            crisis_reason = self._crisis_reason(user_message, control_context)
+            if crisis_reason is not None:
+                return self._crisis_turn(user_id, user_message, control_context, crisis_reason)
+        
+        deadline = deadline or Deadline.after(self.config.turn_budget)
+        queued_at = time.perf_counter()
+        
+        async def turn() -> Dict[str, Any]:
+            queue_wait_ms = (time.perf_counter() - queued_at) * 1000
+            return await self._process_turn(user_id, user_message, control_context, deadline, queue_wait_ms)
+        
         try:
-            # Get conversation history
-            history = self.session_service.get_context(user_id)
-            
-            # Route to appropriate agent
-            route = control_context.route
-            
-            if route == "high":
-                agent_result = await self.high_agent.generate_response(
-                    user_message=user_message,
-                    conversation_history=history,
-                    rigid_score=control_context.rigid_score
-                )
-            elif route == "medium":
-                agent_result = await self.medium_agent.generate_response(
-                    user_id=user_id,
-                    user_message=user_message,
-                    conversation_history=history,
-                    rigid_score=control_context.rigid_score
-                )
-            else:  # low
-                agent_result = await self.low_agent.generate_response(
-                    user_message=user_message,
-                    conversation_history=history,
-                    rigid_score=control_context.rigid_score
-                )
-            
-            # Append turns to session
+            return await self.mailboxes.submit(user_id, turn)
+        except MailboxFull as e:
+            logger.warning(f"ConversationPipeline: user={user_id} overloaded ({e.depth} turns queued)")
+            return {
+                "user_id": user_id,
+                "route": control_context.route,
+                "overloaded": True,
+                "error": str(e),
+                "agent_result": {
+                    "agent": control_context.route + "_risk",
+                    "response": BUSY_RESPONSE,
+                    "error": str(e)
+                }
+            }
+    
+    @staticmethod
+    def _crisis_reason(user_message: str, control_context: ControlContext) -> Optional[str]:
+        """Why a turn takes the crisis fast lane, or None for the regular path."""
+        if control_context.route == "high":
+            return "route_high"
+        score = control_context.psyguard_score
+        if score is not None and score >= HIGH_RISK_DIRECT_THRESHOLD:
+            return "psyguard_high_risk_direct"
+        if has_keyword(user_message, "crisis"):
+            return "crisis_keywords"
+        return None
+    
+    def _crisis_turn(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: ControlContext,
+        reason: str
+    ) -> Dict[str, Any]:
+        """Answer a high risk turn immediately; recording it is deferred."""
+        started = time.perf_counter()
+        if control_context.route != "high":
+            control_context.update_route("high", reason=reason, source="crisis_fast_lane")
+        agent_result = self.high_agent.fixed_response()
+        self.fast_lane_turns += 1
+        task = asyncio.create_task(self._record_crisis_turn(user_id, user_message, agent_result["response"], reason))
+        self._deferred[task] = user_id
+        task.add_done_callback(self._forget_deferred)
+        return {
+            "user_id": user_id,
+            "route": "high",
+            "agent_result": agent_result,
+            "control_context": control_context,
+            "fast_lane": True,
+            "stage_timings": {"total_ms": round((time.perf_counter() - started) * 1000, 3)}
+        }
+    
+    def _forget_deferred(self, task: asyncio.Task) -> None:
+        self._deferred.pop(task, None)
+    
+    async def _record_crisis_turn(self, user_id: str, user_message: str, response: str, reason: str) -> None:
+        """Bookkeeping of a fast lane turn, after its reply was returned."""
+        logger.warning(f"ConversationPipeline: user={user_id} answered by the crisis fast lane ({reason})")
+        
+        async def record() -> None:
             self.session_service.append_turn(user_id, "user", user_message)
-            self.session_service.append_turn(user_id, "bot", agent_result.get("response", ""))
+            self.session_service.append_turn(user_id, "bot", response)
+            self.summarizer.maybe_schedule(user_id, self.session_service.get_context(user_id))
+        
+        try:
+            # After the user's earlier turns are recorded; waits rather than being rejected
+            await self.mailboxes.enqueue(user_id, record)
+        except Exception as e:
+            logger.error(f"ConversationPipeline: failed to record crisis turn of user={user_id}: {e}")
+    
+    async def _process_turn(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: ControlContext,
+        deadline: Deadline,
+        queue_wait_ms: float
+    ) -> Dict[str, Any]:
+        """Run one turn's stage graph (inside the user's mailbox)."""
+        try:
+            graph = await run_stage_graph(
+                self._build_stages(user_id, user_message, control_context, deadline),
+                deadline=deadline
+            )
+            agent_result = graph.results["agent"]
+            route = control_context.route
             
             logger.info(
                 f"ConversationPipeline: user={user_id}, route={route}, "
-                f"agent={agent_result.get('agent', 'unknown')}"
+                f"agent={agent_result.get('agent', 'unknown')}, total_ms={graph.total_ms:.1f}"
             )
             
-            return {
+            result = {
                 "user_id": user_id,
                 "route": route,
                 "agent_result": agent_result,
-                "control_context": control_context
+                "control_context": control_context,
+                "stage_timings": {
+                    **graph.timings_metadata(),
+                    "budget_ms": deadline.budget * 1000,
+                    "queue_wait_ms": round(queue_wait_ms, 2)
+                }
             }
+            if "perception" in graph.results:
+                result["perception"] = graph.results["perception"]
+            if "input_safety" in graph.results:
+                result["input_safety"] = graph.results["input_safety"]
+            return result
             
         except Exception as e:
             logger.error(f"Error in ConversationPipeline: {e}", exc_info=True)
@@ -101,11 +319,298 @@ class ConversationPipeline:
                 "error": str(e),
                 "agent_result": {
                     "agent": control_context.route + "_risk",
-                    "response": "I'm here to help. Could you tell me more about how you're feeling?",
+                    "response": FALLBACK_RESPONSE,
                     "error": str(e)
                 }
             }
     
+    def _build_stages(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: ControlContext,
+        deadline: Deadline
+    ) -> List[Stage]:
+        """
+        Stage graph for one turn.
+        
+            history ──┬──> input_safety ──┐
+                      ├───────────────────┼──> agent ──> record
+            perception ───────────────────┘
+        
+        Perception and input safety only run when their service is configured.
+        All stages but record are bounded by the deadline; record runs once a
+        reply exists, however late.
+        """
+        config = self.config
+        
+        async def history_stage(_: StageResults) -> Dict[str, Any]:
+            # Session or medium risk state held by another worker or lost in a
+            # restart: reload both in worker threads before the agent needs them
+            await asyncio.gather(
+                self.session_service.hydrate([user_id]),
+                self.medium_agent.state_store.prefetch([user_id])
+            )
+            # Rolling summary + the turns it doesn't cover
+            history = self.session_service.get_context(user_id)
+            summary = self.summarizer.get(user_id)
+            return {
+                "history": history,
+                "recent": split_history(history, summary),
+                "summary": summary.text if summary else None,
+                "turn_seq": self.session_service.turn_seq(user_id)
+            }
+        
+        stages = [Stage(
+            "history", history_stage,
+            timeout=config.history_timeout,
+            fallback={"history": [], "recent": [], "summary": None, "turn_seq": None}
+        )]
+        agent_inputs = ["history"]
+        
+        if self.psyguard is not None:
+            async def perception_stage(_: StageResults) -> Dict[str, Any]:
+                return await self.psyguard.score(user_message, deadline=deadline)
+            
+            stages.append(Stage(
+                "perception", perception_stage,
+                timeout=config.perception_timeout,
+                fallback=None  # Keep the caller's route
+            ))
+            agent_inputs.append("perception")
+        
+        if self.guardrails is not None:
+            async def input_safety_stage(inputs: StageResults) -> Dict[str, Any]:
+                return await self.guardrails.check_user_input_safety(
+                    user_message, context=inputs["history"]["history"], deadline=deadline
+                )
+            
+            stages.append(Stage(
+                "input_safety", input_safety_stage,
+                depends_on=("history",),
+                timeout=config.input_safety_timeout,
+                # Fail open, like SafetyGuardrailsService itself
+                fallback=lambda e: {"safe": True, "checked": False, "error": str(e) or type(e).__name__}
+            ))
+            agent_inputs.append("input_safety")
+        
+        async def agent_stage(inputs: StageResults) -> Dict[str, Any]:
+            await self._apply_signals(control_context, inputs.get("perception"), inputs.get("input_safety"))
+            return await self._run_agent(user_id, user_message, control_context, inputs["history"], deadline)
+        
+        async def record_stage(inputs: StageResults) -> None:
+            self.session_service.append_turn(user_id, "user", user_message)
+            self.session_service.append_turn(user_id, "bot", inputs["agent"].get("response", ""))
+            if inputs["agent"].get("agent") == "medium_risk":
+                await self.medium_agent.persist_state(user_id)
+            # Fold old turns into the summary in the background (never delays this reply)
+            self.summarizer.maybe_schedule(user_id, self.session_service.get_context(user_id))
+        
+        stages.append(Stage(
+            "agent", agent_stage,
+            depends_on=tuple(agent_inputs),
+            timeout=config.agent_timeout,
+            deadline_grace=AGENT_DEADLINE_GRACE,  # Agents answer with their own fallback at the deadline
+            fallback=lambda e: {
+                "agent": control_context.route + "_risk",
+                "response": FALLBACK_RESPONSE,
+                "error": str(e) or type(e).__name__
+            }
+        ))
+        stages.append(Stage("record", record_stage, depends_on=("agent",), bounded=False))
+        return stages
+    
+    async def _apply_signals(
+        self,
+        control_context: ControlContext,
+        perception: Optional[Dict[str, Any]],
+        input_safety: Optional[Dict[str, Any]]
+    ) -> None:
+        """
+        Upgrade the route from this turn's PsyGUARD score and guardrails verdict (one-way).
+        
+        Runs as a UserStateManager transaction, so an update applied from
+        outside the turn (e.g. apply_psyguard_score) is never lost.
+        """
+        async with self.user_states.transaction(control_context.user_id) as state:
+            state.control_context = control_context
+            if perception and perception.get("enabled") and "error" not in perception:
+                if RouteUpdater.apply_to_context(control_context, perception["risk_score"]):
+                    logger.info(
+                        f"ConversationPipeline: user={control_context.user_id} upgraded to "
+                        f"{control_context.route} by PsyGUARD"
+                    )
+            if input_safety and input_safety.get("checked") and not input_safety.get("safe", True):
+                control_context.update_route("high", reason="guardrails_input_unsafe", source="pipeline")
+    
+    async def _run_agent(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: ControlContext,
+        history: Dict[str, Any],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """Route to the agent for the context's current route."""
+        route = control_context.route
+        
+        if route == "high":
+            return await self.high_agent.generate_response(
+                user_message=user_message,
+                conversation_history=history["history"],
+                rigid_score=control_context.rigid_score
+            )
+        if route == "medium":
+            # The user's mailbox serializes turns, and with them this user's agent state
+            return await self.medium_agent.generate_response(
+                user_id=user_id,
+                user_message=user_message,
+                conversation_history=history["recent"],
+                rigid_score=control_context.rigid_score,
+                summary=history["summary"],
+                deadline=deadline,
+                turn_seq=history["turn_seq"]
+            )
+        # low
+        return await self.low_agent.generate_response(
+            user_message=user_message,
+            conversation_history=history["recent"],
+            rigid_score=control_context.rigid_score,
+            user_id=user_id,
+            summary=history["summary"],
+            deadline=deadline,
+            turn_seq=history["turn_seq"]
+        )
+    
+    async def process_message_stream(
+        self,
+        user_id: str,
+        user_message: str,
+        control_context: Optional[ControlContext] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_message.
+        
+        Yields token events while the agent generates, then a single "done"
+        event carrying the same result as process_message (agent
+        post-processing and session bookkeeping run on the completed text).
+        See src_new.conversation.streaming for the event format.
+        
+        Args:
+            user_id: User identifier
+            user_message: User's message
+            control_context: Control context with route and risk information
+                (None: use the one held for the user)
+            
+        Yields:
+            Event dicts: token* → [replace] → done
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        
+        async def run() -> Dict[str, Any]:
+            sink_token = set_token_sink(queue.put_nowait)
+            try:
+                return await self.process_message(user_id, user_message, control_context)
+            finally:
+                reset_token_sink(sink_token)
+        
+        task = asyncio.create_task(run())
+        task.add_done_callback(lambda _: queue.put_nowait(finished))
+        streamed: List[str] = []
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                streamed.append(item)
+                yield token_event(item)
+            
+            result = task.result()
+            response = result["agent_result"].get("response", "")
+            if "".join(streamed).strip() != response:
+                yield replace_event(response)
+            yield {
+                "type": "done",
+                "data": {
+                    "user_id": result["user_id"],
+                    "route": result["route"],
+                    "agent_result": result["agent_result"],
+                }
+            }
+        finally:
+            # Client went away mid-stream: stop generating
+            if not task.done():
+                task.cancel()
+    
+    def held_users(self) -> Set[str]:
+        """Users with queued turns, pending crisis bookkeeping or state in this pipeline's memory."""
+        return {
+            *self.mailboxes.busy_keys(),
+            *self._deferred.values(),
+            *self.session_service.user_ids(),
+            *self.medium_agent.held_users(),
+            *self.user_states.user_ids(),
+        }
+    
+    async def release_users(self, user_ids: Sequence[str]) -> List[UserHandoff]:
+        """
+        Hand users over to another worker (see src_new.conversation.affinity).
+        
+        Waits for each user's queued turns and pending crisis bookkeeping
+        to finish, removes the user's session, medium risk agent state,
+        summary and ControlContext from memory, and writes queued session
+        turns to the archive. The caller must stop sending the users' turns
+        here first.
+        
+        Args:
+            user_ids: Users to release
+        
+        Returns:
+            One UserHandoff per user, for adopt_users() on the new worker
+        """
+        released = set(user_ids)
+        # A crisis turn answered just before the handoff is recorded here first
+        await asyncio.gather(
+            *(task for task, user_id in list(self._deferred.items()) if user_id in released),
+            return_exceptions=True
+        )
+        await asyncio.gather(*(self.mailboxes.drain(user_id) for user_id in user_ids))
+        handoffs = []
+        for user_id in user_ids:
+            summary = self.summarizer.get(user_id)
+            self.summarizer.invalidate(user_id)
+            self.llm_gateway.context_cache.invalidate(user_id)
+            handoffs.append(UserHandoff(
+                user_id=user_id,
+                turns=self.session_service.evict(user_id),
+                medium_state=self.medium_agent.export_state(user_id),
+                summary=summary,
+                control_context=await self.user_states.release(user_id)
+            ))
+        # The new worker falls back to the archive if a handoff is lost
+        await self.session_service.flush()
+        return handoffs
+    
+    async def adopt_users(self, handoffs: Sequence[UserHandoff]) -> None:
+        """Take over users released by another worker's release_users()."""
+        for handoff in handoffs:
+            if handoff.turns:
+                self.session_service.restore(handoff.user_id, handoff.turns)
+            if handoff.medium_state is not None:
+                self.medium_agent.import_state(handoff.user_id, handoff.medium_state)
+            if handoff.summary is not None:
+                self.summarizer.restore(handoff.user_id, handoff.summary)
+            if handoff.control_context is not None:
+                await self.user_states.set_context(handoff.control_context)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-user mailbox statistics (active users, queued turns, rejected overloads) and fast lane counts."""
+        return {
+            "mailboxes": self.mailboxes.get_stats(),
+            "fast_lane": {"turns": self.fast_lane_turns, "pending_bookkeeping": len(self._deferred)},
+        }
+    
     def get_conversation_history(self, user_id: str) -> List[ConversationTurn]:
         """Get conversation history for a user."""
         return self.session_service.get_context(user_id)
@@ -113,8 +618,10 @@ class ConversationPipeline:
     def clear_conversation(self, user_id: str):
         """Clear conversation history for a user."""
         self.session_service.clear_session(user_id)
+        self.llm_gateway.context_cache.invalidate(user_id)
+        self.summarizer.invalidate(user_id)
         # Also reset Medium Risk Agent state if needed
         self.medium_agent.reset_state(user_id)
 
 
-__all__ = ["ConversationPipeline"]
+__all__ = ["ConversationPipeline", "PipelineConfig"]
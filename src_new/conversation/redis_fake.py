@@ -0,0 +1,301 @@
+"""In-process fake Redis server for tests.
+
+Speaks RESP2 over a real TCP socket on localhost, so the real `redis`
+client (connections, pipelines, reply parsing) is exercised end to end
+without a Redis install. Implements the commands the Redis stores use plus
+the handshake the client sends; data lives in a dict.
+
+Every batch of commands read from a socket in one go counts as a round trip;
+with `latency` set, each round trip is delayed, which makes pipelining
+visible in timings.
+"""
+
+from __future__ import annotations
+
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+Value = Union[bytes, List[bytes]]
+
+
+class _Error(Exception):
+    pass
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        fake = self.server.fake
+        buffer = b""
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            commands, buffer = _parse_commands(buffer)
+            if not commands:
+                continue
+            fake.round_trips += 1
+            if fake.latency:
+                time.sleep(fake.latency)
+            replies = b"".join(_encode(fake.execute(command)) for command in commands)
+            try:
+                self.request.sendall(replies)
+            except OSError:
+                return
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    fake: "FakeRedisServer"
+
+
+class FakeRedisServer:
+    """Scriptable fake Redis server.
+
+    Usage:
+        with FakeRedisServer() as server:
+            client = server.client()
+
+    Attributes:
+        commands: Every command received, as (NAME, *args) tuples
+        round_trips: Command batches received (one per pipeline execute)
+        latency: Seconds added to every round trip
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.commands: List[Tuple[str, ...]] = []
+        self.round_trips = 0
+        self._data: Dict[bytes, Value] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[_Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakeRedisServer":
+        """Start serving on a free localhost port."""
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving (open connections are dropped)."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def client(self, **kwargs: Any):
+        """redis.Redis client connected to this server (RESP2: the fake has no HELLO)."""
+        import redis
+        kwargs.setdefault("protocol", 2)
+        return redis.Redis.from_url(self.url, **kwargs)
+
+    def keys(self) -> List[bytes]:
+        """Live keys (for assertions)."""
+        with self._lock:
+            return [key for key in list(self._data) if self._alive(key)]
+
+    def __enter__(self) -> "FakeRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    # Command execution
+
+    def execute(self, command: List[bytes]) -> Any:
+        name = command[0].decode().upper()
+        args = command[1:]
+        self.commands.append((name, *(arg.decode("utf-8", "replace") for arg in args)))
+        handler = getattr(self, f"_cmd_{name.lower()}", None)
+        if handler is None:
+            return _Error(f"ERR unknown command '{name}'")
+        with self._lock:
+            try:
+                return handler(*args)
+            except _Error as e:
+                return e
+            except (TypeError, ValueError):
+                return _Error(f"ERR wrong number or type of arguments for '{name}'")
+
+    def _alive(self, key: bytes) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and time.monotonic() >= expires:
+            self._data.pop(key, None)
+            del self._expires[key]
+        return key in self._data
+
+    def _list(self, key: bytes) -> Optional[List[bytes]]:
+        if not self._alive(key):
+            return None
+        value = self._data[key]
+        if not isinstance(value, list):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_ping(self, *args: bytes) -> Any:
+        return args[0] if args else "PONG"
+
+    def _cmd_select(self, db: bytes) -> str:
+        return "OK"
+
+    def _cmd_client(self, *args: bytes) -> str:
+        return "OK"
+
+    def _cmd_flushdb(self, *args: bytes) -> str:
+        self._data.clear()
+        self._expires.clear()
+        return "OK"
+
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        if not self._alive(key):
+            return None
+        value = self._data[key]
+        if isinstance(value, list):
+            raise _Error("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _cmd_mget(self, *keys: bytes) -> List[Optional[bytes]]:
+        return [
+            self._data[key] if self._alive(key) and not isinstance(self._data[key], list) else None
+            for key in keys
+        ]
+
+    def _cmd_set(self, key: bytes, value: bytes, *options: bytes) -> str:
+        self._data[key] = value
+        self._expires.pop(key, None)
+        options_iter = iter(option.upper() for option in options)
+        for option in options_iter:
+            if option == b"EX":
+                self._expires[key] = time.monotonic() + int(next(options_iter))
+            elif option == b"PX":
+                self._expires[key] = time.monotonic() + int(next(options_iter)) / 1000
+            else:
+                raise _Error(f"ERR unsupported SET option {option.decode()}")
+        return "OK"
+
+    def _cmd_del(self, *keys: bytes) -> int:
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def _cmd_exists(self, *keys: bytes) -> int:
+        return sum(1 for key in keys if self._alive(key))
+
+    def _cmd_pexpire(self, key: bytes, milliseconds: bytes) -> int:
+        if not self._alive(key):
+            return 0
+        self._expires[key] = time.monotonic() + int(milliseconds) / 1000
+        return 1
+
+    def _cmd_rpush(self, key: bytes, *values: bytes) -> int:
+        if not values:
+            raise ValueError()
+        items = self._list(key)
+        if items is None:
+            items = self._data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def _cmd_llen(self, key: bytes) -> int:
+        items = self._list(key)
+        return len(items) if items is not None else 0
+
+    def _cmd_lrange(self, key: bytes, start: bytes, stop: bytes) -> List[bytes]:
+        items = self._list(key) or []
+        first, last = _index_range(len(items), int(start), int(stop))
+        return items[first:last]
+
+    def _cmd_ltrim(self, key: bytes, start: bytes, stop: bytes) -> str:
+        items = self._list(key)
+        if items is not None:
+            first, last = _index_range(len(items), int(start), int(stop))
+            items[:] = items[first:last]
+            if not items:
+                del self._data[key]
+                self._expires.pop(key, None)
+        return "OK"
+
+
+def _index_range(length: int, start: int, stop: int) -> Tuple[int, int]:
+    """Redis inclusive (negative-aware) indexes → Python slice bounds."""
+    if start < 0:
+        start = max(0, length + start)
+    if stop < 0:
+        stop = length + stop
+    return start, max(start, min(stop, length - 1) + 1)
+
+
+def _parse_commands(buffer: bytes) -> Tuple[List[List[bytes]], bytes]:
+    """Split complete RESP arrays off the front of a buffer."""
+    commands = []
+    position = 0
+    while position < len(buffer):
+        parsed = _parse_command(buffer, position)
+        if parsed is None:
+            break
+        command, position = parsed
+        commands.append(command)
+    return commands, buffer[position:]
+
+
+def _parse_command(buffer: bytes, position: int) -> Optional[Tuple[List[bytes], int]]:
+    line_end = buffer.find(b"\r\n", position)
+    if line_end < 0:
+        return None
+    if buffer[position:position + 1] != b"*":
+        # Inline command (e.g. typed into a telnet session)
+        return buffer[position:line_end].split(), line_end + 2
+    count = int(buffer[position + 1:line_end])
+    position = line_end + 2
+    args = []
+    for _ in range(count):
+        line_end = buffer.find(b"\r\n", position)
+        if line_end < 0:
+            return None
+        length = int(buffer[position + 1:line_end])
+        start = line_end + 2
+        if len(buffer) < start + length + 2:
+            return None
+        args.append(buffer[start:start + length])
+        position = start + length + 2
+    return args, position
+
+
+def _encode(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, _Error):
+        return b"-" + str(reply).encode() + b"\r\n"
+    if isinstance(reply, str):
+        return b"+" + reply.encode() + b"\r\n"
+    if isinstance(reply, bool) or isinstance(reply, int):
+        return b":" + str(int(reply)).encode() + b"\r\n"
+    if isinstance(reply, bytes):
+        return b"$" + str(len(reply)).encode() + b"\r\n" + reply + b"\r\n"
+    if isinstance(reply, list):
+        return b"*" + str(len(reply)).encode() + b"\r\n" + b"".join(_encode(item) for item in reply)
+    raise TypeError(f"Cannot encode reply {reply!r}")
+
+
+__all__ = ["FakeRedisServer"]
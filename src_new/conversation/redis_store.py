@@ -0,0 +1,158 @@
+"""Redis-backed session transcripts and agent state.
+
+Process-local SessionService rings and AgentStateStore entries are caches
+in front of these stores, so any worker can pick up a user's conversation
+and a restart loses nothing that was flushed:
+
+    - RedisTranscriptArchive (TranscriptArchive): one list per session,
+      one packed entry per turn; batched appends and multi-session reads
+      go out as a single pipelined round trip.
+    - RedisStateBackend (StateSpillBackend): one packed value per user's
+      agent state; several users' states are read with one MGET.
+
+Values use the compact struct-packed encoding of src_new.shared.packing.
+Requests for one user should reach the worker holding their cached state
+(see the consistent-hash router) so two workers don't update it at once.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src_new.shared.models import ConversationTurn
+from src_new.shared.packing import pack, unpack
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFIX = "proximo:session:"
+STATE_PREFIX = "proximo:state:"
+
+
+def connect(url: str, **kwargs: Any):
+    """
+    Create a redis.Redis client.
+
+    Args:
+        url: Redis URL (e.g. the REDIS_URL setting, redis://redis:6379)
+        **kwargs: Passed to redis.Redis.from_url
+    """
+    import redis
+    return redis.Redis.from_url(url, **kwargs)
+
+
+def encode_turn(turn: ConversationTurn) -> bytes:
+    """Pack a turn as (role, text, timestamp)."""
+    return pack((turn.role, turn.text, turn.timestamp))
+
+
+def decode_turn(data: bytes) -> ConversationTurn:
+    """Rebuild a turn packed by encode_turn()."""
+    role, text, timestamp = unpack(data)
+    return ConversationTurn(role=role, text=text, timestamp=timestamp)
+
+
+class RedisTranscriptArchive:
+    """TranscriptArchive storing each session as a Redis list of packed turns."""
+
+    def __init__(self, client: Any, prefix: str = SESSION_PREFIX, ttl: Optional[float] = None):
+        """
+        Initialize Redis transcript archive.
+
+        Args:
+            client: redis.Redis client (see connect())
+            prefix: Key prefix; a session lives at prefix + user_id
+            ttl: Seconds a session is kept after its last append (None: forever)
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, user_id: str) -> str:
+        return self.prefix + user_id
+
+    def append(self, user_id: str, turn: ConversationTurn) -> None:
+        self.append_batch([(user_id, turn)])
+
+    def append_batch(self, turns: Sequence[Tuple[str, ConversationTurn]]) -> None:
+        # One RPUSH per session, all in one round trip
+        grouped: Dict[str, List[bytes]] = {}
+        for user_id, turn in turns:
+            grouped.setdefault(user_id, []).append(encode_turn(turn))
+        if not grouped:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, values in grouped.items():
+            pipe.rpush(self._key(user_id), *values)
+            if self.ttl is not None:
+                pipe.pexpire(self._key(user_id), int(self.ttl * 1000))
+        pipe.execute()
+
+    def read(self, user_id: str) -> List[ConversationTurn]:
+        return [decode_turn(value) for value in self.client.lrange(self._key(user_id), 0, -1)]
+
+    def read_recent_many(self, user_ids: Sequence[str], n: int) -> Dict[str, List[ConversationTurn]]:
+        if not user_ids or n <= 0:
+            return {user_id: [] for user_id in user_ids}
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.lrange(self._key(user_id), -n, -1)
+        return {
+            user_id: [decode_turn(value) for value in values]
+            for user_id, values in zip(user_ids, pipe.execute(), strict=True)
+        }
+
+    def delete(self, user_id: str) -> None:
+        self.client.delete(self._key(user_id))
+
+
+class RedisStateBackend:
+    """StateSpillBackend storing each user's agent state as one packed value."""
+
+    def __init__(self, client: Any, prefix: str = STATE_PREFIX, ttl: Optional[float] = None):
+        """
+        Initialize Redis state backend.
+
+        Args:
+            client: redis.Redis client (see connect())
+            prefix: Key prefix; a user's state lives at prefix + user_id
+            ttl: Seconds a state is kept after its last save (None: forever)
+        """
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def save(self, key: str, data: Dict[str, Any]) -> None:
+        """Store state for a key, replacing any previous value."""
+        px = int(self.ttl * 1000) if self.ttl is not None else None
+        self.client.set(self._key(key), pack(data), px=px)
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get stored state for a key, or None."""
+        value = self.client.get(self._key(key))
+        return unpack(value) if value is not None else None
+
+    def load_many(self, keys: Sequence[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get stored state for several keys with one MGET."""
+        if not keys:
+            return {}
+        values = self.client.mget([self._key(key) for key in keys])
+        return {key: unpack(value) if value is not None else None for key, value in zip(keys, values, strict=True)}
+
+    def delete(self, key: str) -> None:
+        """Forget stored state for a key."""
+        self.client.delete(self._key(key))
+
+
+__all__ = [
+    "SESSION_PREFIX",
+    "STATE_PREFIX",
+    "connect",
+    "encode_turn",
+    "decode_turn",
+    "RedisTranscriptArchive",
+    "RedisStateBackend",
+]
@@ -2,46 +2,103 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from datetime import datetime
 
+from src_new.conversation.session_store import (
+    DEFAULT_SESSION_CAPACITY,
+    TranscriptArchive,
+    TurnRing,
+)
 from src_new.shared.models import ConversationTurn
 
 logger = logging.getLogger(__name__)
 
+# Pending archive operation: (user_id, turn to append | None to delete the transcript)
+_ArchiveOp = Tuple[str, Optional[ConversationTurn]]
+
 
 class SessionService:
     """Manages conversation sessions and context.
-    
-    Wrapper around legacy SessionManager for new architecture.
+
+    Each session keeps its last `capacity` turns in a ring buffer (bounded
+    memory per session, O(n) access to the last n turns). The complete
+    transcript goes to the optional archive. With a shared archive (Redis),
+    hydrate() reloads sessions this process doesn't hold, so another worker
+    or a restarted one continues the conversation.
+
+    Archive writes are write-behind when `flush_interval` is set: append_turn
+    only updates memory and queues the turn, and a background task writes
+    queued turns in one `append_batch` call every `flush_interval` seconds,
+    or as soon as `max_batch` turns are queued. Without a running event loop
+    (or with flush_interval=None) turns are written through immediately.
+
+    Crash-loss bound: turns not yet written are lost if the process dies
+    without close(). That is at most the turns appended during the last
+    `flush_interval` seconds plus one archive write, and at most about
+    `max_batch` turns. While the archive keeps failing, queued turns are
+    retried on every flush and kept up to `max_pending`; beyond that the
+    oldest are dropped and counted in `lost_turns`. A write that fails
+    halfway is retried whole, so archives may see a turn twice.
     """
-    
-    def __init__(self):
-        """Initialize session service."""
-        from src.conversation.session_manager import SessionManager
-        self._manager = SessionManager
-    
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_SESSION_CAPACITY,
+        archive: Optional[TranscriptArchive] = None,
+        flush_interval: Optional[float] = 1.0,
+        max_batch: int = 64,
+        max_pending: int = 10_000
+    ):
+        """
+        Initialize session service.
+
+        Args:
+            capacity: Turns kept in memory per session
+            archive: Receives every turn (full transcript); without one,
+                turns older than `capacity` are dropped
+            flush_interval: Max seconds a turn waits before it is written
+                to the archive (None: write through on every append)
+            max_batch: Queued turns that trigger an immediate flush
+            max_pending: Queued turns kept while the archive is failing
+        """
+        self.capacity = capacity
+        self.archive = archive
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._sessions: Dict[str, TurnRing] = {}
+        self.dropped_turns = 0
+
+        # Write-behind state
+        self._pending: List[_ArchiveOp] = []
+        self._oldest_pending: Optional[float] = None  # time.monotonic() of the oldest queued op
+        self._flush_lock = asyncio.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+        self.flushes = 0
+        self.flushed_turns = 0
+        self.flush_failures = 0
+        self.lost_turns = 0
+        self.hydrated = 0
+
     def get_context(self, user_id: str) -> List[ConversationTurn]:
         """
         Get conversation context for a user.
-        
+
         Args:
             user_id: User identifier
-            
+
         Returns:
-            List of ConversationTurn objects
-        """
-        raw_context = self._manager.get_context(user_id)
-        return [
-            ConversationTurn(
-                role=turn.get("role", "user"),
-                text=turn.get("text", ""),
-                timestamp=turn.get("timestamp")
-            )
-            for turn in raw_context
-        ]
-    
+            List of ConversationTurn objects (at most `capacity`, oldest first)
+        """
+        ring = self._sessions.get(user_id)
+        return ring.recent(ring.capacity) if ring is not None else []
+
     def append_turn(
         self,
         user_id: str,
@@ -50,43 +107,275 @@ class SessionService:
     ) -> None:
         """
         Append a conversation turn to the session.
-        
+
         Args:
             user_id: User identifier
             role: "user" or "bot"
             text: Message content
         """
-        self._manager.append_turn(user_id, role, text)
-    
+        turn = ConversationTurn(role=role, text=text, timestamp=datetime.now().isoformat())
+        ring = self._sessions.get(user_id)
+        if ring is None:
+            ring = self._sessions[user_id] = TurnRing(self.capacity)
+        if ring.append(turn) is not None:
+            self.dropped_turns += 1
+        if self.archive is None:
+            return
+        if self._write_behind():
+            self._enqueue((user_id, turn))
+            return
+        try:
+            self.archive.append(user_id, turn)
+        except Exception as e:
+            logger.warning(f"Transcript archive failed for {user_id}: {e}")
+
+    def turn_seq(self, user_id: str) -> int:
+        """
+        Get the session's turn sequence number: turns recorded since the
+        session was created, cleared or restored in this process.
+
+        Unlike len(get_context()) it keeps increasing once the ring is full,
+        so it identifies the session state a turn continues from.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            Sequence number (0 for a session not in memory)
+        """
+        ring = self._sessions.get(user_id)
+        return ring.appended if ring is not None else 0
+
     def get_recent_turns(self, user_id: str, n: int = 6) -> List[ConversationTurn]:
         """
         Get the most recent N conversation turns.
-        
+
         Args:
             user_id: User identifier
             n: Number of recent turns to return
-            
+
         Returns:
             List of recent ConversationTurn objects
         """
-        raw_turns = self._manager.get_recent_turns(user_id, n)
-        return [
-            ConversationTurn(
-                role=turn.get("role", "user"),
-                text=turn.get("text", ""),
-                timestamp=turn.get("timestamp")
-            )
-            for turn in raw_turns
+        ring = self._sessions.get(user_id)
+        return ring.recent(n) if ring is not None else []
+
+    async def hydrate(self, user_ids: Sequence[str]) -> int:
+        """
+        Load the recent turns of sessions not in memory from the archive.
+
+        All sessions are read together (one pipelined round trip on Redis).
+        Sessions with queued archive writes are skipped: memory is newer.
+
+        Args:
+            user_ids: Sessions about to be used
+
+        Returns:
+            Number of sessions loaded
+        """
+        if self.archive is None:
+            return 0
+        queued = {user_id for user_id, _ in self._pending}
+        missing = [
+            user_id for user_id in dict.fromkeys(user_ids)
+            if user_id not in self._sessions and user_id not in queued
         ]
-    
+        if not missing:
+            return 0
+        try:
+            loaded = await asyncio.to_thread(self.archive.read_recent_many, missing, self.capacity)
+        except Exception as e:
+            logger.warning(f"Session hydration from archive failed: {e}")
+            return 0
+
+        queued = {user_id for user_id, _ in self._pending}
+        count = 0
+        for user_id in missing:
+            turns = loaded.get(user_id)
+            # Appended or cleared while loading: memory wins
+            if not turns or user_id in self._sessions or user_id in queued:
+                continue
+            self.restore(user_id, turns)
+            count += 1
+        self.hydrated += count
+        return count
+
+    def restore(self, user_id: str, turns: Sequence[ConversationTurn]) -> None:
+        """
+        Install a session's recent turns in memory (not written to the archive).
+
+        Used to resume a session read from the archive or handed over by
+        another worker; replaces whatever this process held for the user.
+
+        Args:
+            user_id: User identifier
+            turns: Turns, oldest first (only the last `capacity` are kept)
+        """
+        ring = TurnRing(self.capacity)
+        for turn in turns:
+            ring.append(turn)
+        self._sessions[user_id] = ring
+
+    def evict(self, user_id: str) -> List[ConversationTurn]:
+        """
+        Drop a session from memory, keeping its archived transcript.
+
+        Queued archive writes of the session are still written; call
+        flush() first when another process is about to read the archive.
+
+        Args:
+            user_id: User identifier
+
+        Returns:
+            The turns that were in memory, oldest first
+        """
+        ring = self._sessions.pop(user_id, None)
+        return ring.recent(ring.capacity) if ring is not None else []
+
+    def user_ids(self) -> List[str]:
+        """Users whose session is in memory."""
+        return list(self._sessions)
+
+    async def get_transcript(self, user_id: str) -> List[ConversationTurn]:
+        """
+        Get the full transcript of a session.
+
+        Reads the archive (after flushing queued turns) when one is
+        configured, otherwise returns the turns still in memory.
+        """
+        if self.archive is None:
+            return self.get_context(user_id)
+        async with self._flush_lock:
+            await self._flush_locked()
+            # Whatever the archive refused is still queued, in order
+            unflushed = [turn for pending_user, turn in self._pending if pending_user == user_id]
+            if None in unflushed:
+                cleared_at = len(unflushed) - 1 - unflushed[::-1].index(None)
+                return unflushed[cleared_at + 1:]
+            return self.archive.read(user_id) + unflushed
+
     def clear_session(self, user_id: str) -> None:
         """
         Clear all conversation history for a user.
-        
+
         Args:
             user_id: User identifier
         """
-        self._manager.clear_session(user_id)
+        self._sessions.pop(user_id, None)
+        if self.archive is None:
+            return
+        if self._write_behind():
+            # Queued after this session's pending appends so the archive sees them in order
+            self._pending = [op for op in self._pending if op[0] != user_id]
+            self._enqueue((user_id, None))
+            return
+        self.archive.delete(user_id)
+
+    def _write_behind(self) -> bool:
+        """Whether archive writes are queued (starts the flusher on first use)."""
+        if self.flush_interval is None or self._closing:
+            return False
+        if self._flusher is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return False  # No event loop to flush from: write through
+            self._wake = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop(), name="session-write-behind")
+        return True
+
+    def _enqueue(self, op: _ArchiveOp) -> None:
+        if not self._pending:
+            self._oldest_pending = time.monotonic()
+        self._pending.append(op)
+        if len(self._pending) > self.max_pending:
+            del self._pending[:len(self._pending) - self.max_pending]
+            self.lost_turns += 1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+    async def _flush_loop(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write queued turns to the archive now.
+
+        Returns:
+            Number of turns written (0 if nothing was queued or the write failed)
+        """
+        async with self._flush_lock:
+            return await self._flush_locked()
+
+    async def _flush_locked(self) -> int:
+        if not self._pending:
+            return 0
+        batch, oldest = self._pending, self._oldest_pending
+        self._pending, self._oldest_pending = [], None
+        try:
+            # File or network I/O stays off the event loop
+            await asyncio.to_thread(self._write_batch, batch)
+        except Exception as e:
+            self.flush_failures += 1
+            logger.warning(f"Session archive flush of {len(batch)} ops failed ({e}); will retry")
+            self._pending = batch + self._pending
+            self._oldest_pending = oldest
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                self.lost_turns += overflow
+            return 0
+        written = sum(1 for _, turn in batch if turn is not None)
+        self.flushes += 1
+        self.flushed_turns += written
+        return written
+
+    def _write_batch(self, batch: List[_ArchiveOp]) -> None:
+        appends = []
+        for user_id, turn in batch:
+            if turn is not None:
+                appends.append((user_id, turn))
+                continue
+            if appends:
+                self.archive.append_batch(appends)
+                appends = []
+            self.archive.delete(user_id)
+        if appends:
+            self.archive.append_batch(appends)
+
+    async def close(self) -> None:
+        """Shutdown hook: stop the background flusher and write every queued turn."""
+        self._closing = True
+        if self._flusher is not None:
+            self._wake.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get session counts and memory bounds."""
+        return {
+            "sessions": len(self._sessions),
+            "turns_in_memory": sum(len(ring) for ring in self._sessions.values()),
+            "capacity_per_session": self.capacity,
+            "dropped_turns": self.dropped_turns,
+            "archived": self.archive is not None,
+            "pending": len(self._pending),
+            "oldest_pending_seconds": (
+                time.monotonic() - self._oldest_pending if self._oldest_pending is not None else 0.0
+            ),
+            "flushes": self.flushes,
+            "flushed_turns": self.flushed_turns,
+            "flush_failures": self.flush_failures,
+            "lost_turns": self.lost_turns,
+            "hydrated": self.hydrated,
+        }
 
 
 __all__ = ["SessionService"]
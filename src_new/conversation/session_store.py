@@ -0,0 +1,165 @@
+"""Bounded in-memory session turns plus an optional full-transcript archive.
+
+Each session keeps its most recent turns in a fixed-capacity ring buffer of
+ConversationTurn records. Appending is O(1) and never grows the session past
+its capacity; reading the last n turns touches only those n slots. Turns are
+stored as the immutable records handed out to callers, so no per-read
+rebuild is needed.
+
+Turns that fall out of the ring are not lost when a TranscriptArchive is
+configured: every turn is also appended to the archive, which holds the
+complete transcript outside the hot path. Archives take turns in batches
+(`append_batch`), so SessionService can write behind: one bulk write per
+flush instead of one round trip per turn.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Protocol, Sequence, Tuple, Union
+from urllib.parse import quote
+
+from src_new.shared.models import ConversationTurn
+
+# Turns kept in memory per session: enough for the agents' prompt window
+# plus the rolling summarizer's fold-in batch (keep_recent + every_turns)
+DEFAULT_SESSION_CAPACITY = 20
+
+
+class TurnRing:
+    """Fixed-capacity ring buffer of turns (oldest are overwritten)."""
+
+    __slots__ = ("_slots", "_start", "_size", "_appended")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self._slots: List[Optional[ConversationTurn]] = [None] * capacity
+        self._start = 0  # Index of the oldest turn
+        self._size = 0
+        self._appended = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+
+    @property
+    def appended(self) -> int:
+        """Turns ever appended (keeps growing once the oldest are overwritten)."""
+        return self._appended
+
+    def append(self, turn: ConversationTurn) -> Optional[ConversationTurn]:
+        """
+        Add a turn as the newest.
+
+        Returns:
+            The oldest turn if it was overwritten, else None
+        """
+        self._appended += 1
+        capacity = len(self._slots)
+        if self._size < capacity:
+            self._slots[(self._start + self._size) % capacity] = turn
+            self._size += 1
+            return None
+        dropped = self._slots[self._start]
+        self._slots[self._start] = turn
+        self._start = (self._start + 1) % capacity
+        return dropped
+
+    def recent(self, n: int) -> List[ConversationTurn]:
+        """Last n turns, oldest first (O(n), at most two slice copies)."""
+        n = min(n, self._size)
+        if n <= 0:
+            return []
+        capacity = len(self._slots)
+        begin = (self._start + self._size - n) % capacity
+        end = begin + n
+        if end <= capacity:
+            return self._slots[begin:end]
+        return self._slots[begin:] + self._slots[:end - capacity]
+
+    def clear(self) -> None:
+        self._slots = [None] * len(self._slots)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[ConversationTurn]:
+        capacity = len(self._slots)
+        for offset in range(self._size):
+            yield self._slots[(self._start + offset) % capacity]
+
+
+class TranscriptArchive(Protocol):
+    """Append-only store of every turn of a session."""
+
+    def append(self, user_id: str, turn: ConversationTurn) -> None: ...
+
+    def append_batch(self, turns: Sequence[Tuple[str, ConversationTurn]]) -> None:
+        """Append (user_id, turn) pairs in order, in as few writes as possible."""
+        ...
+
+    def read(self, user_id: str) -> List[ConversationTurn]: ...
+
+    def read_recent_many(self, user_ids: Sequence[str], n: int) -> Dict[str, List[ConversationTurn]]:
+        """Last n turns of each session, read together where the backend allows."""
+        ...
+
+    def delete(self, user_id: str) -> None: ...
+
+
+class JsonlTranscriptArchive:
+    """Archive with one JSON-lines file per session in a directory."""
+
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, user_id: str) -> Path:
+        return self.directory / f"{quote(user_id, safe='')}.jsonl"
+
+    @staticmethod
+    def _line(turn: ConversationTurn) -> str:
+        record = {"role": turn.role, "text": turn.text, "timestamp": turn.timestamp}
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def append(self, user_id: str, turn: ConversationTurn) -> None:
+        with self._path(user_id).open("a", encoding="utf-8") as f:
+            f.write(self._line(turn))
+
+    def append_batch(self, turns: Sequence[Tuple[str, ConversationTurn]]) -> None:
+        # One open + write per session in the batch
+        lines: Dict[str, List[str]] = {}
+        for user_id, turn in turns:
+            lines.setdefault(user_id, []).append(self._line(turn))
+        for user_id, session_lines in lines.items():
+            with self._path(user_id).open("a", encoding="utf-8") as f:
+                f.write("".join(session_lines))
+
+    def read(self, user_id: str) -> List[ConversationTurn]:
+        path = self._path(user_id)
+        if not path.exists():
+            return []
+        turns = []
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    turns.append(ConversationTurn(**json.loads(line)))
+        return turns
+
+    def read_recent_many(self, user_ids: Sequence[str], n: int) -> Dict[str, List[ConversationTurn]]:
+        return {user_id: self.read(user_id)[-n:] if n > 0 else [] for user_id in user_ids}
+
+    def delete(self, user_id: str) -> None:
+        self._path(user_id).unlink(missing_ok=True)
+
+
+__all__ = [
+    "DEFAULT_SESSION_CAPACITY",
+    "TurnRing",
+    "TranscriptArchive",
+    "JsonlTranscriptArchive",
+]
@@ -0,0 +1,195 @@
+"""Small dependency graph of async stages for one conversation turn.
+
+Each stage declares the stages it depends on. Every stage starts as soon as
+its dependencies have finished, so independent stages (PsyGUARD scoring,
+guardrails input check, history fetch) overlap instead of running one after
+another. A stage gets its own timeout and fallback: when it times out or
+raises, its fallback value is used as its result and dependent stages carry
+on. Timing and outcome of every stage are recorded for the result metadata.
+
+With a request Deadline, a stage's timeout is also capped by the budget left
+when it starts, and a stage that starts after the deadline goes straight to
+its fallback. Stages marked `bounded=False` (bookkeeping that must happen
+once a reply exists) ignore the deadline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+from src_new.shared.deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+_NO_FALLBACK = object()
+
+StageResults = Mapping[str, Any]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One unit of work in a turn.
+
+    Attributes:
+        name: Unique stage name (key of its result)
+        run: Coroutine function receiving the results of its dependencies
+        depends_on: Names of stages that must finish first
+        timeout: Seconds the stage may run (None: no limit)
+        fallback: Builds the result from the error when the stage times out
+            or fails; without one the error propagates and fails the graph
+        bounded: Whether the request deadline applies to this stage
+        deadline_grace: Seconds past the deadline before the stage is cut
+            off (for stages that degrade on their own at the deadline)
+    """
+    name: str
+    run: Callable[[StageResults], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    fallback: Any = _NO_FALLBACK
+    bounded: bool = True
+    deadline_grace: float = 0.0
+
+    def effective_timeout(self, deadline: Optional[Deadline]) -> Tuple[Optional[float], bool]:
+        """Timeout for a run starting now, and whether the deadline is what limits it."""
+        if deadline is None or not self.bounded:
+            return self.timeout, False
+        budget = deadline.remaining() + self.deadline_grace
+        if self.timeout is not None and self.timeout <= budget:
+            return self.timeout, False
+        return budget, True
+
+    def has_fallback(self) -> bool:
+        return self.fallback is not _NO_FALLBACK
+
+    def fallback_value(self, error: BaseException) -> Any:
+        return self.fallback(error) if callable(self.fallback) else self.fallback
+
+
+@dataclass(slots=True)
+class StageTiming:
+    """When a stage ran, relative to the start of the graph."""
+    started_ms: float
+    duration_ms: float
+    status: str  # ok | timeout | deadline | error
+    error: Optional[str] = None
+
+    def to_metadata(self) -> Dict[str, Any]:
+        metadata = {
+            "started_ms": round(self.started_ms, 2),
+            "duration_ms": round(self.duration_ms, 2),
+            "status": self.status,
+        }
+        if self.error:
+            metadata["error"] = self.error
+        return metadata
+
+
+@dataclass
+class StageGraphResult:
+    """Results and timings of a completed graph."""
+    results: Dict[str, Any]
+    timings: Dict[str, StageTiming]
+    total_ms: float
+
+    def timings_metadata(self) -> Dict[str, Any]:
+        """Per-stage timings for result metadata."""
+        return {
+            "total_ms": round(self.total_ms, 2),
+            "stages": {name: timing.to_metadata() for name, timing in self.timings.items()},
+        }
+
+
+def _check_graph(stages: Sequence[Stage]) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    known = set()
+    for stage in stages:
+        missing = [dependency for dependency in stage.depends_on if dependency not in known]
+        if missing:
+            # Declaring stages in dependency order also rules out cycles
+            raise ValueError(f"Stage {stage.name!r} depends on undeclared or later stages: {missing}")
+        known.add(stage.name)
+
+
+async def run_stage_graph(
+    stages: Sequence[Stage],
+    deadline: Optional[Deadline] = None
+) -> StageGraphResult:
+    """
+    Run stages concurrently, each once its dependencies are done.
+
+    Stages must be listed after the stages they depend on.
+
+    Args:
+        stages: Stages of the graph
+        deadline: Request deadline capping bounded stages (optional)
+
+    Returns:
+        StageGraphResult with every stage's result (or fallback) and timing
+
+    Raises:
+        The error of a stage without a fallback (remaining stages are cancelled)
+    """
+    _check_graph(stages)
+    started = time.perf_counter()
+    timings: Dict[str, StageTiming] = {}
+    tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+    async def execute(stage: Stage) -> Any:
+        if stage.depends_on:
+            await asyncio.gather(*(tasks[dependency] for dependency in stage.depends_on))
+        inputs = {dependency: tasks[dependency].result() for dependency in stage.depends_on}
+        stage_started = time.perf_counter()
+        status, error = "ok", None
+        timeout, by_deadline = stage.effective_timeout(deadline)
+        try:
+            if by_deadline and timeout <= 0 and stage.has_fallback():
+                raise TimeoutError()
+            if timeout is None:
+                return await stage.run(inputs)
+            return await asyncio.wait_for(stage.run(inputs), timeout=timeout)
+        except TimeoutError as e:
+            if by_deadline:
+                status, error = "deadline", f"request deadline ({deadline.budget}s) reached"
+            else:
+                status, error = "timeout", f"exceeded {timeout}s"
+            if not stage.has_fallback():
+                raise
+            logger.warning(f"Stage {stage.name}: {error}, using fallback")
+            return stage.fallback_value(e)
+        except Exception as e:
+            status, error = "error", str(e)
+            if not stage.has_fallback():
+                raise
+            logger.warning(f"Stage {stage.name} failed ({e}), using fallback")
+            return stage.fallback_value(e)
+        finally:
+            timings[stage.name] = StageTiming(
+                started_ms=(stage_started - started) * 1000,
+                duration_ms=(time.perf_counter() - stage_started) * 1000,
+                status=status,
+                error=error
+            )
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(execute(stage), name=f"stage:{stage.name}")
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+
+    return StageGraphResult(
+        results={name: task.result() for name, task in tasks.items()},
+        timings={stage.name: timings[stage.name] for stage in stages if stage.name in timings},
+        total_ms=(time.perf_counter() - started) * 1000
+    )
+
+
+__all__ = ["Stage", "StageTiming", "StageGraphResult", "run_stage_graph"]
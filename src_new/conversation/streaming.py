@@ -0,0 +1,173 @@
+"""Token streaming from the LLM through the pipeline to clients.
+
+Agents do not take a streaming flag. Instead, the caller installs a token
+sink for the current task (a contextvar); while a sink is active,
+LLMGateway.generate requests Ollama's streamed NDJSON and forwards
+every token to the sink as it arrives, then still returns the completed
+text to the agent. Post-processing that needs the full reply (e.g.
+LowRiskAgent._detect_coping_skills) therefore runs unchanged.
+
+Events are plain dicts in the frontend's {type, data} message format:
+    {"type": "token",   "data": {"text": "..."}}
+    {"type": "replace", "data": {"text": "..."}}  # final text differs from streamed tokens
+    {"type": "done",    "data": {"user_id", "route", "agent_result"}}
+
+A "replace" event is sent when the final response is not the concatenation
+of the streamed tokens (LLM fallback text, or a non-LLM agent such as
+HighRiskAgent); clients should show the replacement text instead of what
+they accumulated. The fixed safety script's replace event is shared and its
+SSE frame encoded once (FIXED_SAFETY_REPLACE_EVENT).
+"""
+
+# No `from __future__ import annotations`: FastAPI must resolve the
+# endpoint annotations defined inside create_streaming_router.
+import inspect
+import json
+from contextvars import ContextVar, Token
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+from src_new.conversation.agents.high_risk_agent import FIXED_SAFETY_SCRIPT
+
+if TYPE_CHECKING:
+    from src_new.control.control_context import ControlContext
+    from src_new.conversation.pipeline import ConversationPipeline
+
+TokenSink = Callable[[str], None]
+
+_token_sink: ContextVar[Optional[TokenSink]] = ContextVar("proximo_token_sink", default=None)
+
+
+def get_token_sink() -> Optional[TokenSink]:
+    """Get the token sink of the current task, if streaming is active."""
+    return _token_sink.get()
+
+
+def set_token_sink(sink: Optional[TokenSink]) -> Token:
+    """Install a token sink for the current task; returns a reset token."""
+    return _token_sink.set(sink)
+
+
+def reset_token_sink(token: Token) -> None:
+    """Restore the token sink that was active before set_token_sink."""
+    _token_sink.reset(token)
+
+
+def token_event(text: str) -> Dict[str, Any]:
+    """Build a token event."""
+    return {"type": "token", "data": {"text": text}}
+
+
+def replace_event(text: str) -> Dict[str, Any]:
+    """Build a replace event (the shared one for the fixed safety script)."""
+    if text == FIXED_SAFETY_SCRIPT:
+        return FIXED_SAFETY_REPLACE_EVENT
+    return {"type": "replace", "data": {"text": text}}
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events frame."""
+    if event is FIXED_SAFETY_REPLACE_EVENT:
+        return _FIXED_SAFETY_REPLACE_FRAME
+    return _encode_sse(event)
+
+
+def _encode_sse(event: Dict[str, Any]) -> str:
+    payload = json.dumps(event["data"], ensure_ascii=False, default=str)
+    return f"event: {event['type']}\ndata: {payload}\n\n"
+
+
+# Crisis replies skip JSON encoding of the script
+FIXED_SAFETY_REPLACE_EVENT: Dict[str, Any] = {"type": "replace", "data": {"text": FIXED_SAFETY_SCRIPT}}
+_FIXED_SAFETY_REPLACE_FRAME = _encode_sse(FIXED_SAFETY_REPLACE_EVENT)
+
+
+async def sse_stream(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Encode an event stream as SSE frames (body for a StreamingResponse)."""
+    async for event in events:
+        yield format_sse(event)
+
+
+async def send_to_websocket(websocket: Any, events: AsyncIterator[Dict[str, Any]]) -> None:
+    """Forward an event stream to a websocket (anything with send_json)."""
+    async for event in events:
+        await websocket.send_json(event)
+
+
+ControlContextProvider = Callable[[str], Union["ControlContext", Awaitable["ControlContext"]]]
+
+
+def create_streaming_router(
+    pipeline: "ConversationPipeline",
+    get_control_context: ControlContextProvider
+):
+    """
+    Create a FastAPI router exposing streamed chat replies.
+
+    Endpoints:
+        POST /chat/stream   body {"user_id", "message"} → text/event-stream
+        WS   /ws/chat       receives {"type": "message", "data": {"user_id", "message"}},
+                            sends the events of each reply
+
+    Args:
+        pipeline: Conversation pipeline producing the reply
+        get_control_context: Returns the user's current ControlContext (sync or async)
+
+    Returns:
+        fastapi.APIRouter to include in the application
+    """
+    from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+    from fastapi.responses import StreamingResponse
+    from pydantic import BaseModel
+
+    class ChatStreamRequest(BaseModel):
+        user_id: str
+        message: str
+
+    async def resolve_context(user_id: str) -> "ControlContext":
+        context = get_control_context(user_id)
+        if inspect.isawaitable(context):
+            context = await context
+        return context
+
+    router = APIRouter()
+
+    @router.post("/chat/stream")
+    async def chat_stream(request: ChatStreamRequest):
+        context = await resolve_context(request.user_id)
+        events = pipeline.process_message_stream(request.user_id, request.message, context)
+        return StreamingResponse(
+            sse_stream(events),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @router.websocket("/ws/chat")
+    async def chat_websocket(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if message.get("type") != "message":
+                    continue
+                data = message.get("data", {})
+                context = await resolve_context(data["user_id"])
+                events = pipeline.process_message_stream(data["user_id"], data["message"], context)
+                await send_to_websocket(websocket, events)
+        except WebSocketDisconnect:
+            pass
+
+    return router
+
+
+__all__ = [
+    "get_token_sink",
+    "set_token_sink",
+    "reset_token_sink",
+    "token_event",
+    "replace_event",
+    "format_sse",
+    "FIXED_SAFETY_REPLACE_EVENT",
+    "sse_stream",
+    "send_to_websocket",
+    "create_streaming_router",
+]
@@ -0,0 +1,240 @@
+"""Rolling per-session conversation summaries.
+
+Once a session has `every_turns` turns older than the most recent
+`keep_recent_turns`, a background task folds them into the session's
+summary with one short LLM call (previous summary + the new old turns →
+updated summary). Agents receive the summary as a compact system block
+and only the unsummarized turns as history, so prompt size stays bounded
+however long the conversation runs.
+
+Summaries are produced off the critical path: the reply is never delayed,
+and summary calls use the sheddable BACKGROUND admission priority.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+from src_new.conversation.llm.admission import LLMPriority
+from src_new.conversation.llm.gateway import LLMGateway
+from src_new.conversation.llm.models import LLMRequest
+from src_new.conversation.llm.prompt import ROLE_PREFIXES
+from src_new.shared.models import ConversationTurn
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You keep a brief running summary of a supportive conversation between a teen and an assistant.
+
+Update the summary with the new turns. Keep the key facts:
+- What the user is struggling with and how they feel
+- People, places and events they mentioned
+- Coping strategies or resources discussed, and what the user accepted or declined
+
+Write at most {max_words} words in the third person. Output only the updated summary."""
+
+# (role, text, timestamp) of a turn; locates the summary's end in the history
+TurnId = Tuple[str, str, Optional[str]]
+
+
+@dataclass(frozen=True)
+class SessionSummary:
+    """Summary of a session's turns up to and including `last_turn`."""
+    text: str
+    last_turn: TurnId
+    turns_covered: int
+    updated_at: float
+
+
+def split_history(
+    history: Sequence[ConversationTurn],
+    summary: Optional[SessionSummary]
+) -> List[ConversationTurn]:
+    """
+    Get the turns not covered by a summary.
+
+    The summary's last turn is located by identity rather than index, so
+    this stays correct if the session store drops its oldest turns. If that
+    turn is no longer in the history, every turn is newer than the summary.
+    """
+    if summary is None:
+        return list(history)
+    for index in range(len(history) - 1, -1, -1):
+        if _turn_id(history[index]) == summary.last_turn:
+            return list(history[index + 1:])
+    return list(history)
+
+
+def build_summary_prompt(
+    summary: Optional[str],
+    turns: Sequence[ConversationTurn],
+    max_words: int
+) -> str:
+    """Prompt that folds `turns` into the previous summary."""
+    parts = [f"System: {SUMMARY_PROMPT.format(max_words=max_words)}"]
+    parts.append(f"Current summary: {summary or '(none yet)'}")
+    parts.append("New turns:")
+    for turn in turns:
+        prefix = ROLE_PREFIXES.get(turn.role)
+        if prefix is not None:
+            parts.append(prefix + turn.text)
+    parts.append("Updated summary:")
+    return "\n".join(parts)
+
+
+class ConversationSummarizer:
+    """Keeps a rolling summary per session, updated in the background.
+
+    Usage:
+        summary = summarizer.get(user_id)
+        recent = split_history(history, summary)   # prompt: summary + recent
+        ...
+        summarizer.maybe_schedule(user_id, history_after_turn)
+    """
+
+    def __init__(
+        self,
+        gateway: LLMGateway,
+        every_turns: int = 6,
+        keep_recent_turns: int = 6,
+        max_words: int = 120,
+        max_sessions: int = 10_000,
+        deadline: float = 60.0
+    ):
+        """
+        Initialize summarizer.
+
+        Args:
+            gateway: Shared LLM gateway
+            every_turns: Old turns that trigger a summary update (K)
+            keep_recent_turns: Most recent turns always sent verbatim
+            max_words: Target summary length (generation is also capped)
+            max_sessions: Summaries kept (least recently used are dropped)
+            deadline: Seconds per summary call
+        """
+        self.gateway = gateway
+        self.every_turns = every_turns
+        self.keep_recent_turns = keep_recent_turns
+        self.max_words = max_words
+        self.max_sessions = max_sessions
+        self.deadline = deadline
+
+        self._summaries: "OrderedDict[str, SessionSummary]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.updates = 0
+        self.failures = 0
+
+    def get(self, user_id: str) -> Optional[SessionSummary]:
+        """Get a session's current summary."""
+        summary = self._summaries.get(user_id)
+        if summary is not None:
+            self._summaries.move_to_end(user_id)
+        return summary
+
+    def maybe_schedule(self, user_id: str, history: Sequence[ConversationTurn]) -> Optional[asyncio.Task]:
+        """
+        Start a background summary update if enough old turns accumulated.
+
+        At most one update runs per session; the history is snapshotted.
+
+        Returns:
+            The update task, or None if no update was needed
+        """
+        task = self._tasks.get(user_id)
+        if task is not None and not task.done():
+            return None
+        pending = split_history(history, self._summaries.get(user_id))
+        old_turns = pending[:max(0, len(pending) - self.keep_recent_turns)]
+        if len(old_turns) < self.every_turns:
+            return None
+
+        # Fresh context: never stream summary tokens into the current reply
+        task = asyncio.create_task(
+            self._update(user_id, old_turns),
+            context=contextvars.Context()
+        )
+        self._tasks[user_id] = task
+        task.add_done_callback(lambda done: self._forget_task(user_id, done))
+        return task
+
+    async def _update(self, user_id: str, turns: List[ConversationTurn]) -> None:
+        previous = self._summaries.get(user_id)
+        result = await self.gateway.generate(LLMRequest(
+            prompt=build_summary_prompt(previous.text if previous else None, turns, self.max_words),
+            temperature=0.2,
+            max_tokens=self.max_words * 2,
+            deadline=self.deadline,
+            priority=LLMPriority.BACKGROUND
+        ))
+        if not result.ok or not result.text:
+            self.failures += 1
+            logger.info(f"Summary update for {user_id} failed ({result.error}); keeping previous summary")
+            return
+
+        if self._summaries.get(user_id) is not previous:
+            return  # Session was cleared (or re-summarized) meanwhile
+        self.restore(user_id, SessionSummary(
+            text=result.text,
+            last_turn=_turn_id(turns[-1]),
+            turns_covered=(previous.turns_covered if previous else 0) + len(turns),
+            updated_at=time.time()
+        ))
+        self.updates += 1
+        logger.info(f"Summary for {user_id} updated ({len(turns)} turns folded in)")
+
+    def _forget_task(self, user_id: str, task: asyncio.Task) -> None:
+        if self._tasks.get(user_id) is task:
+            del self._tasks[user_id]
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a session's summary and cancel its pending update."""
+        self._summaries.pop(user_id, None)
+        task = self._tasks.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    def restore(self, user_id: str, summary: SessionSummary) -> None:
+        """Store a session's summary (e.g. one handed over by the session's previous worker)."""
+        self._summaries[user_id] = summary
+        self._summaries.move_to_end(user_id)
+        while len(self._summaries) > self.max_sessions:
+            self._summaries.popitem(last=False)
+
+    async def flush(self) -> None:
+        """Wait for pending updates to finish."""
+        await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Cancel pending updates."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get summarizer counters."""
+        return {
+            "sessions": len(self._summaries),
+            "pending": sum(1 for task in self._tasks.values() if not task.done()),
+            "updates": self.updates,
+            "failures": self.failures,
+        }
+
+
+def _turn_id(turn: ConversationTurn) -> TurnId:
+    return (turn.role, turn.text, turn.timestamp)
+
+
+__all__ = [
+    "SUMMARY_PROMPT",
+    "SessionSummary",
+    "ConversationSummarizer",
+    "split_history",
+    "build_summary_prompt",
+]
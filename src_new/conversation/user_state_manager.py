@@ -0,0 +1,157 @@
+"""Per-user state manager for concurrent route and agent-state updates."""
+
+from __future__ import annotations
+
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from src_new.control.control_context import ControlContext, Route
+from src_new.control.route_updater import RouteUpdater
+from src_new.conversation.agents.medium_risk_agent import MediumRiskAgent, MediumRiskAgentState
+from src_new.shared.concurrency import KeyedAsyncLock
+
+logger = logging.getLogger(__name__)
+
+
+class UserStateHandle:
+    """View of one user's state, valid only inside UserStateManager.transaction()."""
+
+    def __init__(self, manager: "UserStateManager", user_id: str):
+        self._manager = manager
+        self.user_id = user_id
+        self.control_context: Optional[ControlContext] = manager._contexts.get(user_id)
+
+    @property
+    def medium_state(self) -> MediumRiskAgentState:
+        """MediumRiskAgent state for this user (created on first access)."""
+        if self._manager.medium_agent is None:
+            raise RuntimeError("UserStateManager has no MediumRiskAgent")
+        return self._manager.medium_agent.get_state(self.user_id)
+
+
+class UserStateManager:
+    """Serializes read-modify-write of per-user state.
+
+    Holds each user's ControlContext and guards it (and the user's
+    MediumRiskAgentState) with a per-user asyncio lock, so concurrent
+    updates for the same user cannot lose an upgrade. ConversationPipeline
+    applies each turn's route signals through transaction(); the turns
+    themselves are already serialized by the user's mailbox, so the lock
+    orders them against updates made from outside a turn (e.g.
+    apply_psyguard_score). Different users use different locks and keep
+    running in parallel; locks are released from memory as soon as nobody
+    holds them.
+
+    Usage:
+        async with manager.transaction(user_id) as state:
+            state.control_context.update_route("medium", reason="...")
+            state.medium_state.resistance_count += 1
+    """
+
+    def __init__(self, medium_agent: Optional[MediumRiskAgent] = None):
+        """
+        Initialize user state manager.
+
+        Args:
+            medium_agent: Agent whose per-user state is guarded (optional)
+        """
+        self.medium_agent = medium_agent
+        self._contexts: Dict[str, ControlContext] = {}
+        self._locks = KeyedAsyncLock()
+
+    @asynccontextmanager
+    async def transaction(self, user_id: str) -> AsyncIterator[UserStateHandle]:
+        """
+        Lock a user's state for a read-modify-write.
+
+        Assigning ``handle.control_context`` inside the block stores it.
+
+        Args:
+            user_id: User identifier
+
+        Yields:
+            UserStateHandle for the user
+        """
+        async with self._locks.acquire(user_id):
+            handle = UserStateHandle(self, user_id)
+            held = handle.control_context
+            yield handle
+            if handle.control_context is not None and handle.control_context is not held:
+                self._contexts[user_id] = handle.control_context
+
+    def hold(self, user_id: str, context: Optional[ControlContext] = None) -> Optional[ControlContext]:
+        """
+        Hold the caller's ControlContext for a user, or get the one held.
+
+        Does not wait for the lock (e.g. for the crisis fast lane); an open
+        transaction keeps the context unless it assigns its own.
+
+        Args:
+            user_id: User identifier
+            context: Context to hold (None: keep the held one)
+
+        Returns:
+            The user's ControlContext, or None if none is held
+        """
+        if context is None:
+            return self._contexts.get(user_id)
+        self._contexts[user_id] = context
+        return context
+
+    def get_context(self, user_id: str) -> Optional[ControlContext]:
+        """Get the stored ControlContext (unlocked read, for display only)."""
+        return self._contexts.get(user_id)
+
+    async def set_context(self, context: ControlContext) -> None:
+        """Store (or replace) a user's ControlContext."""
+        async with self._locks.acquire(context.user_id):
+            self._contexts[context.user_id] = context
+
+    async def apply_psyguard_score(self, user_id: str, psyguard_score: float) -> Optional[Route]:
+        """
+        Atomically apply a new PsyGUARD score to a user's route.
+
+        Args:
+            user_id: User identifier
+            psyguard_score: New PsyGUARD score
+
+        Returns:
+            Route after the update, or None if the user has no ControlContext
+        """
+        async with self._locks.acquire(user_id):
+            context = self._contexts.get(user_id)
+            if context is None:
+                return None
+            if RouteUpdater.apply_to_context(context, psyguard_score):
+                logger.info(f"UserStateManager: user={user_id} upgraded to {context.route}")
+            return context.route
+
+    async def remove(self, user_id: str) -> None:
+        """Drop all state for a user (ControlContext and agent state)."""
+        async with self._locks.acquire(user_id):
+            self._contexts.pop(user_id, None)
+            if self.medium_agent is not None:
+                self.medium_agent.reset_state(user_id)
+
+    async def release(self, user_id: str) -> Optional[ControlContext]:
+        """Stop holding a user's ControlContext and return it (agent state is left alone)."""
+        async with self._locks.acquire(user_id):
+            return self._contexts.pop(user_id, None)
+
+    def user_ids(self) -> List[str]:
+        """Users whose ControlContext is held."""
+        return list(self._contexts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get state and lock contention statistics."""
+        stats = {
+            "users": len(self._contexts),
+            **self._locks.get_stats(),
+        }
+        if self.medium_agent is not None:
+            stats["medium_agent_states"] = self.medium_agent.get_stats()
+        return stats
+
+
+__all__ = ["UserStateManager", "UserStateHandle"]
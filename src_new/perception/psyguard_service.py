@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -22,6 +23,7 @@ except ImportError:
     safe_torch_load = torch.load
 
 from src.core.logging import get_logger
+from src_new.shared.deadline import Deadline
 
 logger = get_logger(__name__)
 
@@ -162,19 +164,44 @@ class PsyGuardService:
             self._loaded = False
             return False
     
-    def _calculate_risk_score(self, predictions: torch.Tensor) -> float:
+    def _predict(self, text: str) -> List[int]:
+        """
+        Tokenize a message and run the model (blocking).
+        
+        Args:
+            text: User message text
+            
+        Returns:
+            Binary prediction per label (11 labels)
+        """
+        input_tokens = self._tokenizer(
+            text=text,
+            padding='max_length',
+            max_length=512,
+            truncation=False,
+            add_special_tokens=True,
+            return_token_type_ids=True,
+            return_tensors='pt'
+        )
+        input_tokens = {k: v.to(self.device) for k, v in input_tokens.items()}
+        
+        with torch.no_grad():
+            outputs = self._model(**input_tokens)
+        
+        # sigmoid + threshold 0.5
+        predictions = torch.sigmoid(outputs.logits).ge(0.5).int()
+        return predictions[0].detach().cpu().tolist()
+    
+    def _calculate_risk_score(self, pred_list: List[int]) -> float:
         """
         Calculate risk score from model predictions.
         
         Args:
-            predictions: Binary predictions tensor (11 labels)
+            pred_list: Binary prediction per label (11 labels)
             
         Returns:
             Risk score in [0, 1]
         """
-        # 将预测转换为列表
-        pred_list = predictions[0].detach().cpu().tolist()
-        
         # 检查高风险标签
         high_risk_detected = any(pred_list[i] == 1 for i in HIGH_RISK_LABEL_INDICES)
         medium_risk_detected = any(pred_list[i] == 1 for i in MEDIUM_RISK_LABEL_INDICES)
@@ -196,12 +223,17 @@ class PsyGuardService:
         # 确保在 [0, 1] 范围内
         return min(max(risk_score, 0.0), 1.0)
     
-    async def score(self, text: str) -> Dict[str, Any]:
+    async def score(self, text: str, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Score a user message for risk.
         
+        Inference runs in a worker thread, so the event loop keeps serving
+        other stages and users meanwhile.
+        
         Args:
             text: User message text
+            deadline: Request deadline; once it has passed the message is not
+                scored (inference itself cannot be interrupted)
             
         Returns:
             Dictionary with:
@@ -224,6 +256,16 @@ class PsyGuardService:
         if not self._loaded:
             await self.load()
         
+        if deadline is not None and deadline.expired:
+            return {
+                "risk_score": 0.0,
+                "labels": [],
+                "label_indices": [],
+                "should_trigger_questionnaire": False,
+                "should_direct_high_risk": False,
+                "error": "deadline exceeded"
+            }
+        
         if not self._loaded or self._model is None or self._tokenizer is None:
             logger.warning("PsyGUARD model not loaded, returning default score")
             return {
@@ -236,30 +278,13 @@ class PsyGuardService:
             }
         
         try:
-            # Tokenize input
-            input_tokens = self._tokenizer(
-                text=text,
-                padding='max_length',
-                max_length=512,
-                truncation=False,
-                add_special_tokens=True,
-                return_token_type_ids=True,
-                return_tensors='pt'
-            )
-            input_tokens = {k: v.to(self.device) for k, v in input_tokens.items()}
-            
-            # Model inference
-            with torch.no_grad():
-                outputs = self._model(**input_tokens)
-            
-            # Get predictions (sigmoid + threshold 0.5)
-            predictions = torch.sigmoid(outputs.logits).ge(0.5).int()
+            # Tokenization and inference block: keep them off the event loop
+            pred_list = await asyncio.to_thread(self._predict, text)
             
             # Calculate risk score
-            risk_score = self._calculate_risk_score(predictions)
+            risk_score = self._calculate_risk_score(pred_list)
             
             # Get detected labels
-            pred_list = predictions[0].detach().cpu().tolist()
             label_indices = [i for i, val in enumerate(pred_list) if val == 1]
             labels = [ID2LABEL[str(i)] for i in label_indices]
             
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any, Optional, Literal
+from typing import TYPE_CHECKING, Dict, Any, Optional, Literal
 
+if TYPE_CHECKING:
+    from src_new.control.decision_trace import RouteDecisionTrace
 
 Route = Literal["low", "medium", "high"]
 
@@ -81,7 +83,8 @@ class QuestionnaireMapper:
         phq9_score: float,
         gad7_score: float,
         phq9_q9_score: Optional[int],
-        chat_risk_score: Optional[float] = None
+        chat_risk_score: Optional[float] = None,
+        trace: Optional["RouteDecisionTrace"] = None
     ) -> Route:
         """
         Make final route decision considering both questionnaire and chat content.
@@ -93,6 +96,7 @@ class QuestionnaireMapper:
             gad7_score: Total GAD-7 score
             phq9_q9_score: PHQ-9 question 9 score (suicidal ideation)
             chat_risk_score: PsyGUARD risk score from chat content (optional)
+            trace: Decision trace to fill in (only when tracing is enabled)
             
         Returns:
             Final route decision
@@ -102,13 +106,27 @@ class QuestionnaireMapper:
             HIGH_RISK_DIRECT_THRESHOLD
         )
         
+        if trace is not None:
+            QuestionnaireMapper._trace_questionnaires(
+                trace, phq9_score, gad7_score, phq9_q9_score
+            )
+        
         # Chat content priority (if provided)
         if chat_risk_score is not None:
             if chat_risk_score >= HIGH_RISK_DIRECT_THRESHOLD:
+                if trace is not None:
+                    trace.chat_override = "high"
+                    trace.threshold_fired = f"HIGH_RISK_DIRECT_THRESHOLD>={HIGH_RISK_DIRECT_THRESHOLD}"
                 return "high"
             elif chat_risk_score >= MEDIUM_RISK_THRESHOLD:
+                if trace is not None:
+                    trace.chat_override = "medium"
+                    trace.threshold_fired = f"MEDIUM_RISK_THRESHOLD>={MEDIUM_RISK_THRESHOLD}"
                 return "medium"
         
+        if trace is not None:
+            return trace.questionnaire_route
+        
         # Map questionnaires
         phq9_route = QuestionnaireMapper.map_phq9(phq9_score, phq9_q9_score)
         gad7_route = QuestionnaireMapper.map_gad7(gad7_score)
@@ -116,6 +134,29 @@ class QuestionnaireMapper:
         # Combine (take higher level)
         return QuestionnaireMapper.combine_routes(phq9_route, gad7_route)
     
+    @staticmethod
+    def _trace_questionnaires(
+        trace: "RouteDecisionTrace",
+        phq9_score: float,
+        gad7_score: float,
+        phq9_q9_score: Optional[int]
+    ) -> None:
+        """Record questionnaire sub-routes and the cut-point that fired."""
+        trace.phq9_route = QuestionnaireMapper.map_phq9(phq9_score, phq9_q9_score)
+        trace.gad7_route = QuestionnaireMapper.map_gad7(gad7_score)
+        trace.phq9_q9_override = phq9_q9_score is not None and phq9_q9_score >= 1
+        trace.questionnaire_route = QuestionnaireMapper.combine_routes(
+            trace.phq9_route, trace.gad7_route
+        )
+        
+        if trace.phq9_q9_override:
+            trace.threshold_fired = "PHQ9_Q9>=1"
+        elif trace.questionnaire_route != "low":
+            # Report the scale that set the combined level (PHQ-9 wins ties)
+            cut_point = 15 if trace.questionnaire_route == "high" else 10
+            scale = "PHQ9" if trace.phq9_route == trace.questionnaire_route else "GAD7"
+            trace.threshold_fired = f"{scale}_TOTAL>={cut_point}"
+    
     @staticmethod
     def map_assessment_result(assessment: Dict[str, Any]) -> Route:
         """
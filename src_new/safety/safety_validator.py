@@ -6,6 +6,8 @@ import logging
 from typing import Dict, Any, List, Optional
 import re
 
+from src_new.shared.keywords import scan_keywords
+
 logger = logging.getLogger(__name__)
 
 # Prohibited content patterns
@@ -117,19 +119,8 @@ class SafetyValidator:
         Returns:
             Dict with safety check results
         """
-        message_lower = user_message.lower()
-        
-        # Check for crisis keywords
-        crisis_keywords = [
-            "kill myself", "suicide", "end my life", "want to die",
-            "hurt myself", "self-harm", "no point living", "no point in living",
-            "don't want to live", "don't want to be alive"
-        ]
-        
-        detected_keywords = []
-        for keyword in crisis_keywords:
-            if keyword in message_lower:
-                detected_keywords.append(keyword)
+        # Check for crisis keywords (KEYWORD_SETS["crisis"], one shared scan per message)
+        detected_keywords = list(scan_keywords(user_message).get("crisis", ()))
         
         is_crisis = len(detected_keywords) > 0
         
@@ -0,0 +1,324 @@
+"""Concurrency helpers shared across layers."""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, Hashable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _KeyedLockEntry:
+    """Lock plus the number of tasks holding or waiting for it."""
+    lock: asyncio.Lock
+    refs: int = 0
+
+
+class KeyedAsyncLock:
+    """Per-key asyncio locks with automatic cleanup.
+
+    Tasks using the same key are serialized (FIFO, like asyncio.Lock); tasks
+    using different keys never wait on each other. A key's lock is dropped
+    as soon as no task holds or waits for it, so memory is bounded by the
+    number of keys currently in use rather than the number ever seen.
+    """
+
+    def __init__(self):
+        """Initialize keyed lock."""
+        self._entries: Dict[Hashable, _KeyedLockEntry] = {}
+        # Metrics
+        self._acquisitions = 0
+        self._contended = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def acquire(self, key: Hashable) -> AsyncIterator[None]:
+        """
+        Hold the lock for ``key`` for the duration of the context.
+
+        Args:
+            key: Lock key (e.g. user_id)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = _KeyedLockEntry(lock=asyncio.Lock())
+            self._entries[key] = entry
+        entry.refs += 1
+        contended = entry.lock.locked()
+        started = time.perf_counter() if contended else 0.0
+        try:
+            async with entry.lock:
+                self._acquisitions += 1
+                if contended:
+                    waited = time.perf_counter() - started
+                    self._contended += 1
+                    self._total_wait_seconds += waited
+                    self._max_wait_seconds = max(self._max_wait_seconds, waited)
+                yield
+        finally:
+            entry.refs -= 1
+            if entry.refs == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def locked(self, key: Hashable) -> bool:
+        """Check whether the lock for ``key`` is currently held."""
+        entry = self._entries.get(key)
+        return entry is not None and entry.lock.locked()
+
+    def __len__(self) -> int:
+        """Number of keys currently held or waited on."""
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get contention statistics."""
+        return {
+            "active_keys": len(self._entries),
+            "acquisitions": self._acquisitions,
+            "contended": self._contended,
+            "total_wait_seconds": self._total_wait_seconds,
+            "max_wait_seconds": self._max_wait_seconds,
+        }
+
+
+class MailboxFull(Exception):
+    """A key's mailbox already holds the maximum number of queued jobs."""
+
+    def __init__(self, key: Hashable, depth: int):
+        super().__init__(f"mailbox for {key!r} is full ({depth} queued)")
+        self.key = key
+        self.depth = depth
+
+
+async def _noop() -> None:
+    return None
+
+
+_Job = Tuple[Callable[[], Awaitable[Any]], "asyncio.Future[Any]", contextvars.Context, float]
+
+
+@dataclass
+class _Mailbox:
+    """Queued jobs of one key plus the worker draining them."""
+    queue: "asyncio.Queue[_Job]"
+    worker: Optional["asyncio.Task[None]"] = None
+    running: Optional["asyncio.Task[Any]"] = None
+    busy: bool = False
+    room: asyncio.Event = field(default_factory=asyncio.Event)  # Set when a job leaves
+    processed: int = 0
+
+
+class KeyedMailboxes:
+    """One actor per active key: jobs for a key run one at a time, in arrival order.
+
+    Each key gets a mailbox (bounded queue) and a worker task draining it, so
+    jobs for the same key never overlap while jobs for different keys run in
+    parallel. A worker exits after `idle_timeout` seconds without work and
+    its mailbox is dropped, keeping memory bounded by the number of active
+    keys. A key holds at most one running job plus `max_queue_depth` waiting
+    ones, also for a burst arriving before its worker starts; submitting to a
+    full mailbox raises MailboxFull instead of queueing.
+
+    Jobs run in the submitter's contextvars context, and cancelling the
+    submitter cancels its job (queued or running).
+    """
+
+    def __init__(self, max_queue_depth: int = 8, idle_timeout: float = 60.0):
+        """
+        Initialize keyed mailboxes.
+
+        Args:
+            max_queue_depth: Max jobs waiting per key (excluding the running one)
+            idle_timeout: Seconds an idle worker waits for work before exiting
+        """
+        self.max_queue_depth = max_queue_depth
+        self.idle_timeout = idle_timeout
+        self._mailboxes: Dict[Hashable, _Mailbox] = {}
+        self._closed = False
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._cancelled = 0
+        self._max_depth = 0
+        self._total_wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    async def submit(self, key: Hashable, job: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a job in the key's mailbox and wait for its result.
+
+        Args:
+            key: Serialization key (e.g. user_id)
+            job: Coroutine function to run
+
+        Returns:
+            The job's result
+
+        Raises:
+            MailboxFull: The key already has max_queue_depth jobs waiting
+            RuntimeError: The mailboxes were closed
+        """
+        return await self._submit(key, job, wait_for_room=False)
+
+    async def enqueue(self, key: Hashable, job: Callable[[], Awaitable[T]]) -> T:
+        """
+        Like submit(), but waits for room in a full mailbox instead of raising.
+
+        For work that must not be dropped (e.g. recording a reply already
+        sent); the queue bound still applies once the job is queued.
+        """
+        return await self._submit(key, job, wait_for_room=True)
+
+    async def _submit(self, key: Hashable, job: Callable[[], Awaitable[T]], wait_for_room: bool) -> T:
+        if self._closed:
+            raise RuntimeError("KeyedMailboxes is closed")
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = _Mailbox(queue=asyncio.Queue())
+            self._mailboxes[key] = mailbox
+        while self._full(mailbox):
+            if not wait_for_room:
+                self._rejected += 1
+                raise MailboxFull(key, self.max_queue_depth)
+            # A full mailbox has a worker with work, so it stays registered meanwhile
+            mailbox.room.clear()
+            await mailbox.room.wait()
+            if self._closed:
+                raise RuntimeError("KeyedMailboxes is closed")
+
+        future: "asyncio.Future[T]" = asyncio.get_running_loop().create_future()
+        mailbox.queue.put_nowait((job, future, contextvars.copy_context(), time.perf_counter()))
+        self._submitted += 1
+        self._max_depth = max(self._max_depth, mailbox.queue.qsize())
+        if mailbox.worker is None:
+            mailbox.worker = asyncio.create_task(self._drain(key, mailbox), name=f"mailbox:{key}")
+        return await future
+
+    async def _drain(self, key: Hashable, mailbox: _Mailbox) -> None:
+        while True:
+            try:
+                job, future, context, queued_at = await asyncio.wait_for(
+                    mailbox.queue.get(), timeout=self.idle_timeout
+                )
+            except TimeoutError:
+                # Nothing can be queued between this check and the removal (no await)
+                if mailbox.queue.empty():
+                    if self._mailboxes.get(key) is mailbox:
+                        del self._mailboxes[key]
+                    return
+                continue
+
+            if future.done():  # Submitter gave up while queued
+                self._cancelled += 1
+                mailbox.room.set()
+                continue
+            waited = time.perf_counter() - queued_at
+            self._total_wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+
+            task = asyncio.create_task(job(), context=context)
+            cancel_job = functools.partial(self._cancel_with_caller, task)
+            future.add_done_callback(cancel_job)
+            # Settle the caller as soon as the job ends, without a hop through this worker
+            task.add_done_callback(lambda done, future=future: self._settle(future, done))
+            mailbox.running = task
+            mailbox.busy = True
+            try:
+                await asyncio.wait([task])
+            finally:
+                mailbox.running = None
+                mailbox.busy = False
+                mailbox.room.set()
+            future.remove_done_callback(cancel_job)
+            mailbox.processed += 1
+
+    @staticmethod
+    def _cancel_with_caller(task: "asyncio.Task[Any]", future: "asyncio.Future[Any]") -> None:
+        if future.cancelled():
+            task.cancel()
+
+    def _full(self, mailbox: _Mailbox) -> bool:
+        # Running job plus queued ones: the next job stays queued until its
+        # worker starts it, so a burst counts it as the running one
+        return mailbox.queue.qsize() + mailbox.busy > self.max_queue_depth
+
+    def _settle(self, future: "asyncio.Future[Any]", task: "asyncio.Task[Any]") -> None:
+        if future.done():
+            self._cancelled += 1
+        elif task.cancelled():
+            future.cancel()
+            self._cancelled += 1
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+            self._completed += 1
+        else:
+            future.set_result(task.result())
+            self._completed += 1
+
+    async def drain(self, key: Hashable) -> None:
+        """
+        Wait until every job submitted for a key so far has finished.
+
+        Never raises MailboxFull (see enqueue()). Jobs submitted while
+        waiting for room may finish before it returns.
+        """
+        if key in self._mailboxes:
+            await self.enqueue(key, _noop)
+
+    def depth(self, key: Hashable) -> int:
+        """Jobs queued for a key (excluding the running one)."""
+        mailbox = self._mailboxes.get(key)
+        return mailbox.queue.qsize() if mailbox is not None else 0
+
+    def busy_keys(self) -> List[Hashable]:
+        """Keys with a running or queued job."""
+        return [key for key, mailbox in self._mailboxes.items() if mailbox.busy or not mailbox.queue.empty()]
+
+    async def close(self) -> None:
+        """Stop all workers; queued and running jobs are cancelled."""
+        self._closed = True
+        mailboxes = list(self._mailboxes.values())
+        self._mailboxes.clear()
+        tasks: List["asyncio.Task[Any]"] = []
+        for mailbox in mailboxes:
+            while not mailbox.queue.empty():
+                _, future, _, _ = mailbox.queue.get_nowait()
+                future.cancel()
+            mailbox.room.set()  # Wake enqueue() callers waiting for room
+            # The running job is its own task: cancel it too, not just the worker awaiting it
+            tasks.extend(task for task in (mailbox.running, mailbox.worker) if task is not None)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def __len__(self) -> int:
+        """Number of keys with a live mailbox."""
+        return len(self._mailboxes)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get mailbox and overload statistics."""
+        started = self._completed + self._cancelled
+        return {
+            "active_keys": len(self._mailboxes),
+            "busy_keys": sum(1 for mailbox in self._mailboxes.values() if mailbox.busy),
+            "queued": sum(mailbox.queue.qsize() for mailbox in self._mailboxes.values()),
+            "max_queue_depth": self.max_queue_depth,
+            "max_depth_seen": self._max_depth,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "cancelled": self._cancelled,
+            "rejected": self._rejected,
+            "avg_wait_seconds": self._total_wait_seconds / started if started else 0.0,
+            "max_wait_seconds": self._max_wait_seconds,
+        }
+
+
+__all__ = ["KeyedAsyncLock", "KeyedMailboxes", "MailboxFull"]
@@ -0,0 +1,56 @@
+"""Request-scoped deadline shared across layers.
+
+ConversationPipeline creates one Deadline per turn and passes it to the
+perception, safety and agent calls. Each of them uses the remaining budget
+as its timeout instead of its own fixed one, and answers with its cheaper
+fallback once the budget is gone, so a turn's latency is bounded by the
+budget it started with rather than by the sum of every layer's timeout.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True, slots=True)
+class Deadline:
+    """Absolute point in time (time.monotonic()) a turn's reply is due."""
+    at: float
+    budget: float  # Seconds the turn started with
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Deadline `seconds` from now."""
+        return cls(at=time.monotonic() + seconds, budget=seconds)
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)."""
+        return max(0.0, self.at - time.monotonic())
+
+    def elapsed(self) -> float:
+        """Seconds since the deadline was created."""
+        return self.budget - (self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """
+        Timeout for the next call: the remaining budget, at most `cap`.
+
+        Args:
+            cap: The call's own limit (None: remaining budget only)
+        """
+        remaining = self.remaining()
+        return remaining if cap is None else min(cap, remaining)
+
+
+def remaining_or(deadline: Optional[Deadline], default: Optional[float]) -> Optional[float]:
+    """Timeout for a call that accepts an optional deadline: its remaining budget, else `default`."""
+    return default if deadline is None else deadline.timeout(default)
+
+
+__all__ = ["Deadline", "remaining_or"]
@@ -0,0 +1,99 @@
+"""Consistent-hash ring mapping keys (user ids) to nodes (workers).
+
+Each node is placed on a 64-bit ring at `replicas` pseudo-random points
+(virtual nodes); a key belongs to the first point at or after its own
+hash. Adding or removing a node therefore only moves the keys between the
+affected points, about 1/N of all keys, and load stays even across nodes.
+
+Hashes are blake2b digests, not Python's hash(), so every process (and a
+front door written in another language) computes the same owner.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def hash_key(key: str) -> int:
+    """Stable 64-bit position of a key on the ring."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """Consistent-hash ring of named nodes with virtual nodes.
+
+    Usage:
+        ring = ConsistentHashRing(["worker-0", "worker-1"])
+        ring.owner("user_42")   # → "worker-1"
+        ring.add("worker-2")    # ~1/3 of users move to worker-2
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 128):
+        """
+        Initialize hash ring.
+
+        Args:
+            nodes: Initial node names
+            replicas: Virtual nodes per node (more: more even load)
+        """
+        if replicas < 1:
+            raise ValueError("replicas must be at least 1")
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: Dict[str, None] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        """Place a node on the ring (no-op if present)."""
+        if node in self._nodes:
+            return
+        self._nodes[node] = None
+        self._rebuild()
+
+    def remove(self, node: str) -> None:
+        """Take a node off the ring (no-op if absent)."""
+        if self._nodes.pop(node, 0) is None:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        placed: List[Tuple[int, str]] = sorted(
+            (hash_key(f"{node}#{replica}"), node)
+            for node in self._nodes
+            for replica in range(self.replicas)
+        )
+        self._points = [point for point, _ in placed]
+        self._owners = [node for _, node in placed]
+
+    def owner(self, key: str) -> Optional[str]:
+        """Node owning a key, or None for an empty ring."""
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._points, hash_key(key))
+        return self._owners[index % len(self._owners)]
+
+    def copy(self) -> "ConsistentHashRing":
+        """Independent ring with the same nodes (to plan a change before applying it)."""
+        ring = ConsistentHashRing(replicas=self.replicas)
+        ring._nodes = dict(self._nodes)
+        ring._points = list(self._points)
+        ring._owners = list(self._owners)
+        return ring
+
+    @property
+    def nodes(self) -> List[str]:
+        """Node names, in the order they were added."""
+        return list(self._nodes)
+
+    def __contains__(self, node: object) -> bool:
+        return node in self._nodes
+
+    def __len__(self) -> int:
+        """Number of nodes."""
+        return len(self._nodes)
+
+
+__all__ = ["ConsistentHashRing", "hash_key"]
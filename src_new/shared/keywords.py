@@ -0,0 +1,203 @@
+"""Keyword sets and a compiled multi-pattern matcher shared across layers.
+
+Every keyword list used for lightweight lexical checks (MediumRiskAgent
+resistance/acceptance, LowRiskAgent coping skills/goodbye, SafetyValidator
+crisis phrases, the guardrails fallback action) lives in KEYWORD_SETS. They
+are compiled once into a single prefix-factored regular expression, so one
+pass over a message reports every category it hits instead of one substring
+scan per keyword per caller.
+
+Matching rules:
+    - case-insensitive; curly apostrophes are treated as "'"
+    - keywords match whole words: "time" does not match "sometimes"
+    - a trailing "*" makes a prefix match: "judg*" matches "judged"
+    - spaces inside a phrase match any run of whitespace
+    - overlapping keywords are all reported ("I want to die" hits both
+      acceptance "i want to" and crisis "want to die")
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Category → keywords. Resistance categories are checked in this order.
+KEYWORD_SETS: Dict[str, Tuple[str, ...]] = {
+    "resistance.privacy": ("privacy", "private", "anonymous", "personal*", "confidential"),
+    "resistance.time": ("time", "busy", "schedule*", "don't have time", "no time"),
+    "resistance.stigma": ("stigma*", "embarrass*", "ashamed", "judg*"),
+    "resistance.doubt": ("doubt*", "not sure", "don't think", "won't help", "doesn't work"),
+    "acceptance": (
+        "yes", "okay", "ok", "sure", "i'll join", "sounds good",
+        "i'd like to", "i want to", "let's do it",
+    ),
+    "coping": (
+        "breathing", "journal*", "mindful*", "exercis*", "meditat*",
+        "relax*", "coping", "strateg*", "techniqu*", "practic*",
+    ),
+    "goodbye": (
+        "goodbye", "bye", "see you", "thanks", "thank you",
+        "that's all", "done", "finished", "gotta go",
+    ),
+    # SafetyValidator.check_user_message_safety
+    "crisis": (
+        "kill myself", "suicide", "end my life", "want to die",
+        "hurt myself", "self-harm", "no point living", "no point in living",
+        "don't want to live", "don't want to be alive",
+    ),
+    # Guardrails fallback action (config/guardrails/actions.py)
+    "high_risk": (
+        "suicide", "kill myself", "end my life", "want to die",
+        "self harm", "hurt myself", "cut myself",
+    ),
+}
+
+RESISTANCE_TYPES: Tuple[str, ...] = tuple(
+    category.split(".", 1)[1] for category in KEYWORD_SETS if category.startswith("resistance.")
+)
+
+KeywordHits = Mapping[str, Tuple[str, ...]]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and unify apostrophes for matching."""
+    return text.lower().replace("’", "'").replace("‘", "'")
+
+
+def _literal(keyword: str) -> str:
+    return " ".join(normalize_text(keyword.rstrip("*")).split())
+
+
+def _keyword_pattern(literal: str, prefix: bool) -> str:
+    body = r"\s+".join(re.escape(word) for word in literal.split())
+    return body if prefix else body + r"(?!\w)"
+
+
+def _trie_pattern(literals: Mapping[str, bool]) -> str:
+    """
+    Regex for a set of literals factored by common prefix (a character trie).
+
+    Python's regex engine tries alternatives one by one; factoring means
+    only the branch for the next character is explored at each step.
+    Deeper branches come first, so the longest keyword at a position wins.
+    """
+    trie: Dict[str, Any] = {}
+    for literal, prefix in literals.items():
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = prefix
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if "" in node:
+            branches.append("" if node[""] else r"(?!\w)")
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """Match many categorized keywords in one pass over a text."""
+
+    def __init__(self, keyword_sets: Mapping[str, Iterable[str]]):
+        """
+        Compile keyword sets.
+
+        Args:
+            keyword_sets: Category → keywords (see module docstring for syntax)
+        """
+        self.categories: Tuple[str, ...] = tuple(keyword_sets)
+        # A keyword shared by several categories is matched once
+        owners: Dict[str, List[str]] = {}
+        prefixes: Dict[str, bool] = {}
+        for category, keywords in keyword_sets.items():
+            for keyword in keywords:
+                literal = _literal(keyword)
+                owners.setdefault(literal, [])
+                if category not in owners[literal]:
+                    owners[literal].append(category)
+                prefixes[literal] = prefixes.get(literal, False) or keyword.endswith("*")
+        self._owners: Dict[str, Tuple[str, ...]] = {
+            literal: tuple(categories) for literal, categories in owners.items()
+        }
+        # Zero-width lookahead so matches may overlap ("i want to" / "want to die")
+        self._pattern = re.compile(rf"(?=(?<!\w)({_trie_pattern(prefixes)}))")
+        # Shorter keywords that also match where a longer one starts
+        self._nested: Dict[str, List[Tuple[str, "re.Pattern[str]"]]] = {
+            literal: [
+                (other, re.compile(_keyword_pattern(other, prefixes[other])))
+                for other in prefixes
+                if other != literal and literal.startswith(other)
+            ]
+            for literal in prefixes
+        }
+
+    def scan(self, text: str) -> KeywordHits:
+        """
+        Find every category hit in a text.
+
+        Args:
+            text: Text to scan
+
+        Returns:
+            Read-only mapping of category → matched keywords (in text order,
+            without the "*" suffix); categories without hits are absent
+        """
+        normalized = normalize_text(text)
+        hits: Dict[str, List[str]] = {}
+        for match in self._pattern.finditer(normalized):
+            literal = " ".join(match.group(1).split())
+            self._record(hits, literal)
+            for other, pattern in self._nested[literal]:
+                if pattern.match(normalized, match.start()):
+                    self._record(hits, other)
+        return MappingProxyType({category: tuple(keywords) for category, keywords in hits.items()})
+
+    def _record(self, hits: Dict[str, List[str]], literal: str) -> None:
+        for category in self._owners[literal]:
+            found = hits.setdefault(category, [])
+            if literal not in found:
+                found.append(literal)
+
+
+KEYWORDS = KeywordMatcher(KEYWORD_SETS)
+
+
+@lru_cache(maxsize=1024)
+def scan_keywords(text: str) -> KeywordHits:
+    """Scan a text with the shared matcher (cached: one pass per distinct message)."""
+    return KEYWORDS.scan(text)
+
+
+def has_keyword(text: str, category: str) -> bool:
+    """Check whether a text hits a keyword category."""
+    return category in scan_keywords(text)
+
+
+def first_resistance(text: str, types: Sequence[str] = RESISTANCE_TYPES) -> Optional[str]:
+    """Get the first resistance type (in `types` order) a text hits, or None."""
+    hits = scan_keywords(text)
+    for resistance_type in types:
+        if f"resistance.{resistance_type}" in hits:
+            return resistance_type
+    return None
+
+
+__all__ = [
+    "KEYWORD_SETS",
+    "RESISTANCE_TYPES",
+    "KeywordMatcher",
+    "KEYWORDS",
+    "normalize_text",
+    "scan_keywords",
+    "has_keyword",
+    "first_resistance",
+]
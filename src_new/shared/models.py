@@ -21,9 +21,9 @@ class PipelineResult(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ConversationTurn:
-    """A single conversation turn."""
+    """A single conversation turn (immutable; session stores hand out shared records)."""
     role: str  # "user" or "bot"
     text: str
     timestamp: Optional[str] = None
@@ -0,0 +1,121 @@
+"""Compact binary encoding for JSON-like values.
+
+Used where stored state is read and written on every turn (Redis session
+turns and agent state): a one-byte type tag followed by struct-packed
+fields, without JSON's quoting, key repetition or number formatting.
+
+Supported values: None, bool, int (64-bit), float, str, bytes, and lists,
+tuples or dicts (str keys) of these. Tuples decode as lists.
+"""
+
+from __future__ import annotations
+
+import struct
+from typing import Any, List, Tuple
+
+_U8 = struct.Struct("!B")
+_U32 = struct.Struct("!I")
+_I64 = struct.Struct("!q")
+_F64 = struct.Struct("!d")
+
+_NONE, _TRUE, _FALSE = b"N", b"T", b"F"
+_INT, _FLOAT = b"i", b"d"
+_SHORT_STR, _STR, _BYTES = b"s", b"S", b"b"
+_LIST, _MAP = b"l", b"m"
+
+_INT_MIN, _INT_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def pack(value: Any) -> bytes:
+    """Encode a value."""
+    out: List[bytes] = []
+    _pack(value, out)
+    return b"".join(out)
+
+
+def _pack(value: Any, out: List[bytes]) -> None:
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        if not _INT_MIN <= value <= _INT_MAX:
+            raise ValueError(f"Integer out of 64-bit range: {value}")
+        out.append(_INT + _I64.pack(value))
+    elif isinstance(value, float):
+        out.append(_FLOAT + _F64.pack(value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        if len(data) < 256:
+            out.append(_SHORT_STR + _U8.pack(len(data)) + data)
+        else:
+            out.append(_STR + _U32.pack(len(data)) + data)
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTES + _U32.pack(len(value)) + bytes(value))
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST + _U32.pack(len(value)))
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        out.append(_MAP + _U32.pack(len(value)))
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"Map keys must be str, got {type(key).__name__}")
+            _pack(key, out)
+            _pack(item, out)
+    else:
+        raise TypeError(f"Cannot pack {type(value).__name__}")
+
+
+def unpack(data: bytes) -> Any:
+    """Decode a value encoded by pack()."""
+    value, offset = _unpack(memoryview(data), 0)
+    if offset != len(data):
+        raise ValueError(f"{len(data) - offset} trailing bytes after packed value")
+    return value
+
+
+def _unpack(data: memoryview, offset: int) -> Tuple[Any, int]:
+    tag = bytes(data[offset:offset + 1])
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    if tag == _INT:
+        return _I64.unpack_from(data, offset)[0], offset + _I64.size
+    if tag == _FLOAT:
+        return _F64.unpack_from(data, offset)[0], offset + _F64.size
+    if tag == _SHORT_STR:
+        length = _U8.unpack_from(data, offset)[0]
+        offset += _U8.size
+        return str(data[offset:offset + length], "utf-8"), offset + length
+    if tag in (_STR, _BYTES):
+        length = _U32.unpack_from(data, offset)[0]
+        offset += _U32.size
+        raw = bytes(data[offset:offset + length])
+        return (raw.decode("utf-8") if tag == _STR else raw), offset + length
+    if tag == _LIST:
+        count = _U32.unpack_from(data, offset)[0]
+        offset += _U32.size
+        items = []
+        for _ in range(count):
+            item, offset = _unpack(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == _MAP:
+        count = _U32.unpack_from(data, offset)[0]
+        offset += _U32.size
+        mapping = {}
+        for _ in range(count):
+            key, offset = _unpack(data, offset)
+            mapping[key], offset = _unpack(data, offset)
+        return mapping, offset
+    raise ValueError(f"Unknown type tag {tag!r} at offset {offset - 1}")
+
+
+__all__ = ["pack", "unpack"]
@@ -6,6 +6,8 @@ chat content priority, and route decision.
 """
 
 import sys
+import time
+import tracemalloc
 from pathlib import Path
 
 # Add project root to path
@@ -19,6 +21,7 @@ if sys.platform == 'win32':
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
 from src_new.control.risk_router import RiskRouter, RiskRoutingResult
+from src_new.control import decision_trace
 
 
 def test_questionnaire_routing():
@@ -182,6 +185,95 @@ def test_rigid_score_calculation():
         print(f"   {status} {test_case['route']}: {rigid:.3f} (预期范围: {min_val}-{max_val})")
 
 
+def test_decision_trace():
+    """Test structured decision trace contents."""
+    print("\n" + "=" * 80)
+    print("测试 5: 路由决策追踪")
+    print("=" * 80)
+    
+    router = RiskRouter()
+    phq9 = {"total_score": 12.0, "parsed_scores": [1, 1, 2, 1, 1, 1, 1, 1, 0]}
+    gad7 = {"total_score": 16.0, "parsed_scores": [2, 2, 2, 2, 2, 3, 3]}
+    
+    # Off by default
+    result = router.decide_from_questionnaires(phq9, gad7)
+    assert result.trace is None
+    
+    # Questionnaire-driven decision
+    result = router.decide_from_questionnaires(phq9, gad7, trace=True)
+    trace = result.trace
+    assert trace.phq9_route == "medium" and trace.gad7_route == "high"
+    assert trace.questionnaire_route == "high"
+    assert trace.threshold_fired == "GAD7_TOTAL>=15"
+    assert trace.chat_override is None
+    assert trace.rigid_score_bucket == "high"
+    assert trace.final_route == result.route == "high"
+    print(f"   ✅ 问卷路径: {trace.to_dict()}")
+    
+    # Chat priority override
+    low_phq9 = {"total_score": 3.0, "parsed_scores": [0] * 9}
+    low_gad7 = {"total_score": 2.0, "parsed_scores": [0] * 7}
+    result = router.decide_from_questionnaires(low_phq9, low_gad7, chat_risk_score=0.8, trace=True)
+    trace = result.trace
+    assert trace.questionnaire_route == "low"
+    assert trace.chat_override == "medium"
+    assert trace.threshold_fired.startswith("MEDIUM_RISK_THRESHOLD")
+    assert trace.rigid_score_bucket == "medium:base"
+    assert trace.reason == "chat_medium_risk"
+    print(f"   ✅ 聊天优先级覆盖: {trace.chat_override} ({trace.threshold_fired})")
+    
+    # Q9 override
+    q9_phq9 = {"total_score": 5.0, "parsed_scores": [0, 0, 0, 0, 0, 0, 0, 0, 2]}
+    result = router.decide_from_questionnaires(q9_phq9, low_gad7, trace=True)
+    assert result.trace.phq9_q9_override is True
+    assert result.trace.threshold_fired == "PHQ9_Q9>=1"
+    print("   ✅ PHQ-9 Q9 覆盖已记录")
+    
+    # Sampling
+    assert RiskRouter(trace_sample_rate=1.0).decide_from_questionnaires(phq9, gad7).trace is not None
+    assert RiskRouter(trace_sample_rate=1.0).decide_from_questionnaires(phq9, gad7, trace=False).trace is None
+    print("   ✅ 采样率与单次请求开关生效")
+
+
+def test_trace_disabled_cost():
+    """Microbenchmark: tracing off allocates nothing from the trace module."""
+    print("\n" + "=" * 80)
+    print("测试 6: 关闭追踪时零分配（微基准）")
+    print("=" * 80)
+    
+    router = RiskRouter()
+    phq9 = {"total_score": 12.0, "parsed_scores": [1, 1, 2, 1, 1, 1, 1, 1, 0]}
+    gad7 = {"total_score": 10.0, "parsed_scores": [1, 1, 2, 1, 1, 2, 2]}
+    trace_filter = [tracemalloc.Filter(True, decision_trace.__file__, all_frames=True)]
+    n = 2000
+    
+    def allocated_blocks(trace):
+        tracemalloc.start(25)
+        try:
+            for _ in range(n):
+                router.decide_from_questionnaires(phq9, gad7, chat_risk_score=0.8, trace=trace)
+            snapshot = tracemalloc.take_snapshot().filter_traces(trace_filter)
+        finally:
+            tracemalloc.stop()
+        return sum(stat.count for stat in snapshot.statistics("filename"))
+    
+    off_blocks = allocated_blocks(False)
+    on_blocks = allocated_blocks(True)
+    assert off_blocks == 0, f"Tracing off allocated {off_blocks} blocks"
+    assert on_blocks > 0
+    
+    timings = {}
+    for trace in (False, True):
+        started = time.perf_counter()
+        for _ in range(n):
+            router.decide_from_questionnaires(phq9, gad7, chat_risk_score=0.8, trace=trace)
+        timings[trace] = (time.perf_counter() - started) / n * 1e6
+    
+    print(f"   关闭追踪: {off_blocks} 个分配块, {timings[False]:.2f} µs/次")
+    print(f"   开启追踪: {on_blocks} 个存活分配块, {timings[True]:.2f} µs/次")
+    print("   ✅ 关闭追踪时无追踪对象分配")
+
+
 def main():
     """Run all tests."""
     print("=" * 80)
@@ -195,6 +287,8 @@ def main():
     test_chat_content_priority()
     test_legacy_compatibility()
     test_rigid_score_calculation()
+    test_decision_trace()
+    test_trace_disabled_cost()
     
     print("\n" + "=" * 80)
     print("测试完成")
@@ -0,0 +1,221 @@
+"""
+Test RouteEventLog functionality.
+
+Tests the append-only route transition log: segments, batched fsync,
+offset replay, tailing consumers and ControlContext integration.
+"""
+
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.route_event_log import (
+    RouteEventLog,
+    RouteTransitionEvent,
+    set_route_event_log
+)
+from src_new.control.control_context import ControlContext
+from src_new.control.route_updater import RouteUpdater
+
+
+def _event(i: int) -> RouteTransitionEvent:
+    return RouteTransitionEvent(
+        user_id=f"user_{i % 7}",
+        from_route="low",
+        to_route="medium",
+        reason="psyguard_medium_risk",
+        source="route_updater"
+    )
+
+
+def test_append_and_replay():
+    """Test offsets, segment rollover and replay from an offset."""
+    print("\n" + "=" * 80)
+    print("测试 1: 追加与按偏移重放")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp, segment_max_events=10, fsync_batch_size=4)
+        offsets = [log.append(_event(i)) for i in range(25)]
+        assert offsets == list(range(25))
+
+        # Without the writer, append() only buffers; nothing is durable until flush
+        assert log.durable_offset == 0
+        log.flush()
+        assert log.durable_offset == 25
+
+        assert len(list(Path(tmp).glob("*.log"))) == 3
+        assert [e.offset for e in log.replay()] == list(range(25))
+        assert [e.offset for e in log.replay(from_offset=13)] == list(range(13, 25))
+        assert [e.offset for e in log.replay(from_offset=5, to_offset=12)] == list(range(5, 12))
+
+        print("   ✅ 25 个事件分布在 3 个段文件中，重放正确")
+
+
+def test_recovery_after_torn_write():
+    """Test that reopening the log drops a torn trailing line."""
+    print("\n" + "=" * 80)
+    print("测试 2: 崩溃后恢复（截断残缺记录）")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp, segment_max_events=100)
+        for i in range(5):
+            log.append(_event(i))
+        log.flush()
+
+        # Simulate a torn write
+        segment = sorted(Path(tmp).glob("*.log"))[-1]
+        with open(segment, "a", encoding="utf-8") as f:
+            f.write('{"user_id": "broken"')
+
+        reopened = RouteEventLog(tmp, segment_max_events=100)
+        assert reopened.next_offset == 5
+        assert reopened.append(_event(5)) == 5
+        reopened.flush()
+        assert [e.offset for e in reopened.replay()] == list(range(6))
+
+        print("   ✅ 残缺记录被截断，偏移量连续")
+
+
+def test_append_drops_when_buffer_full():
+    """Test that append() drops and counts events instead of flushing inline."""
+    print("\n" + "=" * 80)
+    print("测试 3: 缓冲区满时丢弃并计数")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp, fsync_batch_size=2, max_pending=3)
+        offsets = [log.append(_event(i)) for i in range(5)]
+        assert offsets == [0, 1, 2, None, None]
+        assert log.durable_offset == 0
+        assert all(p.stat().st_size == 0 for p in Path(tmp).glob("*.log"))
+        assert log.get_stats()["dropped_events"] == 2
+
+        log.flush()
+        assert [e.offset for e in log.replay()] == [0, 1, 2]
+        assert log.append(_event(5)) == 3
+
+        print("   ✅ append 从不同步写盘，超出上限的 2 个事件被丢弃并计数")
+
+
+async def test_tail_consumer():
+    """Test tailing async iterator with the background writer."""
+    print("\n" + "=" * 80)
+    print("测试 4: 异步 tail 消费者")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp, segment_max_events=50, flush_interval=0.01)
+        await log.start()
+
+        received = []
+
+        async def consume():
+            async for event in log.tail(from_offset=0):
+                received.append(event.offset)
+                if len(received) == 120:
+                    return
+
+        consumer = asyncio.create_task(consume())
+        for i in range(120):
+            log.append(_event(i))
+            if i % 40 == 0:
+                await asyncio.sleep(0)
+
+        await asyncio.wait_for(consumer, timeout=5.0)
+        await log.close()
+
+        assert received == list(range(120))
+        print(f"   ✅ tail 收到 {len(received)} 个事件，顺序正确")
+
+
+async def test_append_throughput():
+    """Test that appends do not block and sustain high throughput."""
+    print("\n" + "=" * 80)
+    print("测试 5: 追加吞吐量")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp, fsync_batch_size=4096)
+        await log.start()
+
+        n = 50_000
+        started = time.perf_counter()
+        for i in range(n):
+            log.append(_event(i))
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+        append_seconds = time.perf_counter() - started
+        await log.close()
+        total_seconds = time.perf_counter() - started
+
+        assert log.durable_offset == n
+        print(f"   追加: {n / append_seconds:,.0f} 事件/秒")
+        print(f"   含落盘: {n / total_seconds:,.0f} 事件/秒")
+        print(f"   统计: {log.get_stats()}")
+        assert n / total_seconds > 10_000
+        print("   ✅ 吞吐量满足要求")
+
+
+def test_control_context_records_transitions():
+    """Test ControlContext.update_route and RouteUpdater record transitions."""
+    print("\n" + "=" * 80)
+    print("测试 6: ControlContext / RouteUpdater 记录路由变化")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log = RouteEventLog(tmp)
+        set_route_event_log(log)
+        try:
+            context = ControlContext(user_id="u1", route="low", rigid_score=0.2)
+            assert RouteUpdater.apply_to_context(context, 0.75) is True
+            assert RouteUpdater.apply_to_context(context, 0.5) is False  # No downgrade, no event
+            context.update_route("high", reason="chat_high_risk", source="chat_content")
+            context.update_route("high", reason="chat_high_risk")  # Unchanged, no event
+            log.flush()
+        finally:
+            set_route_event_log(None)
+
+        events = list(log.replay())
+        assert [(e.from_route, e.to_route) for e in events] == [("low", "medium"), ("medium", "high")]
+        assert events[0].source == "route_updater"
+        assert events[0].reason == "psyguard_medium_risk"
+        assert events[1].source == "chat_content"
+        assert events[0].monotonic_ns <= events[1].monotonic_ns
+
+        print(f"   ✅ 记录了 {len(events)} 次路由变化")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("RouteEventLog 测试")
+    print("=" * 80)
+
+    test_append_and_replay()
+    test_recovery_after_torn_write()
+    test_append_drops_when_buffer_full()
+    await test_tail_consumer()
+    await test_append_throughput()
+    test_control_context_records_transitions()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
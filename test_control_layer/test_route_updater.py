@@ -5,8 +5,11 @@ Tests the one-way route upgrade logic.
 """
 
 import sys
+import random
 from pathlib import Path
 
+import numpy as np
+
 # Add project root to path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -17,7 +20,7 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
-from src_new.control.route_updater import RouteUpdater
+from src_new.control.route_updater import RouteUpdater, ROUTE_CODES, ROUTE_NAMES
 from src_new.perception.psyguard_service import (
     MEDIUM_RISK_THRESHOLD,
     HIGH_RISK_DIRECT_THRESHOLD
@@ -175,6 +178,74 @@ def test_get_upgrade_target():
               f"预期目标={expected}, 实际={result}")
 
 
+def test_batch_matches_scalar():
+    """Property test: batch update equals scalar update_route element-wise."""
+    print("\n" + "=" * 80)
+    print("测试 7: 批量更新与标量版本一致（随机属性测试）")
+    print("=" * 80)
+    
+    rng = random.Random(20251107)
+    # Boundary values around each threshold, plus out-of-range and NaN
+    edge_scores = [
+        0.0, 1.0, -0.1, 1.1, float("nan"),
+        MEDIUM_RISK_THRESHOLD, HIGH_RISK_DIRECT_THRESHOLD,
+        np.nextafter(MEDIUM_RISK_THRESHOLD, 0.0), np.nextafter(MEDIUM_RISK_THRESHOLD, 1.0),
+        np.nextafter(HIGH_RISK_DIRECT_THRESHOLD, 0.0), np.nextafter(HIGH_RISK_DIRECT_THRESHOLD, 1.0),
+    ]
+    
+    for trial in range(200):
+        size = rng.randint(0, 64)
+        routes = [rng.choice(ROUTE_NAMES) for _ in range(size)]
+        scores = [
+            rng.choice(edge_scores) if rng.random() < 0.3 else rng.random()
+            for _ in range(size)
+        ]
+        
+        codes = RouteUpdater.encode_routes(routes)
+        updated, upgraded = RouteUpdater.update_routes_batch(codes, scores)
+        
+        expected = [RouteUpdater.update_route(r, s) for r, s in zip(routes, scores, strict=True)]
+        expected_mask = [RouteUpdater.should_upgrade(r, s) for r, s in zip(routes, scores, strict=True)]
+        
+        assert RouteUpdater.decode_routes(updated) == expected, f"trial {trial} routes differ"
+        assert upgraded.tolist() == expected_mask, f"trial {trial} upgrade mask differs"
+    
+    print("   ✅ 200 组随机批次与标量版本结果一致")
+
+
+def test_batch_validation():
+    """Test batch input validation and dtype handling."""
+    print("\n" + "=" * 80)
+    print("测试 8: 批量输入校验")
+    print("=" * 80)
+    
+    codes = np.array([ROUTE_CODES["low"], ROUTE_CODES["medium"]], dtype=np.int64)
+    updated, upgraded = RouteUpdater.update_routes_batch(codes, [0.96, 0.1])
+    assert updated.dtype == codes.dtype
+    assert updated.tolist() == [2, 1]
+    assert upgraded.tolist() == [True, False]
+    
+    invalid_inputs = [
+        ([0, 1], [0.5]),  # shape mismatch
+        ([0, 3], [0.5, 0.5]),  # unknown code
+        ([0.0, 1.0], [0.5, 0.5]),  # float codes
+    ]
+    for routes, scores in invalid_inputs:
+        try:
+            RouteUpdater.update_routes_batch(routes, scores)
+        except ValueError as e:
+            print(f"   ✅ 拒绝非法输入: {e}")
+        else:
+            raise AssertionError(f"Expected ValueError for {routes}, {scores}")
+    
+    try:
+        RouteUpdater.encode_routes(["low", "critical"])
+    except ValueError as e:
+        print(f"   ✅ 拒绝未知路由名: {e}")
+    else:
+        raise AssertionError("Expected ValueError for unknown route name")
+
+
 def main():
     """Run all tests."""
     print("=" * 80)
@@ -190,6 +261,8 @@ def main():
     test_direct_high_upgrade()
     test_should_upgrade()
     test_get_upgrade_target()
+    test_batch_matches_scalar()
+    test_batch_validation()
     
     print("\n" + "=" * 80)
     print("测试完成")
@@ -0,0 +1,123 @@
+"""
+Test shadow routing functionality.
+
+Tests candidate rule sets evaluated next to the primary RiskRouter.
+"""
+
+import sys
+import random
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.risk_router import RiskRouter
+from src_new.control.shadow_routing import RoutingRuleSet, ShadowRoutingEvaluator
+from src_new.perception.questionnaire_mapper import QuestionnaireMapper
+
+
+def _random_inputs(rng):
+    phq9_score = rng.choice([rng.randint(0, 27), rng.uniform(0, 27)])
+    gad7_score = rng.choice([rng.randint(0, 21), rng.uniform(0, 21)])
+    phq9_q9_score = rng.choice([None, 0, 0, 0, 1, 2, 3])
+    chat_risk_score = rng.choice([None, rng.random(), 0.70, 0.95, 0.6])
+    return phq9_score, gad7_score, phq9_q9_score, chat_risk_score
+
+
+def test_default_rules_match_primary():
+    """Test default RoutingRuleSet reproduces the primary decision exactly."""
+    print("\n" + "=" * 80)
+    print("测试 1: 默认规则集与主路由完全一致")
+    print("=" * 80)
+
+    rng = random.Random(7)
+    rules = RoutingRuleSet("baseline")
+    for _ in range(5000):
+        inputs = _random_inputs(rng)
+        assert rules.decide(*inputs) == QuestionnaireMapper.final_route_decision(*inputs), inputs
+
+    print("   ✅ 5000 组随机输入结果一致")
+
+
+def test_shadow_disagreements():
+    """Test disagreement counters for a candidate threshold."""
+    print("\n" + "=" * 80)
+    print("测试 2: 候选阈值的分歧统计")
+    print("=" * 80)
+
+    shadow = ShadowRoutingEvaluator([
+        RoutingRuleSet("baseline"),
+        RoutingRuleSet("medium_0.65", medium_risk_threshold=0.65),
+    ])
+    router = RiskRouter(shadow=shadow)
+    phq9 = {"total_score": 3.0, "parsed_scores": [0] * 9}
+    gad7 = {"total_score": 3.0, "parsed_scores": [0] * 7}
+
+    for chat_risk in [0.1, 0.66, 0.68, 0.75, 0.97]:
+        router.decide_from_questionnaires(phq9, gad7, chat_risk_score=chat_risk)
+
+    # Nothing is evaluated on the request path
+    assert shadow.get_stats()["pending"] == 5
+    assert shadow.drain() == 5
+
+    stats = shadow.get_stats()
+    assert stats["rule_sets"]["baseline"]["disagreements"] == 0
+    candidate = stats["rule_sets"]["medium_0.65"]
+    assert candidate["decisions"] == 5
+    assert candidate["disagreements"] == 2
+    assert candidate["transitions"] == {"low->medium": 2}
+
+    print(f"   ✅ 候选规则分歧: {candidate}")
+
+
+async def test_background_evaluation():
+    """Test background evaluation and bounded queue."""
+    print("\n" + "=" * 80)
+    print("测试 3: 后台评估与队列上限")
+    print("=" * 80)
+
+    shadow = ShadowRoutingEvaluator(
+        [RoutingRuleSet("phq9_medium_8", phq9_low_max=7)],
+        max_pending=100,
+        interval=0.01
+    )
+    for _ in range(150):
+        shadow.submit(8.0, 0.0, 0, None, "low")
+    assert shadow.get_stats()["dropped"] == 50
+
+    await shadow.start()
+    await asyncio.sleep(0.05)
+    assert shadow.get_stats()["pending"] == 0
+    await shadow.close()
+
+    stats = shadow.get_stats()["rule_sets"]["phq9_medium_8"]
+    assert stats["decisions"] == 100
+    assert stats["transitions"] == {"low->medium": 100}
+    print(f"   ✅ 后台评估 {stats['decisions']} 条, 丢弃 {shadow.get_stats()['dropped']} 条")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("Shadow Routing 测试")
+    print("=" * 80)
+
+    test_default_rules_match_primary()
+    test_shadow_disagreements()
+    await test_background_evaluation()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+"""
+Test LLM admission control.
+
+Tests priority queueing, early shedding and metrics (no Ollama needed).
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.admission import AdmissionShed, LLMAdmissionController, LLMPriority
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.llm.models import LLMRequest
+
+
+async def test_medium_outranks_low():
+    """Test queued medium-risk requests are admitted before low-risk ones."""
+    print("\n" + "=" * 80)
+    print("测试 1: 中风险优先于低风险")
+    print("=" * 80)
+
+    controller = LLMAdmissionController(max_concurrency=1)
+    order = []
+
+    async def request(name, priority):
+        async with controller.admit(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async with controller.admit(LLMPriority.LOW_RISK):
+        tasks = [
+            asyncio.create_task(request("low-1", LLMPriority.LOW_RISK)),
+            asyncio.create_task(request("low-2", LLMPriority.LOW_RISK)),
+            asyncio.create_task(request("medium", LLMPriority.MEDIUM_RISK)),
+        ]
+        await asyncio.sleep(0)
+        assert controller.queue_depth() == 3
+    await asyncio.gather(*tasks)
+
+    assert order == ["medium", "low-1", "low-2"]
+    stats = controller.get_stats()
+    assert stats["in_flight"] == 0 and stats["max_queue_depth"] == 3
+    assert stats["wait"]["medium_risk"]["count"] == 1
+    print(f"   ✅ 顺序: {order}")
+
+
+async def test_early_shedding():
+    """Test low-risk requests are shed when their deadline can't be met."""
+    print("\n" + "=" * 80)
+    print("测试 2: 提前丢弃无法按时完成的低风险请求")
+    print("=" * 80)
+
+    controller = LLMAdmissionController(max_concurrency=1, service_time_estimate=0.05)
+    loop = asyncio.get_running_loop()
+
+    async with controller.admit(LLMPriority.LOW_RISK):
+        # Predicted: one generation ahead + its own > 0.08 s
+        try:
+            await controller.acquire(LLMPriority.LOW_RISK, deadline=loop.time() + 0.08)
+            raise AssertionError("expected shed")
+        except AdmissionShed as e:
+            assert e.reason == "predicted_deadline_miss"
+
+        # Queued, then shed once less than one generation time is left
+        started = loop.time()
+        try:
+            await controller.acquire(LLMPriority.LOW_RISK, deadline=loop.time() + 0.12)
+            raise AssertionError("expected shed")
+        except AdmissionShed as e:
+            assert e.reason == "deadline"
+        assert loop.time() - started < 0.1
+
+        # Medium-risk requests are never shed early
+        waiter = asyncio.create_task(
+            controller.acquire(LLMPriority.MEDIUM_RISK, deadline=loop.time() + 0.08)
+        )
+        await asyncio.sleep(0.01)
+    assert await waiter >= 0.0
+    controller.release()
+
+    assert controller.get_stats()["shed"] == {"predicted_deadline_miss": 1, "deadline": 1}
+    assert controller.get_stats()["in_flight"] == 0
+    print(f"   ✅ {controller.get_stats()['shed']}")
+
+
+async def test_queue_full_eviction():
+    """Test a full queue evicts low-risk waiters for medium-risk requests."""
+    controller = LLMAdmissionController(max_concurrency=1, max_queue=1)
+    async with controller.admit(LLMPriority.LOW_RISK):
+        low = asyncio.create_task(controller.acquire(LLMPriority.LOW_RISK))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire(LLMPriority.LOW_RISK)
+            raise AssertionError("expected shed")
+        except AdmissionShed as e:
+            assert e.reason == "queue_full"
+        medium = asyncio.create_task(controller.acquire(LLMPriority.MEDIUM_RISK))
+        await asyncio.sleep(0)
+        try:
+            await low
+            raise AssertionError("expected eviction")
+        except AdmissionShed as e:
+            assert e.reason == "evicted"
+    await medium
+    controller.release()
+    assert controller.get_stats()["in_flight"] == 0
+
+
+async def test_gateway_sheds_with_fallback():
+    """Test shed low-risk calls return the fallback while medium-risk ones succeed."""
+    print("\n" + "=" * 80)
+    print("测试 3: 网关在高峰时丢弃低风险请求并返回回退文本")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.05)
+    gateway = backend.gateway(LLMGatewayConfig(max_concurrent_generations=1, service_time_estimate=0.05))
+
+    def request(priority, deadline):
+        return gateway.generate(LLMRequest(
+            prompt="p", temperature=0.5, fallback="fallback", priority=priority, deadline=deadline
+        ))
+
+    results = await asyncio.gather(
+        *[request(LLMPriority.LOW_RISK, 0.12) for _ in range(5)],
+        request(LLMPriority.MEDIUM_RISK, 1.0),
+    )
+    low_results, medium_result = results[:5], results[5]
+
+    assert medium_result.ok
+    assert any(result.shed and result.text == "fallback" for result in low_results)
+    assert any(result.ok for result in low_results)
+    stats = gateway.get_stats()["admission"]
+    assert sum(stats["shed"].values()) == sum(result.shed for result in low_results)
+    print(f"   ✅ 低风险丢弃 {sum(r.shed for r in low_results)}/5, 中风险排队 "
+          f"{medium_result.queue_wait * 1000:.0f} ms")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("LLM 准入控制测试")
+    print("=" * 80)
+
+    await test_medium_outranks_low()
+    await test_early_shedding()
+    await test_queue_full_eviction()
+    await test_gateway_sheds_with_fallback()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""
+Test consistent-hash user affinity across conversation workers.
+
+Several ConversationPipeline workers behind one AffinityRouter: the hash
+ring's balance and minimal movement, every turn of a user reaching the
+same worker, and users' hot state moving with them when workers join or
+leave. Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import sys
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.control_context import ControlContext
+from src_new.conversation.affinity import AffinityRouter
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.conversation.session_service import SessionService
+from src_new.conversation.session_store import JsonlTranscriptArchive
+from src_new.shared.hash_ring import ConsistentHashRing, hash_key
+
+
+def make_worker(backend: FakeOllamaBackend, archive_dir: str) -> ConversationPipeline:
+    """One worker: its own gateway and memory, sessions archived to a shared directory."""
+    return ConversationPipeline(
+        llm_gateway=backend.gateway(LLMGatewayConfig(max_concurrent_generations=16)),
+        session_service=SessionService(archive=JsonlTranscriptArchive(archive_dir))
+    )
+
+
+def test_ring_balance_and_movement():
+    """Test keys spread evenly and only the affected share moves on changes."""
+    print("\n" + "=" * 80)
+    print("测试 1: 哈希环均衡与最小迁移")
+    print("=" * 80)
+
+    keys = [f"user_{i}" for i in range(6000)]
+    ring = ConsistentHashRing(["worker-0", "worker-1", "worker-2"])
+    before = {key: ring.owner(key) for key in keys}
+    for node in ring.nodes:
+        share = sum(1 for owner in before.values() if owner == node) / len(keys)
+        assert 0.25 < share < 0.42, f"{node} owns {share:.0%} of users"
+
+    grown = ring.copy()
+    grown.add("worker-3")
+    moved = [key for key in keys if grown.owner(key) != before[key]]
+    assert all(grown.owner(key) == "worker-3" for key in moved), "Only the new worker may gain users"
+    assert 0.15 < len(moved) / len(keys) < 0.35
+    assert ring.owner("user_1") == before["user_1"], "copy() must leave the original ring alone"
+
+    shrunk = ring.copy()
+    shrunk.remove("worker-1")
+    assert all(shrunk.owner(key) == before[key] for key in keys if before[key] != "worker-1")
+
+    # Stable across processes (Python's hash() is salted per process)
+    assert hash_key("user_1") == int.from_bytes(hashlib.blake2b(b"user_1", digest_size=8).digest(), "big")
+    print(f"   ✅ 加入第 4 个 worker 迁移 {len(moved) / len(keys):.0%} 的用户，且全部迁往新 worker")
+
+
+async def test_turns_stick_to_owner():
+    """Test every turn of a user is handled by the same worker, from local memory."""
+    print("\n" + "=" * 80)
+    print("测试 2: 同一用户固定到同一 worker")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    with tempfile.TemporaryDirectory() as archive_dir:
+        workers = {f"worker-{i}": make_worker(backend, archive_dir) for i in range(2)}
+        router = AffinityRouter(workers)
+        users = [f"sticky_{i}" for i in range(12)]
+
+        for round_number in range(3):
+            results = await asyncio.gather(*(
+                router.process_message(
+                    user_id, f"message {round_number}",
+                    ControlContext(user_id=user_id, route="low", rigid_score=0.2)
+                )
+                for user_id in users
+            ))
+            assert all(result["worker"] == router.worker_for(result["user_id"]) for result in results)
+
+        for user_id in users:
+            owner = router.worker_for(user_id)
+            for name, worker in workers.items():
+                expected = 6 if name == owner else 0
+                assert len(worker.get_conversation_history(user_id)) == expected
+        assert all(worker.session_service.get_stats()["hydrated"] == 0 for worker in workers.values())
+
+        stats = router.get_stats()
+        assert sum(stats["dispatched"].values()) == 36
+        assert min(stats["dispatched"].values()) > 0, "Both workers should get users"
+        for worker in workers.values():
+            await worker.shutdown()
+    print(f"   ✅ 36 轮全部落在各自 worker，分布: {stats['dispatched']}")
+
+
+async def test_rebalance_hands_off_state():
+    """Test users moved by a ring change keep their session, agent state and route."""
+    print("\n" + "=" * 80)
+    print("测试 3: 扩缩容时状态迁移")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    with tempfile.TemporaryDirectory() as archive_dir:
+        workers = {f"worker-{i}": make_worker(backend, archive_dir) for i in range(2)}
+        router = AffinityRouter(workers)
+        users = [f"moving_{i}" for i in range(16)]
+        contexts = {user_id: ControlContext(user_id=user_id, route="medium", rigid_score=0.5) for user_id in users}
+
+        await asyncio.gather(*(router.process_message(user_id, "I feel low", contexts[user_id]) for user_id in users))
+        for user_id in users:
+            assert workers[router.worker_for(user_id)].user_states.get_context(user_id) is contexts[user_id]
+        owners_before = {user_id: router.worker_for(user_id) for user_id in users}
+
+        new_worker = make_worker(backend, archive_dir)
+        moved = await router.add_worker("worker-2", new_worker)
+        moved_users = [user_id for user_id in users if router.worker_for(user_id) == "worker-2"]
+        assert moved == len(moved_users) > 0
+        for user_id in moved_users:
+            old = workers[owners_before[user_id]]
+            assert user_id not in old.held_users(), "Old worker must drop moved users"
+            assert len(new_worker.get_conversation_history(user_id)) == 2
+            assert len(new_worker.medium_agent.get_state(user_id).conversation_turns) == 1
+            assert new_worker.user_states.get_context(user_id) is contexts[user_id]
+
+        # Next turn continues on the new worker from memory, without the caller's context
+        await asyncio.gather(*(router.process_message(user_id, "still here") for user_id in users))
+        for user_id in moved_users:
+            assert len(new_worker.get_conversation_history(user_id)) == 4
+            assert len(new_worker.medium_agent.get_state(user_id).conversation_turns) == 2
+        assert new_worker.session_service.get_stats()["hydrated"] == 0
+
+        # Removing a worker hands all of its users to the others
+        leaving = workers["worker-0"]
+        leaving_users = [user_id for user_id in users if router.worker_for(user_id) == "worker-0"]
+        assert await router.remove_worker("worker-0") == len(leaving_users)
+        assert leaving.held_users() == set()
+        workers["worker-2"] = new_worker
+        for user_id in users:
+            owner = workers[router.worker_for(user_id)]
+            assert len(owner.get_conversation_history(user_id)) == 4
+        for worker in workers.values():
+            await worker.shutdown()
+    print(f"   ✅ 加入 worker 迁移 {moved} 个用户，移除 worker 迁移 {len(leaving_users)} 个，会话与状态完整")
+
+
+async def test_turns_during_rebalance():
+    """Test turns arriving during a handoff wait for it and none is lost or reordered."""
+    print("\n" + "=" * 80)
+    print("测试 4: 迁移期间到达的轮次")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.03)
+    with tempfile.TemporaryDirectory() as archive_dir:
+        workers = {f"worker-{i}": make_worker(backend, archive_dir) for i in range(2)}
+        router = AffinityRouter(workers)
+        users = [f"busy_{i}" for i in range(16)]
+
+        async def converse(user_id: str) -> None:
+            context = ControlContext(user_id=user_id, route="low", rigid_score=0.2)
+            for i in range(4):
+                await router.process_message(user_id, f"{user_id} message {i}", context)
+
+        conversations = asyncio.gather(*(converse(user_id) for user_id in users))
+        await asyncio.sleep(0.05)
+        workers["worker-2"] = make_worker(backend, archive_dir)
+        moved = await router.add_worker("worker-2", workers["worker-2"])
+        await conversations
+
+        for user_id in users:
+            holders = [worker for worker in workers.values() if worker.get_conversation_history(user_id)]
+            assert len(holders) == 1, f"{user_id} held by {len(holders)} workers"
+            history = holders[0].get_conversation_history(user_id)
+            assert [turn.text for turn in history if turn.role == "user"] == [
+                f"{user_id} message {i}" for i in range(4)
+            ]
+        for worker in workers.values():
+            await worker.shutdown()
+    stats = router.get_stats()
+    print(f"   ✅ 迁移 {moved} 个用户用时 {stats['last_rebalance_ms']:.0f} ms，"
+          f"{stats['held_turns']} 轮等待迁移完成，无丢失或乱序")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("用户亲和路由测试")
+    print("=" * 80)
+
+    test_ring_balance_and_movement()
+    await test_turns_stick_to_owner()
+    await test_rebalance_hands_off_state()
+    await test_turns_during_rebalance()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
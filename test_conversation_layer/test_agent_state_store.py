@@ -0,0 +1,213 @@
+"""
+Test AgentStateStore functionality.
+
+Tests bounded per-user MediumRiskAgent state: LRU/TTL eviction, the
+per-state turn ring buffer, spill to a persistent backend and metrics.
+"""
+
+import sys
+import asyncio
+import threading
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.agent_state_store import AgentStateStore, JsonFileSpillBackend
+from src_new.conversation.agents.medium_risk_agent import (
+    MediumRiskAgent,
+    MediumRiskAgentState,
+    MediumRiskState,
+    MAX_STORED_TURNS
+)
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.control.control_context import ControlContext
+
+
+class ThreadRecordingBackend:
+    """In-memory spill backend recording which thread each call runs on."""
+
+    def __init__(self):
+        self.data = {}
+        self.threads = []
+
+    def save(self, key, data):
+        self.threads.append(threading.get_ident())
+        self.data[key] = data
+
+    def load(self, key):
+        self.threads.append(threading.get_ident())
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.threads.append(threading.get_ident())
+        self.data.pop(key, None)
+
+
+def test_lru_eviction():
+    """Test the least recently used state is evicted when full."""
+    print("\n" + "=" * 80)
+    print("测试 1: LRU 驱逐")
+    print("=" * 80)
+
+    store = AgentStateStore(MediumRiskAgentState, max_users=3)
+    for user_id in ("a", "b", "c"):
+        store.get(user_id).resistance_count = 1
+    store.get("a")  # "b" is now least recently used
+    store.get("d")
+
+    assert len(store) == 3
+    assert "b" not in store
+    assert all(user_id in store for user_id in ("a", "c", "d"))
+    assert store.get_stats()["evictions"] == 1
+    print(f"   ✅ 容量 3，最久未用的用户被驱逐: {list(store.keys())}")
+
+
+def test_ttl_expiry():
+    """Test idle states expire after the TTL."""
+    print("\n" + "=" * 80)
+    print("测试 2: TTL 过期")
+    print("=" * 80)
+
+    store = AgentStateStore(MediumRiskAgentState, ttl=0.0)
+    store.get("idle").resistance_count = 3
+    assert store.sweep() == 1
+    assert "idle" not in store
+    assert store.get("idle").resistance_count == 0, "Expired state should start fresh"
+    print("   ✅ 空闲状态过期后重新开始")
+
+
+def test_turn_ring_buffer():
+    """Test stored turns are capped per state."""
+    print("\n" + "=" * 80)
+    print("测试 3: 每用户轮次环形缓冲")
+    print("=" * 80)
+
+    state = MediumRiskAgentState()
+    for i in range(MAX_STORED_TURNS * 3):
+        state.conversation_turns.append({"user_message": f"m{i}", "bot_response": "r", "state": "x"})
+
+    assert len(state.conversation_turns) == MAX_STORED_TURNS
+    assert state.conversation_turns[-1]["user_message"] == f"m{MAX_STORED_TURNS * 3 - 1}"
+    print(f"   ✅ 写入 {MAX_STORED_TURNS * 3} 轮，仅保留最近 {len(state.conversation_turns)} 轮")
+
+
+async def test_spill_and_restore():
+    """Test evicted state is spilled and restored on the next access."""
+    print("\n" + "=" * 80)
+    print("测试 4: 驱逐落盘与恢复")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = AgentStateStore(
+            MediumRiskAgentState,
+            max_users=1,
+            spill=JsonFileSpillBackend(directory),
+            dump=MediumRiskAgentState.to_dict,
+            load=MediumRiskAgentState.from_dict
+        )
+        state = store.get("user/1")
+        state.current_state = MediumRiskState.HANDLING_RESISTANCE
+        state.resistance_count = 2
+        state.detected_resistance_type = "privacy"
+        state.conversation_turns.append({"user_message": "hi", "bot_response": "hello", "state": "x"})
+
+        store.get("user_2")  # Evicts user/1; written to disk behind the caller
+        assert "user/1" not in store
+        await store.drain()
+        assert store.spill.load("user/1")["resistance_count"] == 2
+
+        restored = store.get("user/1")
+        assert restored.current_state == MediumRiskState.HANDLING_RESISTANCE
+        assert restored.resistance_count == 2
+        assert restored.detected_resistance_type == "privacy"
+        assert list(restored.conversation_turns)[0]["bot_response"] == "hello"
+        assert restored.conversation_turns.maxlen == MAX_STORED_TURNS
+
+        store.discard("user/1")
+        assert store.spill.load("user/1") is None
+        stats = store.get_stats()
+        assert stats["spilled"] >= 1 and stats["restored"] == 1
+    print(f"   ✅ 状态恢复: {restored.current_state.value}, 抗拒计数={restored.resistance_count}")
+
+
+async def test_agent_memory_bounded():
+    """Test the agent keeps at most max_users states and reports memory."""
+    print("\n" + "=" * 80)
+    print("测试 5: Agent 内存有界")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    agent = MediumRiskAgent(gateway=backend.gateway(), max_users=5)
+    for i in range(20):
+        await agent.generate_response(user_id=f"user_{i}", user_message="I'm anxious.")
+
+    stats = agent.get_stats()
+    assert stats["users"] == 5
+    assert stats["evictions"] == 15
+    assert stats["approx_bytes"] > 0
+    agent.reset_state("user_19")
+    assert agent.get_stats()["users"] == 4
+    print(f"   ✅ 20 个用户后内存中 {stats['users']} 个状态，约 {stats['approx_bytes']} 字节")
+
+
+async def test_no_backend_io_on_event_loop():
+    """Test eviction spills and restores through the pipeline never touch the backend on the loop thread."""
+    print("\n" + "=" * 80)
+    print("测试 6: 落盘与恢复不在事件循环线程上执行")
+    print("=" * 80)
+
+    spill = ThreadRecordingBackend()
+    pipeline = ConversationPipeline(llm_gateway=FakeOllamaBackend().gateway(), state_backend=spill)
+    store = pipeline.medium_agent.state_store
+    store.max_users = 2
+    loop_thread = threading.get_ident()
+
+    for i in range(4):
+        context = ControlContext(user_id=f"user_{i}", route="medium", rigid_score=0.5)
+        await pipeline.process_message(f"user_{i}", "I don't want others to know.", context)
+    await store.drain()
+    assert store.get_stats()["evictions"] == 2 and "user_0" not in store
+    assert spill.data["user_0"]["current_state"] == MediumRiskState.DETECTING_RESISTANCE.value
+
+    # Returning user: the history stage prefetches, the agent finds the state in memory
+    await pipeline.process_message("user_0", "I still don't want others to know.")
+    restored = store.peek("user_0")
+    assert len(restored.conversation_turns) == 2
+    assert store.get_stats()["restored"] == 1
+    await pipeline.shutdown()
+
+    assert spill.threads, "Backend should have been used"
+    assert loop_thread not in spill.threads, "Backend I/O ran on the event loop thread"
+    print(f"   ✅ {len(spill.threads)} 次后端读写全部在工作线程中执行，返回用户状态已恢复")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("AgentStateStore 测试")
+    print("=" * 80)
+
+    test_lru_eviction()
+    test_ttl_expiry()
+    test_turn_ring_buffer()
+    await test_spill_and_restore()
+    await test_agent_memory_bounded()
+    await test_no_backend_io_on_event_loop()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,134 @@
+"""
+Test multi-backend LLM load balancing.
+
+Uses several FakeOllamaBackend instances behind one transport (no Ollama needed).
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.fake import FakeLLMService, FakeOllamaBackend, fake_cluster_transport
+from src_new.conversation.llm.gateway import LLMGateway, LLMGatewayConfig
+from src_new.conversation.llm.models import LLMRequest
+
+
+def make_cluster(names, latency=0.02, **config):
+    backends = {name: FakeOllamaBackend(latency=latency) for name in names}
+    gateway = LLMGateway(
+        llm_service=FakeLLMService(),
+        config=LLMGatewayConfig(
+            backend_urls=[f"http://{name}" for name in names],
+            max_retries=0,
+            **config
+        ),
+        transport=fake_cluster_transport(backends)
+    )
+    return backends, gateway
+
+
+def request():
+    return LLMRequest(prompt="p", temperature=0.5, fallback="fallback")
+
+
+async def test_least_outstanding():
+    """Test concurrent requests spread evenly over backends."""
+    print("\n" + "=" * 80)
+    print("测试 1: 最少未完成请求优先")
+    print("=" * 80)
+
+    backends, gateway = make_cluster(["a", "b", "c"])
+    results = await asyncio.gather(*[gateway.generate(request()) for _ in range(6)])
+
+    assert all(result.ok for result in results)
+    assert [len(backend.requests) for backend in backends.values()] == [2, 2, 2]
+    assert {result.backend for result in results} == {"http://a", "http://b", "http://c"}
+    print(f"   ✅ 每个后端 {[len(b.requests) for b in backends.values()]} 个请求")
+
+
+async def test_health_probes():
+    """Test /api/tags probes eject and re-admit backends."""
+    print("\n" + "=" * 80)
+    print("测试 2: 健康探测剔除与恢复")
+    print("=" * 80)
+
+    backends, gateway = make_cluster(["a", "b"])
+    client = await gateway.get_client()
+
+    backends["b"].down = True
+    await gateway.backends.probe(client)
+    assert gateway.backends.healthy_count() == 1
+    await asyncio.gather(*[gateway.generate(request()) for _ in range(4)])
+    assert len(backends["a"].requests) == 4 and len(backends["b"].requests) == 0
+
+    backends["b"].down = False
+    await gateway.backends.probe(client)
+    assert gateway.backends.healthy_count() == 2
+    print(f"   ✅ {gateway.get_stats()['backends']['healthy']} 个健康后端")
+
+
+async def test_passive_ejection():
+    """Test repeated request failures eject a backend."""
+    backends, gateway = make_cluster(["a", "b"], latency=0.0)
+    backends["b"].failures.extend([500, 500, 500])
+    for _ in range(6):
+        await gateway.generate(request())
+    b = gateway.backends.backends[1]
+    assert not b.healthy and b.consecutive_failures == 3
+
+
+async def test_hedged_request():
+    """Test a slow request is hedged to a second backend after the p95 delay."""
+    print("\n" + "=" * 80)
+    print("测试 3: 对冲请求")
+    print("=" * 80)
+
+    backends, gateway = make_cluster(["slow", "fast"], latency=0.01, hedge_min_samples=5)
+    backends["slow"].latency = 0.5
+    pool = gateway.backends
+    slow, fast = pool.backends
+    for _ in range(5):
+        pool.record_success(fast, 0.01)
+
+    fast.outstanding += 1  # Make the slow backend the primary pick
+    task = asyncio.create_task(gateway.generate(request()))
+    await asyncio.sleep(0)
+    fast.outstanding -= 1
+    result = await task
+
+    assert result.ok and result.hedged
+    assert result.backend == "http://fast"
+    assert result.latency < 0.3
+    assert pool.get_stats()["hedges"] == 1 and pool.get_stats()["hedge_wins"] == 1
+    assert slow.outstanding == 0 and fast.outstanding == 0
+    print(f"   ✅ 对冲后 {result.latency * 1000:.0f} ms 返回 (慢后端 500 ms)")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("多后端负载均衡测试")
+    print("=" * 80)
+
+    await test_least_outstanding()
+    await test_health_probes()
+    await test_passive_ejection()
+    await test_hedged_request()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Test the LLM circuit breaker.
+
+Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.admission import LLMPriority
+from src_new.conversation.llm.circuit_breaker import CircuitBreaker, CircuitState
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.llm.models import LLMRequest
+
+
+def request():
+    return LLMRequest(prompt="p", temperature=0.5, fallback="I'm here to listen.")
+
+
+async def test_open_on_outage():
+    """Test the circuit opens after consecutive failures and answers instantly."""
+    print("\n" + "=" * 80)
+    print("测试 1: 连续失败后熔断，立即返回回退文本")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.02)
+    gateway = backend.gateway(LLMGatewayConfig(max_retries=0, circuit_consecutive_failures=3))
+    backend.down = True
+    for _ in range(3):
+        result = await gateway.generate(request())
+        assert not result.ok and not result.circuit_open
+    assert gateway.circuit_breaker.state == CircuitState.OPEN
+
+    requests_before = len(backend.requests)
+    result = await gateway.generate(request())
+    assert result.circuit_open and result.text == "I'm here to listen."
+    assert result.attempts == 0 and result.latency < 0.01
+    assert len(backend.requests) == requests_before
+
+    stats = gateway.get_stats()["circuit_breaker"]
+    assert stats["state"] == "open" and stats["rejected"] == 1 and stats["opened_count"] == 1
+    print(f"   ✅ 熔断状态: {stats['state']}, 拒绝 {stats['rejected']} 次")
+
+
+async def test_half_open_recovery():
+    """Test a half-open probe closes the circuit once the backend recovers."""
+    print("\n" + "=" * 80)
+    print("测试 2: 半开探测与恢复")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    gateway = backend.gateway(LLMGatewayConfig(
+        max_retries=0,
+        circuit_consecutive_failures=2,
+        circuit_open_duration=0.05
+    ))
+    backend.failures.extend([500, 500, 500])
+    await gateway.generate(request())
+    await gateway.generate(request())
+    assert gateway.circuit_breaker.state == CircuitState.OPEN
+
+    # Probe fails: open again
+    await asyncio.sleep(0.06)
+    result = await gateway.generate(request())
+    assert not result.ok and not result.circuit_open
+    assert gateway.circuit_breaker.state == CircuitState.OPEN
+    assert (await gateway.generate(request())).circuit_open
+
+    # Probe succeeds: closed
+    await asyncio.sleep(0.06)
+    result = await gateway.generate(request())
+    assert result.ok
+    assert gateway.circuit_breaker.state == CircuitState.CLOSED
+    assert (await gateway.generate(request())).ok
+    print(f"   ✅ 共熔断 {gateway.circuit_breaker.opened_count} 次后恢复")
+
+
+async def test_local_overload_not_counted():
+    """Test deadlines missed in a saturated queue don't open the circuit of a healthy backend."""
+    print("\n" + "=" * 80)
+    print("测试 3: 本地排队超时不计入熔断")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.1)
+    gateway = backend.gateway(LLMGatewayConfig(max_concurrent_generations=1))
+    results = await asyncio.gather(*(
+        gateway.generate(LLMRequest(
+            prompt="p", temperature=0.5, fallback="I'm here to listen.",
+            deadline=0.35, priority=LLMPriority.MEDIUM_RISK
+        ))
+        for _ in range(12)
+    ))
+
+    failed = [result for result in results if not result.ok]
+    assert failed and all("deadline" in result.error and not result.backend_error for result in failed)
+    stats = gateway.get_stats()["circuit_breaker"]
+    assert stats["state"] == "closed" and stats["opened_count"] == 0
+    assert (await gateway.generate(request())).ok
+    print(f"   ✅ {len(failed)}/12 个请求在队列中超时，熔断器保持关闭")
+
+
+def test_failure_rate_and_slow_calls():
+    """Test the failure-rate window, slow calls and half-open probe limit."""
+    now = [0.0]
+    breaker = CircuitBreaker(
+        failure_rate_threshold=0.5,
+        min_calls=4,
+        window_size=4,
+        consecutive_failures=10,
+        slow_call_threshold=1.0,
+        open_duration=5.0,
+        clock=lambda: now[0]
+    )
+    for latency in (0.1, 2.0, 0.1):
+        assert breaker.allow_request()
+        breaker.record_success(latency)
+    assert breaker.state == CircuitState.CLOSED and breaker.slow_calls == 1
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN  # 2 of 4 failed
+
+    assert not breaker.allow_request()
+    now[0] = 5.0
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # One probe at a time
+    breaker.record_ignored()
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitState.CLOSED and breaker.failure_rate() == 0.0
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("LLM 熔断器测试")
+    print("=" * 80)
+
+    await test_open_on_outage()
+    await test_half_open_recovery()
+    await test_local_overload_not_counted()
+    test_failure_rate_and_slow_calls()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
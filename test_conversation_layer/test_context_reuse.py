@@ -0,0 +1,154 @@
+"""
+Test Ollama context reuse across turns.
+
+Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.context_cache import ConversationContextCache, SessionContextKey
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.control.control_context import ControlContext
+
+
+def make_pipeline(backend, **config):
+    return ConversationPipeline(llm_gateway=backend.gateway(LLMGatewayConfig(**config)))
+
+
+async def test_only_new_turn_sent():
+    """Test follow-up turns send only the new turn plus the cached context."""
+    print("\n" + "=" * 80)
+    print("测试 1: 后续轮次只发送新消息")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    pipeline = make_pipeline(backend)
+    context = ControlContext(user_id="ctx_low", route="low", rigid_score=0.2)
+
+    for message in ["I'm stressed about exams.", "Mostly math.", "Thanks."]:
+        await pipeline.process_message("ctx_low", message, context)
+
+    first, second, third = backend.requests
+    assert "context" not in first and first["prompt"].startswith("System: ")
+    assert second["prompt"] == "User: Mostly math.\nAssistant:"
+    assert len(second["context"]) > 0
+    assert third["context"][:len(second["context"])] == second["context"]
+    assert all(request["keep_alive"] == "30m" for request in backend.requests)
+
+    stats = pipeline.llm_gateway.context_cache.get_stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    print(f"   ✅ prompt 长度: {[len(r['prompt']) for r in backend.requests]}, {stats}")
+
+    pipeline.clear_conversation("ctx_low")
+    await pipeline.process_message("ctx_low", "Hi again.", context)
+    assert "context" not in backend.requests[-1]
+    print("   ✅ 清空会话后重新发送完整提示词")
+
+
+async def test_invalidation():
+    """Test prompt changes, foreign turns and fallbacks drop the context."""
+    print("\n" + "=" * 80)
+    print("测试 2: 上下文失效条件")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    pipeline = make_pipeline(backend, max_retries=0)
+    low = ControlContext(user_id="ctx_inv", route="low", rigid_score=0.2)
+    medium = ControlContext(user_id="ctx_inv", route="medium", rigid_score=0.6)
+
+    await pipeline.process_message("ctx_inv", "Hello.", low)
+    # Different agent / system prompt: full prompt
+    await pipeline.process_message("ctx_inv", "I feel anxious.", medium)
+    assert "context" not in backend.requests[-1]
+
+    # Turn recorded by another path: full prompt
+    pipeline.session_service.append_turn("ctx_inv", "bot", "(moderator note)")
+    await pipeline.process_message("ctx_inv", "Okay.", low)
+    assert "context" not in backend.requests[-1]
+
+    # Failed call: the fallback is recorded, so the context is dropped
+    await pipeline.process_message("ctx_inv", "Still there?", low)
+    assert "context" in backend.requests[-1]
+    backend.failures.append(500)
+    await pipeline.process_message("ctx_inv", "Hello?", low)
+    await pipeline.process_message("ctx_inv", "Hello??", low)
+    assert "context" not in backend.requests[-1]
+    print("   ✅ 切换提示词、外部轮次、失败回退均使上下文失效")
+
+
+async def test_long_session_keeps_hitting():
+    """Test the cache keeps hitting past the session ring capacity and across summaries."""
+    print("\n" + "=" * 80)
+    print("测试 3: 长会话（超过 20 轮、多次摘要）持续命中")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    pipeline = make_pipeline(backend)
+    context = ControlContext(user_id="ctx_long", route="low", rigid_score=0.2)
+    hits = []
+
+    for i in range(30):
+        if i == 12:
+            # Summaries stall (e.g. shed under load): the history sent grows to the ring capacity
+            pipeline.summarizer.every_turns = 10_000
+        await pipeline.process_message("ctx_long", f"Message number {i}.", context)
+        await pipeline.summarizer.flush()
+        chat = [r for r in backend.requests if "running summary" not in r["prompt"]]
+        hits.append("context" in chat[-1])
+
+    updates = pipeline.summarizer.get_stats()["updates"]
+    assert pipeline.session_service.turn_seq("ctx_long") == 60
+    assert len(pipeline.session_service.get_context("ctx_long")) == 20
+    assert updates >= 2
+    # Only the first turn and the turn after each new summary (new system block) miss
+    assert hits.count(False) == 1 + updates
+    assert all(hits[13:]), "Context reuse stopped once the session ring was full"
+    print(f"   ✅ 60 轮、{updates} 次摘要后仍命中: {''.join('H' if h else '.' for h in hits)}")
+
+
+def test_cache_bounds():
+    """Test token and session bounds."""
+    cache = ConversationContextCache(max_sessions=2, max_tokens=10)
+    key = SessionContextKey("u1", "p", 0)
+    cache.store(key, list(range(11)), "reply")
+    assert len(cache) == 0 and cache.overflows == 1
+
+    for user in ["u1", "u2", "u3"]:
+        cache.store(SessionContextKey(user, "p", 0), [1, 2], "reply")
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.get(SessionContextKey("u3", "p", 2, "reply")) == [1, 2]
+    assert cache.get(SessionContextKey("u1", "p", 2, "reply")) is None
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("上下文复用测试")
+    print("=" * 80)
+
+    await test_only_new_turn_sent()
+    await test_invalidation()
+    await test_long_session_keeps_hitting()
+    test_cache_bounds()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
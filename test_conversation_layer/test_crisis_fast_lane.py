@@ -0,0 +1,275 @@
+"""
+Test the crisis fast lane in ConversationPipeline.
+
+High risk turns must be answered with the fixed safety script before any
+queue: no mailbox wait, no LLM admission, no guardrails round trip, and
+bookkeeping after the reply. Includes the latency SLO: under full load,
+every crisis reply takes less than 10 ms.
+Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.control_context import ControlContext
+from src_new.control.route_event_log import RouteEventLog, get_route_event_log
+from src_new.conversation.agents.high_risk_agent import FIXED_SAFETY_SCRIPT
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.pipeline import ConversationPipeline, PipelineConfig
+from src_new.conversation.streaming import FIXED_SAFETY_REPLACE_EVENT, format_sse
+
+SLO_MS = 10.0
+
+
+class SlowGuardrails:
+    """Stands in for SafetyGuardrailsService.check_user_input_safety."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.checked = []
+
+    async def check_user_input_safety(self, user_message, context=None, deadline=None):
+        self.checked.append(user_message)
+        await asyncio.sleep(self.delay)
+        return {"safe": True, "checked": True}
+
+
+def make_pipeline(backend: FakeOllamaBackend, guardrails=None, concurrency: int = 8) -> ConversationPipeline:
+    return ConversationPipeline(
+        llm_gateway=backend.gateway(LLMGatewayConfig(max_concurrent_generations=concurrency)),
+        guardrails=guardrails,
+        config=PipelineConfig(max_queued_turns_per_user=2)
+    )
+
+
+async def wait_for_bookkeeping(pipeline: ConversationPipeline, timeout: float = 5.0) -> None:
+    """Wait until deferred crisis bookkeeping has run."""
+    started = time.perf_counter()
+    while pipeline.get_stats()["fast_lane"]["pending_bookkeeping"]:
+        assert time.perf_counter() - started < timeout, "Crisis bookkeeping did not finish"
+        await asyncio.sleep(0.01)
+
+
+async def test_fast_lane_triggers():
+    """Test which turns take the fast lane and that they are recorded afterwards."""
+    print("\n" + "=" * 80)
+    print("测试 1: 快速通道触发条件")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    guardrails = SlowGuardrails(delay=0.05)
+    pipeline = make_pipeline(backend, guardrails)
+    cases = [
+        ("by_route", ControlContext(user_id="by_route", route="high", rigid_score=1.0), "hello"),
+        ("by_score", ControlContext(user_id="by_score", route="medium", rigid_score=0.5, psyguard_score=0.97), "hi"),
+        ("by_keyword", ControlContext(user_id="by_keyword", route="low", rigid_score=0.2), "I want to die"),
+    ]
+
+    for user_id, context, message in cases:
+        result = await pipeline.process_message(user_id, message, context)
+        assert result["fast_lane"] is True
+        assert result["agent_result"]["response"] == FIXED_SAFETY_SCRIPT
+        assert result["agent_result"]["fixed_script"] is True
+        assert context.route == "high", "The fast lane upgrades the route (one-way)"
+        # Reply returned before the turn is recorded
+        assert pipeline.get_conversation_history(user_id) == []
+    assert cases[2][1].route_reason == "crisis_keywords"
+    assert backend.requests == [] and guardrails.checked == [], "No LLM or guardrails call for crisis turns"
+
+    regular = await pipeline.process_message(
+        "regular", "I had a long day", ControlContext(user_id="regular", route="low", rigid_score=0.2)
+    )
+    assert "fast_lane" not in regular and len(backend.requests) == 1
+
+    await wait_for_bookkeeping(pipeline)
+    for user_id, _, message in cases:
+        assert [turn.text for turn in pipeline.get_conversation_history(user_id)] == [message, FIXED_SAFETY_SCRIPT]
+    assert pipeline.get_stats()["fast_lane"]["turns"] == 3
+    await pipeline.shutdown()
+    print("   ✅ 高风险路由、PsyGUARD 直接高风险与危机关键词均走快速通道，回复后再记录")
+
+
+async def test_crisis_skips_user_backlog():
+    """Test a crisis message is answered at once even when the user's mailbox is full."""
+    print("\n" + "=" * 80)
+    print("测试 2: 危机消息不排在用户积压轮次之后")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.2)
+    pipeline = make_pipeline(backend)
+    context = ControlContext(user_id="backlogged", route="low", rigid_score=0.2)
+
+    backlog = [asyncio.create_task(pipeline.process_message("backlogged", "message 0", context))]
+    await asyncio.sleep(0.01)  # First turn running, the next two fill the mailbox
+    backlog += [
+        asyncio.create_task(pipeline.process_message("backlogged", f"message {i}", context))
+        for i in (1, 2)
+    ]
+    await asyncio.sleep(0)
+    overloaded = await pipeline.process_message("backlogged", "one more", context)
+    assert overloaded.get("overloaded"), "The mailbox should be full"
+
+    started = time.perf_counter()
+    result = await pipeline.process_message("backlogged", "I want to kill myself", context)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    assert result["fast_lane"] and not result.get("overloaded")
+    assert elapsed_ms < SLO_MS, f"Crisis reply took {elapsed_ms:.1f} ms"
+
+    await asyncio.gather(*backlog)
+    await wait_for_bookkeeping(pipeline)
+    user_turns = [turn.text for turn in pipeline.get_conversation_history("backlogged") if turn.role == "user"]
+    assert user_turns == ["message 0", "message 1", "message 2", "I want to kill myself"]
+    await pipeline.shutdown()
+    print(f"   ✅ 积压 3 轮时危机回复用时 {elapsed_ms:.2f} ms，记录排在先前轮次之后")
+
+
+async def test_latency_slo_under_load():
+    """Test crisis replies stay under 10 ms while the LLM and guardrails are saturated."""
+    print("\n" + "=" * 80)
+    print("测试 3: 满负载下的延迟 SLO（< 10 ms）")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.3)
+    pipeline = make_pipeline(backend, SlowGuardrails(delay=0.2), concurrency=2)
+
+    # 300 regular users saturate admission (2 generations at a time) and guardrails
+    load = [
+        asyncio.create_task(pipeline.process_message(
+            f"load_{i}", "I'm stressed about school",
+            ControlContext(user_id=f"load_{i}", route="low" if i % 2 else "medium", rigid_score=0.3)
+        ))
+        for i in range(300)
+    ]
+    await asyncio.sleep(0.35)
+
+    admission = pipeline.llm_gateway.get_stats()["admission"]
+    assert admission["in_flight"] == 2 and admission["queue_depth"] > 0, "LLM admission should be saturated"
+
+    latencies = []
+    for i in range(100):
+        context = ControlContext(user_id=f"crisis_{i}", route="low", rigid_score=0.2)
+        message = "I don't want to be alive" if i % 2 else "thinking about suicide"
+        started = time.perf_counter()
+        result = await pipeline.process_message(f"crisis_{i}", message, context)
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert result["agent_result"]["response"] == FIXED_SAFETY_SCRIPT
+        await asyncio.sleep(0.001)  # Let the load make progress between crisis turns
+
+    latencies.sort()
+    p50, p99, worst = latencies[50], latencies[98], latencies[-1]
+    assert worst < SLO_MS, f"Slowest crisis reply {worst:.2f} ms"
+    print(f"   LLM 准入: {admission['in_flight']} 个生成中，{admission['queue_depth']} 个排队")
+
+    for task in load:
+        task.cancel()
+    await asyncio.gather(*load, return_exceptions=True)
+    await pipeline.shutdown()
+    print(f"   ✅ 100 次危机回复 p50 {p50:.3f} ms / p99 {p99:.3f} ms / 最慢 {worst:.3f} ms")
+
+
+async def test_prebuilt_stream_frame():
+    """Test the streamed crisis reply uses the prebuilt replace frame."""
+    print("\n" + "=" * 80)
+    print("测试 4: 预编码的流式回复")
+    print("=" * 80)
+
+    pipeline = make_pipeline(FakeOllamaBackend())
+    context = ControlContext(user_id="stream_crisis", route="high", rigid_score=1.0)
+    events = [event async for event in pipeline.process_message_stream("stream_crisis", "help", context)]
+
+    assert [event["type"] for event in events] == ["replace", "done"]
+    assert events[0] is FIXED_SAFETY_REPLACE_EVENT
+    assert format_sse(events[0]) == format_sse({"type": "replace", "data": {"text": FIXED_SAFETY_SCRIPT}})
+    await pipeline.shutdown()
+    print("   ✅ 危机回复的 SSE 帧只编码一次")
+
+
+async def test_route_event_log_lifecycle():
+    """Test startup() installs the route event log and the fast lane's route change is recorded."""
+    print("\n" + "=" * 80)
+    print("测试 5: startup() 启动路由事件日志")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = FakeOllamaBackend()
+        pipeline = ConversationPipeline(
+            llm_gateway=backend.gateway(LLMGatewayConfig()),
+            config=PipelineConfig(route_event_log_dir=tmp)
+        )
+        await pipeline.startup()
+        log = get_route_event_log()
+        assert log is not None and log._writer_task is not None
+
+        context = ControlContext(user_id="logged", route="low", rigid_score=0.2)
+        await pipeline.process_message("logged", "I want to die", context)
+        await pipeline.shutdown()
+        assert get_route_event_log() is None
+
+        events = list(RouteEventLog(tmp).replay())
+        assert [(e.user_id, e.from_route, e.to_route, e.source) for e in events] == [
+            ("logged", "low", "high", "crisis_fast_lane")
+        ]
+    print("   ✅ 路由变化由后台写入器落盘，shutdown() 后日志已关闭")
+
+
+async def test_crisis_turn_before_handoff():
+    """Test a crisis turn answered right before release_users() is handed over."""
+    print("\n" + "=" * 80)
+    print("测试 6: 危机回复后立即迁移用户")
+    print("=" * 80)
+
+    old_worker = make_pipeline(FakeOllamaBackend())
+    new_worker = make_pipeline(FakeOllamaBackend())
+    context = ControlContext(user_id="moving", route="low", rigid_score=0.2)
+
+    result = await old_worker.process_message("moving", "I want to die", context)
+    assert result["fast_lane"] is True
+    assert "moving" in old_worker.held_users(), "Pending bookkeeping counts as held"
+
+    handoffs = await old_worker.release_users(["moving"])
+    assert [turn.text for turn in handoffs[0].turns] == ["I want to die", FIXED_SAFETY_SCRIPT]
+    assert old_worker.held_users() == set()
+
+    await new_worker.adopt_users(handoffs)
+    assert [turn.text for turn in new_worker.get_conversation_history("moving")] == [
+        "I want to die", FIXED_SAFETY_SCRIPT
+    ]
+    await old_worker.shutdown()
+    await new_worker.shutdown()
+    print("   ✅ release_users() 等待危机记录完成，新 worker 看到完整对话")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("危机快速通道测试")
+    print("=" * 80)
+
+    await test_fast_lane_triggers()
+    await test_crisis_skips_user_backlog()
+    await test_latency_slo_under_load()
+    await test_prebuilt_stream_frame()
+    await test_route_event_log_lifecycle()
+    await test_crisis_turn_before_handoff()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
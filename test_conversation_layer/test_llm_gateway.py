@@ -0,0 +1,256 @@
+"""
+Test LLMGateway functionality.
+
+Tests the shared pooled HTTP client used by all agents. Uses
+httpx.MockTransport as a local Ollama stand-in (no Ollama needed).
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import httpx
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.gateway import LLMGateway, LLMGatewayConfig
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.models import LLMRequest
+from src_new.conversation.llm.prompt import build_prompt, build_prompt_window
+from src_new.conversation.llm.tokens import count_tokens
+from src_new.shared.models import ConversationTurn
+from src_new.conversation.agents.low_risk_agent import LowRiskAgent
+from src_new.conversation.agents.medium_risk_agent import MediumRiskAgent
+
+
+class FakeOllamaService:
+    """Minimal stand-in for OllamaService (base_url / model_name / loading)."""
+
+    def __init__(self):
+        self.base_url = "http://ollama.test"
+        self.model_name = "test-model"
+        self.is_loaded = False
+        self.load_calls = 0
+
+    async def load_model(self):
+        self.load_calls += 1
+        self.is_loaded = True
+
+
+def make_gateway(requests):
+    """Gateway whose transport records requests and answers like Ollama."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        return httpx.Response(200, json={"response": f"reply #{len(requests)}", "done": True})
+
+    return LLMGateway(
+        llm_service=FakeOllamaService(),
+        config=LLMGatewayConfig(max_connections=4, max_keepalive_connections=2),
+        transport=httpx.MockTransport(handler)
+    )
+
+
+async def test_shared_client_across_agents():
+    """Test all agents reuse one pooled client."""
+    print("\n" + "=" * 80)
+    print("测试 1: 所有 Agent 共享同一连接池客户端")
+    print("=" * 80)
+
+    requests = []
+    gateway = make_gateway(requests)
+    await gateway.startup()
+    client = await gateway.get_client()
+
+    low_agent = LowRiskAgent(gateway=gateway)
+    medium_agent = MediumRiskAgent(gateway=gateway)
+
+    low_result = await low_agent.generate_response("I'm a bit stressed.")
+    medium_result = await medium_agent.generate_response("u1", "I feel anxious.")
+    await low_agent.generate_response("Still stressed.")
+
+    assert await gateway.get_client() is client
+    assert len(requests) == 3
+    assert requests[0]["model"] == "test-model"
+    assert low_result["response"] == "reply #1"
+    assert medium_result["response"] == "reply #2"
+    assert gateway.llm_service.load_calls == 1
+
+    print(f"   ✅ 3 次调用共用 1 个客户端, 响应: {low_result['response']!r}, {medium_result['response']!r}")
+
+    await gateway.shutdown()
+    assert not gateway.is_started()
+    assert client.is_closed
+    print("   ✅ shutdown 后连接池已关闭")
+
+
+async def test_client_recreated_after_shutdown():
+    """Test the client is lazily recreated after shutdown."""
+    print("\n" + "=" * 80)
+    print("测试 2: shutdown 后按需重建客户端")
+    print("=" * 80)
+
+    gateway = make_gateway([])
+    first = await gateway.get_client()
+    await gateway.shutdown()
+    second = await gateway.get_client()
+
+    assert first is not second
+    assert not second.is_closed
+    await gateway.shutdown()
+    print("   ✅ 客户端已重建")
+
+
+def test_pool_config():
+    """Test pool limits and timeouts are built from config."""
+    print("\n" + "=" * 80)
+    print("测试 3: 连接池配置")
+    print("=" * 80)
+
+    config = LLMGatewayConfig(max_connections=8, max_keepalive_connections=4, read_timeout=12.0)
+    limits = config.limits()
+    timeout = config.timeout()
+
+    assert limits.max_connections == 8
+    assert limits.max_keepalive_connections == 4
+    assert timeout.read == 12.0
+    print(f"   ✅ {limits}, {timeout}")
+
+
+FAST_RETRY = LLMGatewayConfig(max_retries=2, backoff_base=0.001, backoff_max=0.002)
+
+
+async def test_typed_result_timings():
+    """Test results carry Ollama's timing fields."""
+    print("\n" + "=" * 80)
+    print("测试 4: 类型化结果与计时字段")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(responder=lambda payload: "Try a short walk.")
+    gateway = backend.gateway()
+    result = await gateway.generate(LLMRequest(prompt="User: hi\nAssistant:", temperature=0.5))
+
+    assert result.ok and result.text == "Try a short walk."
+    assert result.attempts == 1
+    assert result.eval_count == 4
+    assert result.eval_duration == 80_000_000
+    assert result.prompt_eval_duration is not None
+    assert result.tokens_per_second == 50.0
+    assert backend.requests[0]["options"]["temperature"] == 0.5
+    assert backend.requests[0]["options"]["num_ctx"] == 2048
+    await gateway.shutdown()
+    print(f"   ✅ {result.to_metadata()}")
+
+
+async def test_retries_with_backoff():
+    """Test transient failures are retried and permanent ones are not."""
+    print("\n" + "=" * 80)
+    print("测试 5: 重试（指数退避 + 抖动）")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(failures=[503, httpx.ConnectError("refused")])
+    gateway = backend.gateway(FAST_RETRY)
+    result = await gateway.generate(LLMRequest(prompt="p", temperature=0.5, fallback="fallback"))
+    assert result.ok and result.attempts == 3
+    assert result.text == "reply #3"
+
+    backend = FakeOllamaBackend(failures=[500, 500, 500, 500])
+    gateway = backend.gateway(FAST_RETRY)
+    result = await gateway.generate(LLMRequest(prompt="p", temperature=0.5, fallback="fallback"))
+    assert not result.ok and result.text == "fallback"
+    assert result.attempts == 3 and len(backend.requests) == 3
+
+    backend = FakeOllamaBackend(failures=[400])
+    gateway = backend.gateway(FAST_RETRY)
+    result = await gateway.generate(LLMRequest(prompt="p", temperature=0.5, fallback="fallback"))
+    assert not result.ok and result.attempts == 1
+    assert "400" in result.error
+    print("   ✅ 503/连接错误重试成功, 500 重试用尽后回退, 400 不重试")
+
+
+async def test_deadline():
+    """Test the per-call deadline bounds the whole call."""
+    print("\n" + "=" * 80)
+    print("测试 6: 单次调用截止时间")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=0.5)
+    gateway = backend.gateway(FAST_RETRY)
+    result = await gateway.generate(
+        LLMRequest(prompt="p", temperature=0.5, fallback="fallback", deadline=0.05)
+    )
+    assert not result.ok and result.text == "fallback"
+    assert "deadline" in result.error
+    assert result.latency < 0.3
+    print(f"   ✅ {result.latency * 1000:.0f} ms 内返回回退文本")
+
+
+def test_prompt_assembly():
+    """Test prompt flattening, including session "bot" turns."""
+    history = [
+        ConversationTurn(role="user", text="old"),
+        ConversationTurn(role="user", text="I feel low"),
+        ConversationTurn(role="bot", text="I'm sorry to hear that."),
+    ]
+    prompt = build_prompt(["Be kind.", "Concern: time."], "Thanks", history, history_turns=2)
+    assert prompt == (
+        "System: Be kind.\n"
+        "System: Concern: time.\n"
+        "User: I feel low\n"
+        "Assistant: I'm sorry to hear that.\n"
+        "User: Thanks\n"
+        "Assistant:"
+    )
+
+
+def test_token_budgeted_history():
+    """Test history is packed newest-first into the token budget."""
+    short = [ConversationTurn(role="user", text=f"turn {i}") for i in range(20)]
+    window = build_prompt_window(["Be kind."], "Thanks", short, history_budget=10_000)
+    assert window.history_turns == 20 and window.dropped_turns == 0  # More than 6 short turns fit
+
+    long_turn = ConversationTurn(role="bot", text="word " * 400)
+    history = short[:5] + [long_turn] + short[5:8]
+    window = build_prompt_window(["Be kind."], "Thanks", history, history_budget=200)
+    assert window.history_turns == 3 and window.dropped_turns == 6  # Stops at the long turn
+    assert "User: turn 5\nUser: turn 6\nUser: turn 7\nUser: Thanks" in window.prompt
+    assert window.history_tokens <= window.history_budget == 200
+
+    # Reserved room for the reply and system prompt caps the budget below the route's
+    window = build_prompt_window(["x " * 1600], "Thanks", history, history_budget=1024, max_tokens=512)
+    assert window.history_budget == 0 and window.history_turns == 0
+    assert count_tokens("hello world") == 2 and count_tokens("你好") == 2
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("LLMGateway 测试")
+    print("=" * 80)
+
+    await test_shared_client_across_agents()
+    await test_client_recreated_after_shutdown()
+    test_pool_config()
+    await test_typed_result_timings()
+    await test_retries_with_backoff()
+    await test_deadline()
+    test_prompt_assembly()
+    test_token_budgeted_history()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -20,8 +20,12 @@ if sys.platform == 'win32':
 
 from src_new.conversation.agents.medium_risk_agent import (
     MediumRiskAgent,
-    MediumRiskState
+    MediumRiskState,
+    MediumRiskAgentState,
+    MediumRiskAction,
+    plan_transition
 )
+from src_new.conversation.llm.fake import FakeOllamaBackend
 from src_new.shared.models import ConversationTurn
 
 
@@ -227,6 +231,65 @@ async def test_reset_state():
     print(f"   ✅ 状态重置测试完成")
 
 
+def test_transition_planner():
+    """Test the pure transition planner (no LLM)."""
+    print("\n" + "=" * 80)
+    print("测试 7: 状态转移规划（无需 LLM）")
+    print("=" * 80)
+    
+    state = MediumRiskAgentState()
+    plan = plan_transition(state, "I'm too busy for a group.")
+    assert plan.action == MediumRiskAction.SUGGEST_PEER_GROUP
+    assert plan.next_state == MediumRiskState.HANDLING_RESISTANCE
+    assert (plan.resistance_count, plan.resistance_type) == (1, "time")
+    assert state.current_state == MediumRiskState.INITIAL_SUGGESTION  # not modified
+    
+    assert plan_transition(state, "Sure, sounds good.").next_state == MediumRiskState.ACCEPTED
+    assert plan_transition(state, "I feel low.").next_state == MediumRiskState.DETECTING_RESISTANCE
+    
+    handling = MediumRiskAgentState(
+        current_state=MediumRiskState.HANDLING_RESISTANCE,
+        resistance_count=2,
+        detected_resistance_type="time"
+    )
+    plan = plan_transition(handling, "People will judge me.")
+    assert plan.action == MediumRiskAction.ADDRESS_RESISTANCE
+    assert (plan.resistance_count, plan.resistance_type) == (3, "stigma")
+    
+    plan = plan_transition(handling, "Okay, I'll try it.")
+    assert plan.next_state == MediumRiskState.ACCEPTED and plan.peer_group_accepted
+    
+    handling.resistance_count = handling.max_persuasion_turns
+    plan = plan_transition(handling, "No.")
+    assert plan.action == MediumRiskAction.PROVIDE_RESOURCES
+    assert plan.next_state == MediumRiskState.REJECTED
+    
+    accepted = MediumRiskAgentState(current_state=MediumRiskState.ACCEPTED)
+    assert plan_transition(accepted, "What now?").action == MediumRiskAction.CONFIRM_ACCEPTANCE
+    print("   ✅ 规划结果正确")
+
+
+async def test_single_generation_per_turn():
+    """Test every turn, including the rejecting one, issues exactly one LLM call."""
+    print("\n" + "=" * 80)
+    print("测试 8: 每轮只生成一次")
+    print("=" * 80)
+    
+    backend = FakeOllamaBackend()
+    agent = MediumRiskAgent(gateway=backend.gateway())
+    user_id = "test_user_single"
+    
+    await agent.generate_response(user_id, "I don't have time for that.")
+    for i in range(5):
+        result = await agent.generate_response(user_id, f"I'm still too busy. ({i})")
+        assert len(backend.requests) == i + 2
+    
+    assert result["state"] == "rejected"
+    assert result["resources_provided"] is True
+    assert "addressing_resistance" not in result
+    print(f"   ✅ {len(backend.requests)} 轮共 {len(backend.requests)} 次生成, 最终状态: {result['state']}")
+
+
 async def main():
     """Run all tests."""
     print("=" * 80)
@@ -243,6 +306,8 @@ async def main():
     await test_acceptance()
     await test_max_persuasion_turns()
     await test_reset_state()
+    test_transition_planner()
+    await test_single_generation_per_turn()
     
     print("\n" + "=" * 80)
     print("测试完成")
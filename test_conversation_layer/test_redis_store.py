@@ -0,0 +1,193 @@
+"""
+Test the Redis session and agent-state stores.
+
+Runs the real redis client against FakeRedisServer (in-process, no Redis
+needed): packed encoding, pipelined batch writes and multi-key reads,
+and resuming sessions and agent state from a fresh process.
+"""
+
+import sys
+import json
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.agent_state_store import AgentStateStore
+from src_new.conversation.agents.medium_risk_agent import MediumRiskAgentState, MediumRiskState
+from src_new.conversation.redis_fake import FakeRedisServer
+from src_new.conversation.redis_store import (
+    RedisStateBackend,
+    RedisTranscriptArchive,
+    decode_turn,
+    encode_turn,
+)
+from src_new.conversation.session_service import SessionService
+from src_new.shared.models import ConversationTurn
+from src_new.shared.packing import pack, unpack
+
+
+def test_packed_encoding():
+    """Test packed values round-trip and are smaller than JSON."""
+    print("\n" + "=" * 80)
+    print("测试 1: 紧凑编码")
+    print("=" * 80)
+
+    turn = ConversationTurn(role="user", text="I feel anxious about exams 😟", timestamp="2025-11-07T10:00:00.123456")
+    assert decode_turn(encode_turn(turn)) == turn
+
+    state = MediumRiskAgentState(current_state=MediumRiskState.HANDLING_RESISTANCE, resistance_count=2)
+    state.conversation_turns.append({"user_message": "no", "bot_response": "That's okay.", "state": "x"})
+    data = state.to_dict()
+    assert unpack(pack(data)) == data
+    assert unpack(pack([None, True, -5, 2.5, "x" * 300, b"\x00"])) == [None, True, -5, 2.5, "x" * 300, b"\x00"]
+
+    turn_json = json.dumps({"role": turn.role, "text": turn.text, "timestamp": turn.timestamp}).encode()
+    assert len(encode_turn(turn)) < len(turn_json)
+    print(f"   ✅ 轮次 {len(encode_turn(turn))} 字节（JSON {len(turn_json)} 字节）")
+
+
+def test_transcript_archive_pipelining():
+    """Test batched appends and multi-session reads take one round trip each."""
+    print("\n" + "=" * 80)
+    print("测试 2: 流水线批量写入与多键读取")
+    print("=" * 80)
+
+    with FakeRedisServer() as server:
+        archive = RedisTranscriptArchive(server.client(), ttl=3600)
+        archive.client.ping()
+
+        turns = [
+            (f"user_{i % 3}", ConversationTurn(role="user", text=f"message {i}", timestamp=str(i)))
+            for i in range(9)
+        ]
+        before = server.round_trips
+        archive.append_batch(turns)
+        assert server.round_trips - before == 1, "Batch append should be one round trip"
+
+        before = server.round_trips
+        recent = archive.read_recent_many(["user_0", "user_1", "user_2", "nobody"], n=2)
+        assert server.round_trips - before == 1, "Multi-session read should be one round trip"
+        assert [turn.text for turn in recent["user_0"]] == ["message 3", "message 6"]
+        assert recent["nobody"] == []
+        assert [turn.text for turn in archive.read("user_1")] == ["message 1", "message 4", "message 7"]
+
+        archive.delete("user_1")
+        assert archive.read("user_1") == []
+    print("   ✅ 9 轮写入 3 个会话与 4 个会话读取各 1 次往返")
+
+
+def test_pipelined_reads_faster():
+    """Test pipelined reads beat one request per session under network latency."""
+    print("\n" + "=" * 80)
+    print("测试 3: 网络延迟下的流水线读取")
+    print("=" * 80)
+
+    with FakeRedisServer() as server:
+        archive = RedisTranscriptArchive(server.client())
+        users = [f"user_{i}" for i in range(20)]
+        archive.append_batch([(user_id, ConversationTurn(role="user", text="hi")) for user_id in users])
+        server.latency = 0.005
+
+        started = time.perf_counter()
+        for user_id in users:
+            archive.read_recent_many([user_id], n=6)
+        sequential = time.perf_counter() - started
+
+        started = time.perf_counter()
+        recent = archive.read_recent_many(users, n=6)
+        pipelined = time.perf_counter() - started
+
+        assert all(len(turns) == 1 for turns in recent.values())
+        assert pipelined * 5 < sequential, f"pipelined {pipelined:.3f}s vs sequential {sequential:.3f}s"
+    print(f"   ✅ 20 个会话: 逐个 {sequential * 1000:.0f} ms，流水线 {pipelined * 1000:.0f} ms")
+
+
+async def test_agent_state_survives_restart():
+    """Test agent state written after a turn is restored by a fresh store."""
+    print("\n" + "=" * 80)
+    print("测试 4: Agent 状态跨进程恢复")
+    print("=" * 80)
+
+    with FakeRedisServer() as server:
+        backend = RedisStateBackend(server.client())
+
+        def new_store():
+            return AgentStateStore(
+                MediumRiskAgentState,
+                spill=backend,
+                dump=MediumRiskAgentState.to_dict,
+                load=MediumRiskAgentState.from_dict
+            )
+
+        worker_a = new_store()
+        for i in range(3):
+            state = worker_a.get(f"user_{i}")
+            state.current_state = MediumRiskState.HANDLING_RESISTANCE
+            state.resistance_count = i
+            assert await worker_a.persist(f"user_{i}")
+
+        # Another worker (or a restart) picks the users up
+        worker_b = new_store()
+        commands_before = len(server.commands)
+        assert await worker_b.prefetch(["user_0", "user_1", "user_2", "new_user"]) == 3
+        assert [name for name, *_ in server.commands[commands_before:]] == ["MGET"]
+        assert worker_b.get("user_2").resistance_count == 2
+        assert worker_b.get("user_2").current_state == MediumRiskState.HANDLING_RESISTANCE
+        assert worker_b.get("new_user").resistance_count == 0
+
+        worker_b.discard("user_0")
+        assert backend.load("user_0") is None
+    print("   ✅ 3 个用户状态经一次 MGET 在新进程中恢复")
+
+
+async def test_session_service_on_redis():
+    """Test write-behind sessions on Redis are resumed after a restart."""
+    print("\n" + "=" * 80)
+    print("测试 5: 会话跨进程恢复")
+    print("=" * 80)
+
+    with FakeRedisServer() as server:
+        service = SessionService(capacity=4, archive=RedisTranscriptArchive(server.client()), flush_interval=0.05)
+        for i in range(6):
+            service.append_turn("resume_user", "user" if i % 2 == 0 else "bot", f"Turn {i}")
+        await service.close()
+        assert service.get_stats()["flushes"] == 1
+
+        restarted = SessionService(capacity=4, archive=RedisTranscriptArchive(server.client()))
+        assert restarted.get_context("resume_user") == []
+        assert await restarted.hydrate(["resume_user", "unknown_user"]) == 1
+        assert [turn.text for turn in restarted.get_context("resume_user")] == [f"Turn {i}" for i in range(2, 6)]
+        assert len(await restarted.get_transcript("resume_user")) == 6
+        await restarted.close()
+    print("   ✅ 重启后从 Redis 恢复最近 4 轮，完整记录 6 轮")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("Redis 存储测试")
+    print("=" * 80)
+
+    test_packed_encoding()
+    test_transcript_archive_pipelining()
+    test_pipelined_reads_faster()
+    await test_agent_state_survives_restart()
+    await test_session_service_on_redis()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
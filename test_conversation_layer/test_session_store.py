@@ -0,0 +1,208 @@
+"""
+Test the ring-buffer session store.
+
+Tests SessionService recent-turn access, the per-session memory bound, the
+full-transcript archive and write-behind archive flushing (no Ollama needed).
+"""
+
+import sys
+import asyncio
+import tempfile
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.session_service import SessionService
+from src_new.conversation.session_store import JsonlTranscriptArchive, TurnRing
+from src_new.shared.models import ConversationTurn
+
+
+class RecordingArchive:
+    """In-memory TranscriptArchive that records batch sizes and can fail."""
+
+    def __init__(self):
+        self.turns = {}
+        self.batches = []
+        self.down = False
+
+    def append(self, user_id, turn):
+        self.append_batch([(user_id, turn)])
+
+    def append_batch(self, turns):
+        if self.down:
+            raise IOError("archive down")
+        self.batches.append(len(turns))
+        for user_id, turn in turns:
+            self.turns.setdefault(user_id, []).append(turn)
+
+    def read(self, user_id):
+        return list(self.turns.get(user_id, []))
+
+    def read_recent_many(self, user_ids, n):
+        return {user_id: self.read(user_id)[-n:] for user_id in user_ids}
+
+    def delete(self, user_id):
+        self.turns.pop(user_id, None)
+
+
+def test_ring_wraps_in_order():
+    """Test the ring keeps the newest turns in order after wrapping."""
+    print("\n" + "=" * 80)
+    print("测试 1: 环形缓冲回绕")
+    print("=" * 80)
+
+    ring = TurnRing(4)
+    dropped = [ring.append(ConversationTurn(role="user", text=f"m{i}")) for i in range(7)]
+
+    assert len(ring) == 4
+    assert [turn.text for turn in ring] == ["m3", "m4", "m5", "m6"]
+    assert [turn.text for turn in ring.recent(3)] == ["m4", "m5", "m6"]
+    assert [turn.text for turn in ring.recent(10)] == ["m3", "m4", "m5", "m6"]
+    assert ring.recent(0) == []
+    assert [turn.text for turn in dropped if turn] == ["m0", "m1", "m2"]
+    print(f"   ✅ 写入 7 轮，保留: {[turn.text for turn in ring]}")
+
+
+def test_session_bounded_and_shared_records():
+    """Test sessions stay within capacity and reads return the stored records."""
+    print("\n" + "=" * 80)
+    print("测试 2: 会话内存有界")
+    print("=" * 80)
+
+    service = SessionService(capacity=6)
+    for i in range(50):
+        service.append_turn("bounded", "user" if i % 2 == 0 else "bot", f"Message {i}")
+
+    context = service.get_context("bounded")
+    assert len(context) == 6
+    assert context[0].text == "Message 44" and context[-1].text == "Message 49"
+    recent = service.get_recent_turns("bounded", n=3)
+    assert [turn.text for turn in recent] == ["Message 47", "Message 48", "Message 49"]
+    assert recent[-1] is context[-1], "Reads should not rebuild turn records"
+    assert service.get_recent_turns("nobody") == []
+
+    stats = service.get_stats()
+    assert stats["turns_in_memory"] == 6 and stats["dropped_turns"] == 44
+    service.clear_session("bounded")
+    assert service.get_context("bounded") == []
+    print(f"   ✅ 写入 50 轮，内存中 {stats['turns_in_memory']} 轮")
+
+
+async def test_transcript_archive():
+    """Test the archive keeps every turn beyond the ring's capacity."""
+    print("\n" + "=" * 80)
+    print("测试 3: 完整记录归档")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = SessionService(capacity=4, archive=JsonlTranscriptArchive(directory))
+        for i in range(10):
+            service.append_turn("user/1", "user", f"Turn {i}")
+
+        transcript = await service.get_transcript("user/1")
+        assert [turn.text for turn in transcript] == [f"Turn {i}" for i in range(10)]
+        assert transcript[-1] == service.get_context("user/1")[-1]
+        assert len(service.get_context("user/1")) == 4
+
+        service.clear_session("user/1")
+        assert await service.get_transcript("user/1") == []
+        await service.close()
+    print(f"   ✅ 归档保留全部 {len(transcript)} 轮，内存中 4 轮")
+
+
+async def test_write_behind_batches():
+    """Test appends stay off the archive until a batched flush, within the loss bound."""
+    print("\n" + "=" * 80)
+    print("测试 4: 延迟批量写入与崩溃丢失上界")
+    print("=" * 80)
+
+    archive = RecordingArchive()
+    flush_interval, max_batch = 0.1, 8
+    service = SessionService(archive=archive, flush_interval=flush_interval, max_batch=max_batch)
+
+    for i in range(3):
+        service.append_turn("wb_user", "user", f"Question {i}")
+        service.append_turn("wb_user", "bot", f"Answer {i}")
+    assert archive.batches == [], "Appends must not write on the critical path"
+    assert service.get_stats()["pending"] == 6
+
+    await asyncio.sleep(flush_interval * 1.5)
+    assert archive.batches == [6], "Queued turns should be written in one batch"
+
+    # Turns arriving every 5 ms: what a crash would lose stays bounded
+    worst_pending, worst_age = 0, 0.0
+    for i in range(60):
+        service.append_turn("wb_user", "user", f"Burst {i}")
+        stats = service.get_stats()
+        worst_pending = max(worst_pending, stats["pending"])
+        worst_age = max(worst_age, stats["oldest_pending_seconds"])
+        await asyncio.sleep(0.005)
+    assert worst_pending <= max_batch + 2, f"Up to {worst_pending} turns unflushed"
+    assert worst_age <= flush_interval + 0.05, f"Turn unflushed for {worst_age:.3f}s"
+
+    await service.close()
+    assert service.get_stats()["pending"] == 0
+    assert len(archive.read("wb_user")) == 6 + 60, "Shutdown must flush every queued turn"
+    print(f"   ✅ 批次: {archive.batches}，最多未落盘 {worst_pending} 轮 / {worst_age * 1000:.0f} ms")
+
+
+async def test_write_behind_failures():
+    """Test failed flushes are retried in order, bounded by max_pending."""
+    print("\n" + "=" * 80)
+    print("测试 5: 写入失败重试与清除顺序")
+    print("=" * 80)
+
+    archive = RecordingArchive()
+    service = SessionService(archive=archive, flush_interval=0.05, max_pending=5)
+    archive.down = True
+    for i in range(7):
+        service.append_turn("flaky", "user", f"Turn {i}")
+    assert await service.flush() == 0
+    stats = service.get_stats()
+    assert stats["flush_failures"] >= 1 and stats["pending"] == 5 and stats["lost_turns"] == 2
+
+    archive.down = False
+    await asyncio.sleep(0.1)
+    assert [turn.text for turn in archive.read("flaky")] == [f"Turn {i}" for i in range(2, 7)]
+
+    # A clear queued behind appends wipes them; later turns survive
+    service.append_turn("flaky", "user", "before clear")
+    service.clear_session("flaky")
+    service.append_turn("flaky", "user", "after clear")
+    assert [turn.text for turn in await service.get_transcript("flaky")] == ["after clear"]
+    await service.close()
+
+    # After shutdown, turns are written through
+    started = len(archive.batches)
+    service.append_turn("flaky", "bot", "late reply")
+    assert len(archive.batches) == started + 1
+    print(f"   ✅ 恢复后按序写入，丢弃 {stats['lost_turns']} 轮（超过 max_pending）")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("会话存储测试")
+    print("=" * 80)
+
+    test_ring_wraps_in_order()
+    test_session_bounded_and_shared_records()
+    await test_transcript_archive()
+    await test_write_behind_batches()
+    await test_write_behind_failures()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,315 @@
+"""
+Test concurrent stage execution and the request deadline in ConversationPipeline.
+
+Uses FakeOllamaBackend and fake perception / guardrails services
+(no Ollama, PsyGUARD model or NeMo Guardrails needed).
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.control_context import ControlContext
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.pipeline import ConversationPipeline, PipelineConfig
+from src_new.conversation.stages import Stage, run_stage_graph
+from src_new.perception.psyguard_service import PsyGuardService
+from src_new.shared.deadline import Deadline
+
+
+class SlowPsyGuard:
+    """Stands in for PsyGuardService.score."""
+
+    def __init__(self, risk_score: float, delay: float):
+        self.risk_score = risk_score
+        self.delay = delay
+
+    async def score(self, text, deadline=None):
+        await asyncio.sleep(self.delay)
+        return {"risk_score": self.risk_score, "labels": [], "enabled": True}
+
+
+class BlockingPsyGuard(PsyGuardService):
+    """The real PsyGuardService around a model whose inference blocks (time.sleep)."""
+
+    def __init__(self, delay: float):
+        super().__init__(device="cpu")
+        self.delay = delay
+        self._model = self._tokenizer = object()
+        self._loaded = True
+
+    def _predict(self, text):
+        time.sleep(self.delay)
+        return [0] * 10 + [1]  # 与自杀/自伤/攻击行为无关
+
+
+class SlowGuardrails:
+    """Stands in for SafetyGuardrailsService.check_user_input_safety."""
+
+    def __init__(self, safe: bool, delay: float):
+        self.safe = safe
+        self.delay = delay
+
+    async def check_user_input_safety(self, user_message, context=None, deadline=None):
+        await asyncio.sleep(self.delay)
+        return {"safe": self.safe, "checked": True}
+
+
+async def test_graph_overlaps_independent_stages():
+    """Test independent stages overlap and dependents wait for their inputs."""
+    print("\n" + "=" * 80)
+    print("测试 1: 独立阶段并发执行")
+    print("=" * 80)
+
+    async def sleep_then(value, delay):
+        await asyncio.sleep(delay)
+        return value
+
+    graph = await run_stage_graph([
+        Stage("a", lambda inputs: sleep_then(1, 0.1)),
+        Stage("b", lambda inputs: sleep_then(2, 0.1)),
+        Stage("sum", lambda inputs: sleep_then(inputs["a"] + inputs["b"], 0), depends_on=("a", "b")),
+    ])
+
+    assert graph.results["sum"] == 3
+    assert graph.total_ms < 180, f"a and b were not overlapped ({graph.total_ms:.0f} ms)"
+    assert graph.timings["sum"].started_ms >= 95
+    print(f"   ✅ 总耗时 {graph.total_ms:.0f} ms（两个 100 ms 阶段并发）")
+
+
+async def test_stage_timeout_and_fallback():
+    """Test a stage that times out or fails uses its fallback."""
+    print("\n" + "=" * 80)
+    print("测试 2: 阶段超时与回退")
+    print("=" * 80)
+
+    async def hang(inputs):
+        await asyncio.sleep(10)
+
+    async def fail(inputs):
+        raise RuntimeError("boom")
+
+    graph = await run_stage_graph([
+        Stage("slow", hang, timeout=0.05, fallback="fallback"),
+        Stage("broken", fail, fallback=lambda e: f"recovered: {e}"),
+        Stage("after", lambda inputs: asyncio.sleep(0, result=dict(inputs)), depends_on=("slow", "broken")),
+    ])
+
+    assert graph.results["after"] == {"slow": "fallback", "broken": "recovered: boom"}
+    metadata = graph.timings_metadata()["stages"]
+    assert metadata["slow"]["status"] == "timeout"
+    assert metadata["broken"]["status"] == "error"
+    assert metadata["after"]["status"] == "ok"
+
+    try:
+        await run_stage_graph([Stage("no_fallback", fail)])
+        raise AssertionError("Error without fallback should propagate")
+    except RuntimeError:
+        pass
+    print(f"   ✅ 阶段状态: { {name: m['status'] for name, m in metadata.items()} }")
+
+
+async def test_pipeline_runs_perception_and_safety_concurrently():
+    """Test PsyGUARD and guardrails overlap and the route is upgraded before the agent runs."""
+    print("\n" + "=" * 80)
+    print("测试 3: 管道中感知与安全检查并发")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    pipeline = ConversationPipeline(
+        llm_gateway=backend.gateway(),
+        psyguard=SlowPsyGuard(risk_score=0.96, delay=0.1),
+        guardrails=SlowGuardrails(safe=True, delay=0.1)
+    )
+    context = ControlContext(user_id="stage_user", route="low", rigid_score=0.2)
+
+    started = time.perf_counter()
+    result = await pipeline.process_message("stage_user", "I can't do this anymore", context)
+    elapsed = time.perf_counter() - started
+
+    stages = result["stage_timings"]["stages"]
+    assert set(stages) == {"history", "perception", "input_safety", "agent", "record"}
+    assert elapsed < 0.18, f"Perception and safety were serialized ({elapsed:.3f}s)"
+    # PsyGUARD ≥ 0.95 routes directly to the fixed high risk script, without an LLM call
+    assert result["route"] == "high"
+    assert result["agent_result"]["agent"] == "high_risk"
+    assert len(backend.requests) == 0
+    print(f"   ✅ 耗时 {elapsed * 1000:.0f} ms，路由升级为 {result['route']}")
+    await pipeline.shutdown()
+
+
+async def test_pipeline_stage_timeouts_degrade():
+    """Test slow optional stages fall back without failing the turn."""
+    print("\n" + "=" * 80)
+    print("测试 4: 可选阶段超时降级")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend()
+    pipeline = ConversationPipeline(
+        llm_gateway=backend.gateway(),
+        psyguard=SlowPsyGuard(risk_score=0.96, delay=5),
+        guardrails=SlowGuardrails(safe=False, delay=5),
+        config=PipelineConfig(perception_timeout=0.05, input_safety_timeout=0.05)
+    )
+    context = ControlContext(user_id="timeout_user", route="low", rigid_score=0.2)
+
+    result = await pipeline.process_message("timeout_user", "Just a normal day", context)
+
+    stages = result["stage_timings"]["stages"]
+    assert stages["perception"]["status"] == "timeout"
+    assert stages["input_safety"]["status"] == "timeout"
+    assert result["route"] == "low", "Timed-out signals must not change the route"
+    assert result["input_safety"]["checked"] is False
+    assert result["agent_result"]["agent"] == "low_risk"
+    print(f"   ✅ 超时阶段已降级，路由保持 {result['route']}")
+    await pipeline.shutdown()
+
+
+async def test_blocking_inference_off_event_loop():
+    """Test blocking PsyGUARD inference neither stalls the event loop nor escapes its timeout."""
+    print("\n" + "=" * 80)
+    print("测试 5: 阻塞推理不占用事件循环")
+    print("=" * 80)
+
+    async def max_loop_stall(stop: asyncio.Event) -> float:
+        worst, last = 0.0, time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            worst, last = max(worst, now - last), now
+        return worst
+
+    pipeline = ConversationPipeline(
+        llm_gateway=FakeOllamaBackend().gateway(),
+        psyguard=BlockingPsyGuard(delay=0.2),
+        guardrails=SlowGuardrails(safe=True, delay=0.2)
+    )
+    stop = asyncio.Event()
+    stall = asyncio.create_task(max_loop_stall(stop))
+    started = time.perf_counter()
+    result = await pipeline.process_message(
+        "blocking_user", "Hello", ControlContext(user_id="blocking_user", route="low", rigid_score=0.2)
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await stall
+
+    stages = result["stage_timings"]["stages"]
+    assert stages["perception"]["status"] == "ok" and result["perception"]["enabled"] is True
+    assert elapsed < 0.35, f"Perception and safety were serialized ({elapsed:.3f}s)"
+    assert worst_stall < 0.1, f"Event loop stalled for {worst_stall * 1000:.0f} ms"
+    await pipeline.shutdown()
+
+    pipeline = ConversationPipeline(
+        llm_gateway=FakeOllamaBackend().gateway(),
+        psyguard=BlockingPsyGuard(delay=0.5),
+        config=PipelineConfig(perception_timeout=0.05)
+    )
+    started = time.perf_counter()
+    result = await pipeline.process_message(
+        "blocking_user", "Hello", ControlContext(user_id="blocking_user", route="low", rigid_score=0.2)
+    )
+    timed_out_elapsed = time.perf_counter() - started
+    assert result["stage_timings"]["stages"]["perception"]["status"] == "timeout"
+    assert timed_out_elapsed < 0.3, f"Perception timeout did not fire ({timed_out_elapsed:.3f}s)"
+    await pipeline.shutdown()
+    print(f"   ✅ 耗时 {elapsed * 1000:.0f} ms，事件循环最长停顿 {worst_stall * 1000:.0f} ms，超时仍生效")
+
+
+async def test_deadline_caps_stages():
+    """Test stages are capped by the remaining budget and skipped once it is gone."""
+    print("\n" + "=" * 80)
+    print("测试 6: 请求截止时间限制各阶段")
+    print("=" * 80)
+
+    async def hang(inputs):
+        await asyncio.sleep(10)
+
+    async def bookkeeping(inputs):
+        await asyncio.sleep(0.05)
+        return "recorded"
+
+    graph = await run_stage_graph([
+        Stage("slow", hang, timeout=5, fallback="fallback"),
+        Stage("late", hang, depends_on=("slow",), fallback="skipped"),
+        Stage("record", bookkeeping, depends_on=("late",), bounded=False),
+    ], deadline=Deadline.after(0.1))
+
+    stages = graph.timings_metadata()["stages"]
+    assert graph.results == {"slow": "fallback", "late": "skipped", "record": "recorded"}
+    assert stages["slow"]["status"] == "deadline"
+    assert stages["late"]["status"] == "deadline"
+    assert stages["late"]["duration_ms"] < 5, "Stage past the deadline should not run"
+    assert stages["record"]["status"] == "ok", "Unbounded stage must run after the deadline"
+    assert graph.total_ms < 250
+    print(f"   ✅ 总耗时 {graph.total_ms:.0f} ms（预算 100 ms + 记录阶段）")
+
+
+async def test_turn_latency_bounded_by_budget():
+    """Test a slow LLM degrades to the agent fallback within the turn budget."""
+    print("\n" + "=" * 80)
+    print("测试 7: 单轮延迟受预算限制")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=5)
+    pipeline = ConversationPipeline(
+        llm_gateway=backend.gateway(),
+        psyguard=SlowPsyGuard(risk_score=0.1, delay=0.05),
+        config=PipelineConfig(turn_budget=0.3)
+    )
+    context = ControlContext(user_id="budget_user", route="low", rigid_score=0.2)
+
+    started = time.perf_counter()
+    result = await pipeline.process_message("budget_user", "Rough week at school", context)
+    elapsed = time.perf_counter() - started
+
+    agent_result = result["agent_result"]
+    assert elapsed < 0.3 + 0.25 + 0.1, f"Turn exceeded its budget ({elapsed:.3f}s)"
+    assert agent_result["llm"]["ok"] is False, "LLM call should have been cut off by the deadline"
+    assert agent_result["response"], "Agent fallback reply expected"
+    assert result["stage_timings"]["budget_ms"] == 300
+    assert len(pipeline.get_conversation_history("budget_user")) == 2, "Turn must still be recorded"
+
+    # A turn that starts with no budget left skips the LLM entirely
+    requests_before = len(backend.requests)
+    result = await pipeline.process_message(
+        "budget_user", "Still there?", context, deadline=Deadline.after(0)
+    )
+    assert result["agent_result"]["deadline_exceeded"] is True
+    assert len(backend.requests) == requests_before
+    print(f"   ✅ 耗时 {elapsed * 1000:.0f} ms（预算 300 ms），降级为回退回复")
+    await pipeline.shutdown()
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("Pipeline 阶段并发测试")
+    print("=" * 80)
+
+    await test_graph_overlaps_independent_stages()
+    await test_stage_timeout_and_fallback()
+    await test_pipeline_runs_perception_and_safety_concurrently()
+    await test_pipeline_stage_timeouts_degrade()
+    await test_blocking_inference_off_event_loop()
+    await test_deadline_caps_stages()
+    await test_turn_latency_bounded_by_budget()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
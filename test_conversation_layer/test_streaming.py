@@ -0,0 +1,146 @@
+"""
+Test token streaming through ConversationPipeline.
+
+Uses httpx.MockTransport returning Ollama-style NDJSON (no Ollama needed).
+"""
+
+import sys
+import json
+import asyncio
+from pathlib import Path
+
+import httpx
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.gateway import LLMGateway
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.conversation.streaming import format_sse
+from src_new.control.control_context import ControlContext
+
+TOKENS = ["Try ", "some ", "deep ", "breathing ", "today."]
+
+
+class FakeOllamaService:
+    """Minimal stand-in for OllamaService."""
+
+    def __init__(self):
+        self.base_url = "http://ollama.test"
+        self.model_name = "test-model"
+        self.is_loaded = True
+
+
+def make_pipeline(requests, status_code=200):
+    """Pipeline whose gateway answers with streamed NDJSON."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        if status_code != 200:
+            return httpx.Response(status_code)
+        if not payload["stream"]:
+            return httpx.Response(200, json={"response": "".join(TOKENS), "done": True})
+        lines = [json.dumps({"response": token, "done": False}) for token in TOKENS]
+        lines.append(json.dumps({"response": "", "done": True, "eval_count": len(TOKENS)}))
+        return httpx.Response(200, content="\n".join(lines).encode())
+
+    gateway = LLMGateway(llm_service=FakeOllamaService(), transport=httpx.MockTransport(handler))
+    return ConversationPipeline(llm_gateway=gateway)
+
+
+async def _collect(pipeline, user_id, message, route):
+    context = ControlContext(user_id=user_id, route=route, rigid_score=0.2)
+    return [event async for event in pipeline.process_message_stream(user_id, message, context)]
+
+
+async def test_low_risk_stream():
+    """Test tokens are streamed and post-processing runs on the full text."""
+    print("\n" + "=" * 80)
+    print("测试 1: Low Risk 流式输出")
+    print("=" * 80)
+
+    requests = []
+    pipeline = make_pipeline(requests)
+    events = await _collect(pipeline, "stream_low", "I'm stressed.", "low")
+
+    tokens = [event["data"]["text"] for event in events if event["type"] == "token"]
+    assert tokens == TOKENS
+    assert requests[0]["stream"] is True
+    assert [event["type"] for event in events][-1] == "done"
+    assert "replace" not in [event["type"] for event in events]
+
+    agent_result = events[-1]["data"]["agent_result"]
+    assert agent_result["response"] == "".join(TOKENS).strip()
+    assert agent_result["coping_skills_suggested"] is True
+
+    history = pipeline.get_conversation_history("stream_low")
+    assert len(history) == 2
+    await pipeline.shutdown()
+    print(f"   ✅ {len(tokens)} 个 token, 最终响应: {agent_result['response']!r}")
+
+
+async def test_fallback_and_high_risk_replace():
+    """Test a replace event when the final text differs from the streamed tokens."""
+    print("\n" + "=" * 80)
+    print("测试 2: 回退文本与高风险固定脚本")
+    print("=" * 80)
+
+    pipeline = make_pipeline([], status_code=500)
+    events = await _collect(pipeline, "stream_err", "Hello", "low")
+    assert [event["type"] for event in events] == ["replace", "done"]
+    assert events[0]["data"]["text"] == "I'm here to listen. How can I help you today?"
+
+    high_events = await _collect(make_pipeline([]), "stream_high", "I can't go on", "high")
+    assert [event["type"] for event in high_events] == ["replace", "done"]
+    assert high_events[0]["data"]["text"] == high_events[1]["data"]["agent_result"]["response"]
+    print("   ✅ replace 事件携带最终文本")
+
+
+async def test_non_streaming_unchanged():
+    """Test process_message still makes a single non-streamed call."""
+    print("\n" + "=" * 80)
+    print("测试 3: 非流式调用不变")
+    print("=" * 80)
+
+    requests = []
+    pipeline = make_pipeline(requests)
+    context = ControlContext(user_id="plain", route="low", rigid_score=0.2)
+    result = await pipeline.process_message("plain", "Hi", context)
+
+    assert requests[0]["stream"] is False
+    assert result["agent_result"]["response"] == "".join(TOKENS).strip()
+    print("   ✅ stream=False")
+
+
+def test_sse_format():
+    """Test SSE frame encoding."""
+    frame = format_sse({"type": "token", "data": {"text": "hi"}})
+    assert frame == 'event: token\ndata: {"text": "hi"}\n\n'
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("流式输出测试")
+    print("=" * 80)
+
+    await test_low_risk_stream()
+    await test_fallback_and_high_risk_replace()
+    await test_non_streaming_unchanged()
+    test_sse_format()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""
+Test rolling conversation summaries.
+
+Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import re
+import sys
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.llm.prompt import SUMMARY_PREFIX
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.conversation.summarizer import SessionSummary, split_history
+from src_new.control.control_context import ControlContext
+from src_new.shared.models import ConversationTurn
+
+
+def responder(payload):
+    prompt = payload["prompt"]
+    if prompt.endswith("Updated summary:"):
+        previous = re.search(r"Current summary: Summary v(\d+)", prompt)
+        version = int(previous.group(1)) + 1 if previous else 1
+        return f"Summary v{version}: exam stress, sister Maya."
+    return "I hear you."
+
+
+async def test_rolling_summary():
+    """Test old turns are folded into a summary that replaces them in the prompt."""
+    print("\n" + "=" * 80)
+    print("测试 1: 滚动摘要替代旧轮次")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(responder=responder)
+    pipeline = ConversationPipeline(llm_gateway=backend.gateway(LLMGatewayConfig(reuse_context=False)))
+    context = ControlContext(user_id="sum_user", route="low", rigid_score=0.2)
+
+    prompt_lengths = []
+    for i in range(24):
+        await pipeline.process_message("sum_user", f"message {i} about my sister Maya", context)
+        await pipeline.summarizer.flush()
+        prompt_lengths.append(len(backend.requests[-1]["prompt"]) if i < 6 else None)
+        if i >= 6:
+            reply_request = [r for r in backend.requests if not r["prompt"].endswith("Updated summary:")][-1]
+            prompt_lengths[-1] = len(reply_request["prompt"])
+
+    summary_requests = [r for r in backend.requests if r["prompt"].endswith("Updated summary:")]
+    assert len(summary_requests) == 7  # 42 turns older than the last 6, folded in 6 at a time
+    assert "Current summary: (none yet)" in summary_requests[0]["prompt"]
+    assert "Current summary: Summary v1" in summary_requests[1]["prompt"]
+    assert summary_requests[0]["options"]["temperature"] == 0.2
+
+    last_reply = [r for r in backend.requests if not r["prompt"].endswith("Updated summary:")][-1]
+    assert f"{SUMMARY_PREFIX}Summary v6" in last_reply["prompt"]  # v7 was made after it
+    assert "message 0 " not in last_reply["prompt"]
+    assert "message 23" in last_reply["prompt"]
+
+    # Bounded: once summaries kick in, prompt size stops growing with the session
+    assert max(prompt_lengths[18:]) <= max(prompt_lengths[12:18])
+    stats = pipeline.summarizer.get_stats()
+    assert stats["updates"] == 7 and stats["pending"] == 0
+    assert pipeline.summarizer.get("sum_user").text.startswith("Summary v7")
+    print(f"   ✅ {stats['updates']} 次摘要更新, prompt 长度上限 {max(prompt_lengths)}")
+
+    pipeline.clear_conversation("sum_user")
+    assert pipeline.summarizer.get("sum_user") is None
+    await pipeline.shutdown()
+
+
+async def test_failed_update_keeps_history():
+    """Test a failed summary call keeps the raw turns and retries later."""
+    # Latency keeps the background summary call in flight when the failure is queued
+    backend = FakeOllamaBackend(responder=responder, latency=0.02)
+    pipeline = ConversationPipeline(llm_gateway=backend.gateway(LLMGatewayConfig(
+        reuse_context=False, max_retries=0, circuit_breaker=False
+    )))
+    context = ControlContext(user_id="sum_fail", route="low", rigid_score=0.2)
+    for i in range(6):
+        await pipeline.process_message("sum_fail", f"message {i}", context)
+    backend.failures.append(500)  # Consumed by the summary update scheduled after turn 6
+    await pipeline.summarizer.flush()
+    assert pipeline.summarizer.get("sum_fail") is None
+    assert pipeline.summarizer.get_stats()["failures"] == 1
+
+    await pipeline.process_message("sum_fail", "message 6", context)
+    await pipeline.summarizer.flush()
+    assert pipeline.summarizer.get("sum_fail") is not None
+
+
+def test_split_history():
+    """Test the unsummarized tail is found even if old turns were dropped."""
+    turns = [ConversationTurn(role="user", text=f"t{i}", timestamp=str(i)) for i in range(8)]
+    summary = SessionSummary(text="s", last_turn=("user", "t3", "3"), turns_covered=4, updated_at=0.0)
+    assert [t.text for t in split_history(turns, summary)] == ["t4", "t5", "t6", "t7"]
+    assert [t.text for t in split_history(turns[2:], summary)] == ["t4", "t5", "t6", "t7"]
+    assert len(split_history(turns[5:], summary)) == 3
+    assert len(split_history(turns, None)) == 8
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("滚动摘要测试")
+    print("=" * 80)
+
+    await test_rolling_summary()
+    await test_failed_update_keeps_history()
+    test_split_history()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+"""
+Test per-user mailboxes in ConversationPipeline.
+
+Turns for one user must run one at a time in arrival order, turns for
+different users in parallel; queue depth per user is bounded.
+Uses FakeOllamaBackend (no Ollama needed).
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.control_context import ControlContext
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.llm.gateway import LLMGatewayConfig
+from src_new.conversation.pipeline import ConversationPipeline, PipelineConfig
+from src_new.shared.concurrency import KeyedMailboxes, MailboxFull
+
+LATENCY = 0.1
+
+
+def make_pipeline(backend: FakeOllamaBackend, **config) -> ConversationPipeline:
+    return ConversationPipeline(
+        llm_gateway=backend.gateway(LLMGatewayConfig(max_concurrent_generations=8)),
+        config=PipelineConfig(**config)
+    )
+
+
+async def test_same_user_turns_in_order():
+    """Test quick messages from one user run one after another, in arrival order."""
+    print("\n" + "=" * 80)
+    print("测试 1: 同一用户轮次按到达顺序串行")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=LATENCY)
+    pipeline = make_pipeline(backend)
+    context = ControlContext(user_id="actor_user", route="low", rigid_score=0.2)
+    messages = ["first message", "second message", "third message"]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        pipeline.process_message("actor_user", message, context) for message in messages
+    ))
+    elapsed = time.perf_counter() - started
+
+    history = pipeline.get_conversation_history("actor_user")
+    assert [turn.text for turn in history if turn.role == "user"] == messages
+    assert elapsed >= 3 * LATENCY, f"Turns of one user overlapped ({elapsed:.3f}s)"
+    # LLM calls ran in arrival order, each continuing from the previous turn's context
+    assert [m in request["prompt"] for m, request in zip(messages, backend.requests, strict=True)] == [True] * 3
+    assert all(request.get("context") for request in backend.requests[1:])
+    assert results[2]["stage_timings"]["queue_wait_ms"] >= 1.5 * LATENCY * 1000
+    print(f"   ✅ 3 轮串行耗时 {elapsed * 1000:.0f} ms，顺序与到达顺序一致")
+    await pipeline.shutdown()
+
+
+async def test_different_users_in_parallel():
+    """Test turns of different users are not serialized behind each other."""
+    print("\n" + "=" * 80)
+    print("测试 2: 不同用户并行")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=LATENCY)
+    pipeline = make_pipeline(backend)
+    users = [f"parallel_{i}" for i in range(5)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        pipeline.process_message(
+            user_id, "Hello there", ControlContext(user_id=user_id, route="low", rigid_score=0.2)
+        )
+        for user_id in users
+    ))
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 2 * LATENCY, f"Users were serialized ({elapsed:.3f}s)"
+    assert pipeline.get_stats()["mailboxes"]["active_keys"] == len(users)
+    print(f"   ✅ 5 个用户并行耗时 {elapsed * 1000:.0f} ms")
+    await pipeline.shutdown()
+
+
+async def test_overload_rejected():
+    """Test turns beyond the per-user queue bound are rejected and not recorded."""
+    print("\n" + "=" * 80)
+    print("测试 3: 队列深度有界与过载报告")
+    print("=" * 80)
+
+    backend = FakeOllamaBackend(latency=LATENCY)
+    pipeline = make_pipeline(backend, max_queued_turns_per_user=2)
+    context = ControlContext(user_id="flood_user", route="low", rigid_score=0.2)
+
+    # 1 running + 2 queued are accepted, the rest are rejected immediately
+    results = await asyncio.gather(*(
+        pipeline.process_message("flood_user", f"message {i}", context) for i in range(6)
+    ))
+
+    overloaded = [result for result in results if result.get("overloaded")]
+    assert len(overloaded) == 3
+    assert all(result["agent_result"]["response"] for result in overloaded)
+    assert len(pipeline.get_conversation_history("flood_user")) == 2 * 3
+    stats = pipeline.get_stats()["mailboxes"]
+    assert stats["rejected"] == 3 and stats["completed"] == 3
+    print(f"   ✅ 6 条消息中 {len(overloaded)} 条被拒绝，统计: rejected={stats['rejected']}")
+    await pipeline.shutdown()
+
+
+async def test_idle_cleanup_and_cancellation():
+    """Test idle mailboxes are dropped and a cancelled caller cancels its job."""
+    print("\n" + "=" * 80)
+    print("测试 4: 空闲回收与取消")
+    print("=" * 80)
+
+    mailboxes = KeyedMailboxes(max_queue_depth=1, idle_timeout=0.05)
+    ran = []
+
+    async def job(name, delay):
+        await asyncio.sleep(delay)
+        ran.append(name)
+        return name
+
+    assert await mailboxes.submit("idle", lambda: job("a", 0)) == "a"
+    assert len(mailboxes) == 1
+    await asyncio.sleep(0.15)
+    assert len(mailboxes) == 0, "Idle mailbox should be dropped"
+
+    # Cancel the running job's caller; the queued job still runs
+    running = asyncio.create_task(mailboxes.submit("user", lambda: job("cancelled", 10)))
+    await asyncio.sleep(0.01)
+    queued = asyncio.create_task(mailboxes.submit("user", lambda: job("next", 0)))
+    await asyncio.sleep(0.01)
+    try:
+        await mailboxes.submit("user", lambda: job("rejected", 0))
+        raise AssertionError("Full mailbox should reject")
+    except MailboxFull as e:
+        assert e.key == "user" and e.depth == 1
+    running.cancel()
+    assert await queued == "next"
+    assert ran == ["a", "next"]
+    assert mailboxes.get_stats()["cancelled"] == 1
+
+    # close() also stops a job that is running
+    unfinished = asyncio.create_task(mailboxes.submit("closing", lambda: job("after_close", 0.2)))
+    await asyncio.sleep(0.01)
+    await mailboxes.close()
+    await asyncio.sleep(0.3)
+    assert unfinished.cancelled() and "after_close" not in ran
+    print(f"   ✅ 空闲邮箱已回收，取消与关闭时的轮次未执行: {ran}")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("每用户邮箱测试")
+    print("=" * 80)
+
+    await test_same_user_turns_in_order()
+    await test_different_users_in_parallel()
+    await test_overload_rejected()
+    await test_idle_cleanup_and_cancellation()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
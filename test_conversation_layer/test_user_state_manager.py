@@ -0,0 +1,176 @@
+"""
+Test UserStateManager functionality.
+
+Tests per-user locking of ControlContext / MediumRiskAgentState updates,
+also as used by ConversationPipeline (FakeOllamaBackend, no Ollama needed).
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.control.control_context import ControlContext
+from src_new.conversation.agents.medium_risk_agent import MediumRiskAgent
+from src_new.conversation.llm.fake import FakeOllamaBackend
+from src_new.conversation.pipeline import ConversationPipeline
+from src_new.conversation.user_state_manager import UserStateManager
+from src_new.shared.concurrency import KeyedAsyncLock
+
+
+async def test_no_lost_updates():
+    """Test concurrent read-modify-write on the same user is not lost."""
+    print("\n" + "=" * 80)
+    print("测试 1: 同一用户并发更新不丢失")
+    print("=" * 80)
+
+    manager = UserStateManager(medium_agent=MediumRiskAgent())
+    user_id = "race_user"
+
+    async def bump():
+        async with manager.transaction(user_id) as state:
+            count = state.medium_state.resistance_count
+            await asyncio.sleep(0)  # Yield inside the critical section
+            state.medium_state.resistance_count = count + 1
+
+    await asyncio.gather(*(bump() for _ in range(100)))
+
+    final = manager.medium_agent.get_state(user_id).resistance_count
+    assert final == 100, f"Lost updates: {final}"
+    assert len(manager._locks) == 0, "Locks should be cleaned up"
+    print(f"   ✅ 100 次并发更新后计数 = {final}，锁已自动清理")
+
+
+async def test_upgrade_not_lost():
+    """Test two concurrent PsyGUARD scores both take effect (one-way)."""
+    print("\n" + "=" * 80)
+    print("测试 2: 并发路由升级不丢失")
+    print("=" * 80)
+
+    manager = UserStateManager()
+    await manager.set_context(ControlContext(user_id="u1", route="low", rigid_score=0.2))
+
+    routes = await asyncio.gather(
+        manager.apply_psyguard_score("u1", 0.96),
+        manager.apply_psyguard_score("u1", 0.75),
+    )
+
+    assert manager.get_context("u1").route == "high"
+    assert routes == ["high", "high"]
+    assert await manager.apply_psyguard_score("missing", 0.99) is None
+    print(f"   ✅ 最终路由: {manager.get_context('u1').route}")
+
+
+async def test_cross_user_parallelism():
+    """Test different users do not wait on each other."""
+    print("\n" + "=" * 80)
+    print("测试 3: 不同用户并行执行")
+    print("=" * 80)
+
+    locks = KeyedAsyncLock()
+    hold = 0.05
+
+    async def work(key):
+        async with locks.acquire(key):
+            await asyncio.sleep(hold)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(work(f"user_{i}") for i in range(20)))
+    parallel = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(work("same_user") for _ in range(5)))
+    serial = time.perf_counter() - started
+
+    assert parallel < hold * 4, f"Different users were serialized ({parallel:.3f}s)"
+    assert serial >= hold * 5 * 0.9, f"Same user was not serialized ({serial:.3f}s)"
+    assert locks.get_stats()["contended"] == 4
+    print(f"   20 个不同用户: {parallel:.3f}s")
+    print(f"   5 次同一用户: {serial:.3f}s")
+    print("   ✅ 跨用户并行，同用户串行")
+
+
+async def test_remove_resets_state():
+    """Test removing a user drops context and agent state."""
+    print("\n" + "=" * 80)
+    print("测试 4: 删除用户状态")
+    print("=" * 80)
+
+    agent = MediumRiskAgent()
+    manager = UserStateManager(medium_agent=agent)
+    async with manager.transaction("u2") as state:
+        state.control_context = ControlContext(user_id="u2", route="medium", rigid_score=0.6)
+        state.medium_state.resistance_count = 3
+
+    assert manager.get_context("u2") is not None
+    await manager.remove("u2")
+    assert manager.get_context("u2") is None
+    assert "u2" not in agent._user_states
+    print("   ✅ ControlContext 与 MediumRiskAgentState 均已删除")
+
+
+class FixedPsyGuard:
+    """Stands in for PsyGuardService.score."""
+
+    def __init__(self, risk_score: float):
+        self.risk_score = risk_score
+
+    async def score(self, text, deadline=None):
+        return {"risk_score": self.risk_score, "labels": [], "enabled": True}
+
+
+async def test_pipeline_updates_through_manager():
+    """Test pipeline turns apply their route signals to the context the manager holds."""
+    print("\n" + "=" * 80)
+    print("测试 5: 管道通过状态管理器更新路由")
+    print("=" * 80)
+
+    pipeline = ConversationPipeline(llm_gateway=FakeOllamaBackend().gateway(), psyguard=FixedPsyGuard(0.75))
+    context = ControlContext(user_id="u3", route="low", rigid_score=0.2)
+
+    result = await pipeline.process_message("u3", "Everything feels heavy", context)
+    assert result["route"] == "medium"
+    assert pipeline.user_states.get_context("u3") is context
+
+    # A score applied outside any turn reaches the same context
+    assert await pipeline.user_states.apply_psyguard_score("u3", 0.96) == "high"
+    result = await pipeline.process_message("u3", "Still here")  # The pipeline holds the context
+    assert result["route"] == "high" and result["agent_result"]["agent"] == "high_risk"
+    try:
+        await pipeline.process_message("unknown", "Hi")
+        raise AssertionError("A first turn without a ControlContext should be refused")
+    except ValueError:
+        pass
+    await pipeline.shutdown()
+    print(f"   ✅ 轮次与外部评分更新同一 ControlContext，最终路由 {context.route}")
+
+
+async def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("UserStateManager 测试")
+    print("=" * 80)
+
+    await test_no_lost_updates()
+    await test_upgrade_not_lost()
+    await test_cross_user_parallelism()
+    await test_remove_resets_state()
+    await test_pipeline_updates_through_manager()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
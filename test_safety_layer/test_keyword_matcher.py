@@ -0,0 +1,121 @@
+"""
+Test the shared KeywordMatcher.
+
+Tests one-pass multi-category keyword matching used by the agents,
+SafetyValidator and the guardrails fallback action.
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Windows encoding setup
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
+
+from src_new.shared.keywords import KEYWORDS, KeywordMatcher, first_resistance, has_keyword
+from src_new.conversation.agents.medium_risk_agent import detect_resistance, is_acceptance
+
+
+def test_all_categories_one_pass():
+    """Test a single scan reports every category hit, including overlaps."""
+    print("\n" + "=" * 80)
+    print("测试 1: 单次扫描返回所有类别")
+    print("=" * 80)
+
+    hits = KEYWORDS.scan("Honestly I want to die, thanks for nothing")
+
+    assert hits["crisis"] == ("want to die",)
+    assert hits["high_risk"] == ("want to die",)
+    assert hits["acceptance"] == ("i want to",), "Overlapping keyword should also be reported"
+    assert hits["goodbye"] == ("thanks",)
+    print(f"   ✅ {dict(hits)}")
+
+
+def test_word_boundaries():
+    """Test keywords match whole words unless marked as prefixes."""
+    print("\n" + "=" * 80)
+    print("测试 2: 单词边界")
+    print("=" * 80)
+
+    test_cases = [
+        ("Sometimes I feel low", "resistance.time", False),
+        ("I don't have the time", "resistance.time", True),
+        ("I felt abandoned", "goodbye", False),
+        ("I'm done for today", "goodbye", True),
+        ("I'm not okay", "acceptance", True),
+        ("I'd be judged by everyone", "resistance.stigma", True),
+        ("Try these breathing techniques", "coping", True),
+        ("I haircut myself", "high_risk", False),
+    ]
+
+    for message, category, expected in test_cases:
+        actual = has_keyword(message, category)
+        assert actual == expected, f"{message!r} / {category}: expected {expected}, got {actual}"
+        print(f"   ✅ '{message}' → {category}={actual}")
+
+
+def test_normalization():
+    """Test case, curly apostrophes and extra whitespace are normalized."""
+    print("\n" + "=" * 80)
+    print("测试 3: 文本规范化")
+    print("=" * 80)
+
+    assert has_keyword("I DON’T WANT TO LIVE", "crisis")
+    assert has_keyword("kill   myself", "crisis")
+    assert KEYWORDS.scan("I’ll join")["acceptance"] == ("i'll join",)
+    print("   ✅ 大小写、弯引号、多余空白均已规范化")
+
+
+def test_agent_helpers():
+    """Test MediumRiskAgent helpers keep their category order."""
+    print("\n" + "=" * 80)
+    print("测试 4: Agent 辅助函数")
+    print("=" * 80)
+
+    # Privacy is checked before doubt, regardless of position in the text
+    assert detect_resistance("Not sure, and is it private?") == "privacy"
+    assert first_resistance("I'm embarrassed") == "stigma"
+    assert detect_resistance("I'm feeling anxious") is None
+    assert is_acceptance("Sounds good to me")
+    assert not is_acceptance("I'm feeling anxious")
+    print("   ✅ 抗拒类型顺序与接受检测正确")
+
+
+def test_custom_sets():
+    """Test a matcher built from custom keyword sets."""
+    print("\n" + "=" * 80)
+    print("测试 5: 自定义关键词集合")
+    print("=" * 80)
+
+    matcher = KeywordMatcher({"a": ["ok", "okay"], "b": ["ok", "stress*"]})
+    hits = matcher.scan("ok, okay, stressed out")
+    assert hits["a"] == ("ok", "okay")
+    assert hits["b"] == ("ok", "stress")
+    print(f"   ✅ {dict(hits)}")
+
+
+def main():
+    """Run all tests."""
+    print("=" * 80)
+    print("KeywordMatcher 测试")
+    print("=" * 80)
+
+    test_all_categories_one_pass()
+    test_word_boundaries()
+    test_normalization()
+    test_agent_helpers()
+    test_custom_sets()
+
+    print("\n" + "=" * 80)
+    print("测试完成")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()